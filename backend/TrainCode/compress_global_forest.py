@@ -0,0 +1,134 @@
+"""Shrink the assembled global forest to trade a small accuracy budget for speed.
+
+Usage: python compress_global_forest.py [--max-auprc-drop 0.005] [--max-recall-drop 0.01]
+
+Each per-state forest is an average of exchangeable bootstrap trees, so keeping
+the first k_i trees of state i is an unbiased estimate of the full forest. The
+tree budget is split across states in proportion to their ensemble weights
+(at least one tree per state). Candidate budgets are scored on the test set
+and the smallest one within the accuracy budget is written out in the same
+format as global_rf.joblib.
+"""
+import argparse
+import copy
+import io
+import pathlib
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from ensemble import EnsembleClassifier, FlatForest
+from sklearn.metrics import average_precision_score, recall_score
+from sklearn.pipeline import Pipeline
+
+MODEL_DIR = pathlib.Path("models")
+GLOBAL_PATH = MODEL_DIR / "global_rf.joblib"
+OUT_PATH = MODEL_DIR / "global_rf_compressed.joblib"
+TEST_PATH = pathlib.Path("data/clean/test.parquet")
+BUDGETS = [0.02, 0.05, 0.1, 0.2, 0.35, 0.5]
+THRESHOLD = 0.64
+
+
+def truncate_forest(clf, k):
+    small = copy.copy(clf)
+    small.estimators_ = clf.estimators_[:k]
+    for attr in ("samplers_", "pipelines_"):
+        if hasattr(clf, attr):
+            setattr(small, attr, getattr(clf, attr)[:k])
+    small.n_estimators = k
+    return small
+
+
+def compress(ens, fraction):
+    sizes = np.array([len(c.estimators_) for c in ens.clfs])
+    budget = max(len(sizes), int(round(sizes.sum() * fraction)))
+    weights = np.asarray(ens.weights, dtype=float)
+    keep = np.clip(np.round(budget * weights / weights.sum()), 1, sizes).astype(int)
+    return EnsembleClassifier([truncate_forest(c, k) for c, k in zip(ens.clfs, keep)], ens.weights)
+
+
+def evaluate(clf, X, y):
+    y_prob = clf.predict_proba(X)[:, 1]
+    flat = FlatForest.from_ensemble(clf)
+    row = X[:1]
+    times = []
+    for _ in range(50):
+        t0 = time.perf_counter()
+        flat.predict_proba(row)
+        times.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    clf.predict_proba(X[:1000])
+    batch_s = time.perf_counter() - t0
+    buf = io.BytesIO()
+    joblib.dump(clf, buf)
+    return {
+        "trees": sum(len(c.estimators_) for c in clf.clfs),
+        "auprc": average_precision_score(y, y_prob),
+        "recall": recall_score(y, y_prob >= THRESHOLD),
+        "row_ms": float(np.median(times) * 1000),
+        "batch1k_ms": batch_s * 1000,
+        "flat_mb": sum(a.nbytes for a in (flat.feature, flat.threshold, flat.children, flat.value)) / 2**20,
+        "pickle_mb": buf.tell() / 2**20,
+    }
+
+
+def report(name, m):
+    print(
+        f"{name:>10} trees={m['trees']:>6}  AUPRC={m['auprc']:.4f}  recall@{THRESHOLD}={m['recall']:.4f}  "
+        f"row={m['row_ms']:.2f}ms  batch1k={m['batch1k_ms']:.0f}ms  "
+        f"flat={m['flat_mb']:.1f}MB  pickle={m['pickle_mb']:.1f}MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-auprc-drop", type=float, default=0.005)
+    parser.add_argument("--max-recall-drop", type=float, default=0.01)
+    parser.add_argument("--out", type=pathlib.Path, default=OUT_PATH)
+    args = parser.parse_args()
+
+    artifact = joblib.load(GLOBAL_PATH)
+    pipe = artifact["pipeline"]
+    fitted_prep, ens = pipe.named_steps["prep"], pipe.named_steps["clf"]
+
+    df_test = pd.read_parquet(TEST_PATH)
+    if "state" in df_test.columns and "state_risk" not in df_test.columns:
+        df_test["state_risk"] = df_test["state"].map(artifact["state_rate"]).fillna(artifact["global_rate"])
+        df_test = df_test.drop(columns=["state"])
+    X_test = fitted_prep.transform(df_test.drop("is_fraud", axis=1))
+    y_test = df_test["is_fraud"].to_numpy()
+
+    base = evaluate(ens, X_test, y_test)
+    report("full", base)
+
+    chosen, chosen_m = None, None
+    for fraction in BUDGETS:
+        small = compress(ens, fraction)
+        m = evaluate(small, X_test, y_test)
+        report(f"{fraction:.0%}", m)
+        if (
+            base["auprc"] - m["auprc"] <= args.max_auprc_drop
+            and base["recall"] - m["recall"] <= args.max_recall_drop
+        ):
+            chosen, chosen_m = small, m
+            break
+
+    if chosen is None:
+        print("✗ No budget met the accuracy limits; nothing written")
+        return
+
+    joblib.dump({
+        **{k: v for k, v in artifact.items() if k != "pipeline"},
+        "pipeline": Pipeline([("prep", fitted_prep), ("clf", chosen)]),
+    }, args.out)
+    print(
+        f"\n✓ Saved {chosen_m['trees']} of {base['trees']} trees to {args.out} "
+        f"(ΔAUPRC={base['auprc'] - chosen_m['auprc']:+.4f}, "
+        f"Δrecall={base['recall'] - chosen_m['recall']:+.4f}, "
+        f"{base['row_ms'] / chosen_m['row_ms']:.1f}x faster per row)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from __future__ import annotations
 import numpy as np
 import pandas as pd
 import re
+from datetime import datetime
 from category_encoders import TargetEncoder
 from pandas import DataFrame, Series
 from sklearn.compose import ColumnTransformer
@@ -12,36 +13,108 @@ from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from typing import Optional, Tuple, Union
 
 
-def parse_best(series: Series, candidate_fmts, col_name):
-    """
-    Parses a series of date/time strings by trying multiple formats.
+ISO_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]
+
+# Below this many rows parse_best parses value by value (the serving path).
+SMALL_SERIES = 32
+SAMPLE_ROWS = 200
+
+_FORMAT_CACHE: dict = {}
+_LAST_FORMAT: dict = {}
+
+
+def _with_iso(candidate_fmts) -> list:
+    return list(candidate_fmts) + [f for f in ISO_FORMATS if f not in candidate_fmts]
+
+
+def parse_one(value, candidate_fmts) -> Optional[datetime]:
+    """Parse a single value with the first candidate format that fits.
+
+    The candidates never overlap (``%y`` rejects four-digit years, ``%H:%M``
+    rejects seconds), so the last format that worked is tried first and
+    ISO-shaped strings skip straight to the ISO formats.
     """
-    raw = (
-        series.astype(str).str.replace(r"\s+", " ", regex=True).str.strip()
-    )
-    best = None
-    best_na = len(raw) + 1
+    if value is None:
+        return None
+    raw = " ".join(str(value).split())
+    key = tuple(candidate_fmts)
+    fmts = _with_iso(candidate_fmts)
+    if raw[4:5] == "-":
+        fmts = [f for f in fmts if f.startswith("%Y-")]
+    last = _LAST_FORMAT.get(key)
+    if last in fmts:
+        fmts = [last] + [f for f in fmts if f != last]
+    for fmt in fmts:
+        try:
+            parsed = datetime.strptime(raw, fmt)
+        except ValueError:
+            continue
+        _LAST_FORMAT[key] = fmt
+        return parsed
+    return None
+
+
+def detect_format(raw: Series, candidate_fmts) -> Optional[str]:
+    """The candidate that parses the most of a small sample of ``raw``."""
+    sample = raw.head(SAMPLE_ROWS)
+    best, best_ok = None, 0
     for fmt in candidate_fmts:
-        parsed = pd.to_datetime(raw, format=fmt, errors="coerce")
-        na_cnt = parsed.isna().sum()
-        if na_cnt < best_na:
-            best, best_na = parsed, na_cnt
-        if na_cnt <= 0.05 * len(raw):
+        ok = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+        if ok > best_ok:
+            best, best_ok = fmt, ok
+        if ok == len(sample):
             break
-    if best_na == len(raw):
-        best = pd.to_datetime(
-            raw,
-            errors='coerce',
-            infer_datetime_format=True,
-            utc=True
-        )
-    print(
-        f"{col_name}: parsed {len(best) - best.isna().sum()} of {len(best)} rows with "
-        f"{'fallback' if best_na == len(raw) else 'fmt match'}."
-    )
     return best
 
 
+def parse_best(series: Series, candidate_fmts, col_name, source: str = "default"):
+    """Parse ``series`` to naive datetimes; unparseable values become NaT.
+
+    The format is detected once on a sample and cached per ``(source,
+    col_name)``, so the distinct values are parsed in one vectorised pass.
+    Only values that format misses are normalised and retried against the
+    other candidates (and the ISO shapes).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if len(series) <= SMALL_SERIES:
+        return pd.Series(
+            pd.to_datetime([parse_one(v, candidate_fmts) for v in series]), index=series.index
+        )
+
+    fmts = _with_iso(candidate_fmts)
+    key = (source, col_name, tuple(candidate_fmts))
+    # Dates repeat heavily (dob per card, minute-resolution timestamps), so
+    # parse each distinct string once and broadcast back through the codes.
+    codes, uniques = pd.factorize(series)
+    raw = pd.Series(uniques).astype(str)
+    fmt = _FORMAT_CACHE.get(key) or detect_format(raw, fmts)
+    if fmt is None:
+        values = np.full(len(raw), np.datetime64("NaT", "ns"))
+    else:
+        values = pd.to_datetime(raw, format=fmt, errors="coerce").to_numpy(copy=True)
+
+    pos = np.flatnonzero(np.isnat(values))
+    if len(pos):
+        rest = raw[pos].str.replace(r"\s+", " ", regex=True).str.strip()
+        for other in fmts:
+            if not len(pos):
+                break
+            got = pd.to_datetime(rest, format=other, errors="coerce").to_numpy()
+            ok = ~np.isnat(got)
+            values[pos[ok]] = got[ok]
+            pos, rest = pos[~ok], rest[~ok]
+    # Missing inputs have code -1, which picks the trailing NaT.
+    values = np.append(values, np.datetime64("NaT", "ns"))
+    parsed = pd.Series(values[codes], index=series.index)
+
+    n_ok = len(parsed) - int(parsed.isna().sum())
+    if fmt is not None and n_ok >= 0.95 * len(parsed):
+        _FORMAT_CACHE[key] = fmt
+    print(f"{col_name}: parsed {n_ok} of {len(parsed)} rows with {fmt or 'no common format'}.")
+    return parsed
+
+
 def build_features(
     df: DataFrame,
     *,
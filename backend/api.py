@@ -1,32 +1,47 @@
 from __future__ import annotations
 
-from collections import defaultdict
-from copy import deepcopy
+from collections import Counter
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 
-import joblib
 import numpy as np
 import os
 import pandas as pd
-import uuid
-import io
 import base64
+import json
+import time
+import asyncio
 from bson.binary import Binary, UUID_SUBTYPE
 from dotenv import load_dotenv, find_dotenv
-from ensemble import EnsembleClassifier
 from bson.objectid import ObjectId
-from fastapi import Depends, FastAPI, HTTPException, Header, Path as ParamPath, Query
+from fastapi import Depends, FastAPI, HTTPException, Header, Path as ParamPath, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from features2 import build_features
+from model_serving import ServingModel, canary, load_canary
+import model_store
+import serving_pool
+import counts as counts_mod
+from counts import Counts
+from csv_export import EXPORT_COLUMNS, csv_chunks
+import facets
+from ingest import write_transactions
+import stream_ingest
+from indexes import ensure_indexes, explain_report
+from pagination import CursorError, keyset_page
+import projection
+import rollups as rollups_mod
+from rollups import Rollups
+import search
+import trans_nums
+import txn_dates
+from sequences import SequenceAllocator
+from write_behind import WriteBehind
 from jose import jwt
-from joblib import load as joblib_load
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import ReturnDocument
-from pydantic import BaseModel, Field
-from sklearn.pipeline import Pipeline
-from fastapi.responses import StreamingResponse
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from fastapi.responses import Response, StreamingResponse
 
 
 
@@ -40,31 +55,41 @@ def _safe_isnan(x):
 
 np.isnan = _safe_isnan
 
-MODEL_PATH = Path(__file__).parent / "model/global_rf.joblib"
+MODEL_DIR = Path(__file__).parent / "model"
+MODEL_STORE = Path(os.getenv("MODEL_STORE", MODEL_DIR / "store"))
+MODEL_WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "0"))
+CANARY_ROWS = load_canary(os.getenv("CANARY_PATH"))
 
-ART_PATH = Path(__file__).parent / "model" / "global_rf.joblib"
-initial_art_path = Path(__file__).parent / "model" / "fraud_rf.joblib"
-initial_art = joblib.load(initial_art_path)
-_art = joblib_load(ART_PATH)
-
-raw_pipe = _art["pipeline"]
-enc = _art["target_encoder"]
-merchant_rate = _art["merchant_rate"]
-state_rate = _art["state_rate"]
-global_rate = _art["global_rate"]
-feature_preproc = joblib.load(Path(__file__).parent / "model" / "feature_preprocessor.joblib")
-cat_ohe = joblib.load(Path(__file__).parent / "model" / "cat_encoder.joblib")
-
-fitted_prep = initial_art["prep"]
+THRESHOLD = float(os.getenv("FRAUD_THRESH", "0.31"))
+DETECT_CUTOFF = 0.64
+MAX_DETECT_BATCH = int(os.getenv("MAX_DETECT_BATCH", "1000"))
+MAX_BULK_ROWS = int(os.getenv("MAX_BULK_ROWS", "50000"))
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "2000"))
+
+
+SCORING_MODE = os.getenv("SCORING_MODE", "thread")
+SCORING_THREADS = int(os.getenv("SCORING_THREADS", "2"))
+SCORING_PROCESSES = int(os.getenv("SCORING_PROCESSES", str(os.cpu_count() or 1)))
+
+
+def _serve(bundle) -> ServingModel:
+    return ServingModel(
+        bundle,
+        mode=SCORING_MODE,
+        threads=SCORING_THREADS,
+        processes=SCORING_PROCESSES,
+        shared_dir=Path(os.getenv("SHARED_MODEL_DIR", serving_pool.default_shared_dir())),
+        max_batch=int(os.getenv("MICROBATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.getenv("MICROBATCH_MAX_WAIT_MS", "2")),
+        flat_forest=os.getenv("FLAT_FOREST", "1") == "1",
+        flat_max_rows=int(os.getenv("FLAT_FOREST_MAX_ROWS", "256")),
+    )
 
-if "target_encoder" in raw_pipe.named_steps:
-    steps_wo_te = [(n, s) for n, s in raw_pipe.steps if n != "target_encoder"]
-    fraud_model = Pipeline(steps_wo_te)
-else:
-    fraud_model = raw_pipe
 
-FRAUD_IDX = list(fraud_model.named_steps["clf"].classes_).index(1)
-THRESHOLD = float(os.getenv("FRAUD_THRESH", "0.31"))
+_t0 = time.perf_counter()
+serving = _serve(model_store.load(MODEL_STORE, MODEL_DIR))
+print(f"✓ Loaded model version {serving.version} in {time.perf_counter() - _t0:.2f}s")
 
 load_dotenv(find_dotenv())
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
@@ -79,6 +104,29 @@ ALL_TRANS_COLL = db["all_transaction"]
 FRAUD_TRANS_COLL = db["fraud_transaction"]
 CASE_COLL = db["cases"]
 COUNTERS_COLL = db["counters"]
+seq = SequenceAllocator(
+    COUNTERS_COLL,
+    block=int(os.getenv("SEQ_BLOCK", "1000")),
+    block_sizes={"staff_user": 1},
+)
+counts = Counts(
+    db,
+    ttl_ms=float(os.getenv("COUNTS_CACHE_MS", "1000")),
+    reconcile_s=float(os.getenv("COUNTS_RECONCILE_SECONDS", "0")),
+)
+rollups = Rollups(db)
+writer = WriteBehind(
+    db,
+    seq,
+    flush_rows=int(os.getenv("WRITE_BEHIND_ROWS", "500")),
+    flush_ms=float(os.getenv("WRITE_BEHIND_MS", "100")),
+    max_buffer=int(os.getenv("WRITE_BEHIND_BUFFER", "10000")),
+    counts=counts,
+    rollups=rollups,
+    retries=int(os.getenv("WRITE_BEHIND_RETRIES", "3")),
+    retry_ms=float(os.getenv("WRITE_BEHIND_RETRY_MS", "200")),
+    dead_letter_file=os.getenv("WRITE_BEHIND_DEAD_LETTER_FILE", "write_behind_dead_letter.ndjson"),
+)
 app = FastAPI(title="Credit-Card Fraud API")
 app.add_middleware(
     CORSMiddleware,
@@ -87,6 +135,27 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+@app.on_event("startup")
+async def start_batcher():
+    serving.start()
+    writer.start()
+    counts.start()
+    if MODEL_WATCH_SECONDS > 0:
+        _spawn(watch_model(), "Model watcher")
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await serving.close()
+    await writer.stop()
+    await counts.stop()
+
+@app.get("/metrics/scoring", response_model=dict)
+async def scoring_metrics():
+    return {"model_version": serving.version, **serving.batcher.metrics()}
+
+@app.get("/metrics/writes", response_model=dict)
+async def write_metrics():
+    return writer.metrics()
 @app.post("/setup-database", tags=["Database Setup"])
 async def setup_database():
 
@@ -201,7 +270,7 @@ async def setup_database():
         # --- Initial fraud_transaction (check by record_id: 9) ---
         fraud_trans_doc = {
             "_id": ObjectId("688b3b51b551362e4bca14bd"),
-            "trans_num": "50e840-e29b-41d4-a716-446655440000",
+            "trans_num": Binary(base64.b64decode("VQ6EAOKbQdSnFkRmVUQAAA=="), UUID_SUBTYPE),
             "cc_num": 5454545454545454,
             "amt": 200,
             "merchant": "AMAZON",
@@ -258,7 +327,7 @@ async def setup_database():
             "merch_long": -122.4007,
             "is_fraud": 0,
             "fraud_score": 0.92,
-            "txn_ids": ["550e8400-e29b-41d4-a716-446655440000"],
+            "txn_ids": [Binary(base64.b64decode("VQ6EAOKbQdSnFkRmVUQAAA=="), UUID_SUBTYPE)],
             "case_id": 1,
             "status": "closed",
             "created_at": datetime(2025, 7, 30, 16, 38, 28, 282000, tzinfo=timezone.utc)
@@ -268,12 +337,20 @@ async def setup_database():
             seed_results.append("Created initial case (case_id: 1)")
         else:
             seed_results.append("case (case_id: 1) already exists")
+        print("--- 3. Creating indexes ---")
+        index_results = await ensure_indexes(db)
+        print("--- 4. Reconciling counts ---")
+        await counts.reconcile()
+        print("--- 5. Rebuilding dashboard rollups ---")
+        rollup_results = await rollups.rebuild()
         return {
             "message": "Database setup check completed!",
             "database": DB_NAME,
             "collections_created": created_list,
             "collections_already_exist": existing_list,
-            "seeding_results": seed_results
+            "seeding_results": seed_results,
+            "indexes": index_results,
+            "rollups": rollup_results,
         }
 
     except Exception as e:
@@ -282,12 +359,6 @@ def create_token(uid: str) -> str:
     payload = {"uid": uid, "exp": datetime.now(timezone.utc) + timedelta(minutes=60)}
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
-def _uuid_binary(txn_id: str):
-    try:
-        return Binary(uuid.UUID(txn_id).bytes, UUID_SUBTYPE)
-    except Exception:
-        return None
-
 async def current_user(authorization: str = Header(...)):
     try:
         token = authorization.replace("Bearer ", "")
@@ -295,18 +366,40 @@ async def current_user(authorization: str = Header(...)):
     except Exception:
         raise HTTPException(401, "Invalid or expired token")
 
-async def next_seq(name: str) -> int:
-    doc = await db.counters.find_one_and_update(
-        {"_id": name},
-        {"$inc": {"seq": 1}},
-        upsert=True,
-        return_document=ReturnDocument.AFTER,
+async def _list_total(coll, query: dict, count: str) -> Optional[int]:
+    # "cached" reads the maintained counters, "estimated" collection metadata;
+    # both only apply without a filter and fall back to an exact count.
+    if count == "none":
+        return None
+    if count == "cached" and not query:
+        return await counts.get(coll.name)
+    if count == "estimated" and not query:
+        return await coll.estimated_document_count()
+    return await coll.count_documents(query)
+
+async def _cached_case_total(status: Optional[str]) -> int:
+    if status not in ("open", "investigating"):
+        return await counts.get(counts_mod.key("cases", "status", status) if status else "cases")
+    # The open tab only shows cases opened today; older open ones are listed
+    # as investigating. Today's open cases are a short range on status_created.
+    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    open_today = await db.cases.count_documents({"status": "open", "created_at": {"$gte": today_start}})
+    if status == "open":
+        return open_today
+    return (
+        await counts.get(counts_mod.key("cases", "status", "investigating"))
+        + await counts.get(counts_mod.key("cases", "status", "open"))
+        - open_today
     )
-    return doc["seq"]
+
+async def next_seq(name: str) -> int:
+    return await seq.next(name)
 
 
 class TxnIn(BaseModel):
-    trans_date_trans_time: str
+    # Optional so /detect/batch can score a row dated by unix_time alone (see
+    # ModelBundle.unix_time_offset); /detect stores the row and requires it.
+    trans_date_trans_time: Optional[str] = None
     cc_num: int
     merchant: str
     category: str
@@ -335,7 +428,9 @@ class StaffUserBase(BaseModel):
 
 class CaseListOut(BaseModel):
     items: List[Case]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 class StaffListOut(BaseModel):
     items: List[StaffUserOut]
@@ -343,7 +438,9 @@ class StaffListOut(BaseModel):
     
 class TxnListOut(BaseModel):
     items: List[TxnFull]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
     
 class StaffUserCreate(StaffUserBase):
     pass
@@ -365,6 +462,14 @@ class DetectOut(BaseModel):
     is_fraud: int
     score: Optional[float] = None
 
+class DetectBatchItem(BaseModel):
+    is_fraud: Optional[int] = None
+    score: Optional[float] = None
+    error: Optional[str] = None
+
+class DetectBatchOut(BaseModel):
+    items: List[DetectBatchItem]
+
 class TxnFull(BaseModel):
     id: Optional[int] = None
     txn_id: str = Field(alias="trans_num")
@@ -390,11 +495,38 @@ class TxnFull(BaseModel):
     merch_long: float
     is_fraud: int = 0
     fraud_score: Optional[float] = None
+    predicted_fraud: Optional[int] = None
+
+    @field_validator("trans_time", mode="before")
+    @classmethod
+    def _display_time(cls, v):
+        # Stored as a date; shown the way rows are entered.
+        return txn_dates.display(v)
 
     class Config:
         populate_by_name = True
         extra = "ignore"
 
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+class BulkIngestOut(BaseModel):
+    received: int
+    inserted: int
+    errors: List[BulkRowError]
+
+class IngestOut(BaseModel):
+    job: Optional[str] = None
+    offset: int
+    rows: int
+    inserted: int
+    errors: int
+    elapsed_s: float
+    rows_per_s: float
+    model_version: str
+    sample_errors: List[BulkRowError]
+
 class StaffUserIn(BaseModel):
     email: str
     password: str
@@ -428,10 +560,50 @@ class Case(BaseModel):
     merch_long: float
     is_fraud: Literal[0, 1]
     fraud_score: Optional[float] = None
+    predicted_fraud: Optional[int] = None
+
+    @field_validator("trans_date_trans_time", mode="before")
+    @classmethod
+    def _display_time(cls, v):
+        # Stored as a date; shown the way rows are entered.
+        return txn_dates.display(v)
 
     class Config:
         extra = "ignore"
 
+TXN_SHAPE = projection.Shape(TxnFull)
+CASE_SHAPE = projection.Shape(Case)
+
+def _fields(shape: projection.Shape, fields: Optional[str]) -> List[str]:
+    try:
+        return shape.select(fields)
+    except projection.FieldError as e:
+        raise HTTPException(400, str(e))
+
+def _lean(payload) -> Response:
+    # Rows are our own documents: skip response_model validation and encode them directly.
+    return Response(projection.dumps(payload), media_type="application/json")
+
+FIELDS_QUERY = Query(None, description="Comma-separated fields to return (default: all), e.g. trans_date_trans_time,amt,is_fraud")
+FORMAT_QUERY = Query("rows", description="rows: an object per row; columns: an array per field, keyed by field name")
+
+class BulkCaseIn(BaseModel):
+    txn_ids: List[str] = Field(min_length=1, max_length=MAX_BULK_ROWS)
+    status: Literal["open", "investigating", "closed"]
+    # All or nothing in one multi-document transaction; needs a replica set.
+    transaction: bool = False
+
+class BulkCaseResult(BaseModel):
+    txn_id: str
+    outcome: Literal["updated", "not_found", "error"]
+    cases: int
+
+class BulkCaseOut(BaseModel):
+    matched: int
+    fraud_removed: int
+    results: List[BulkCaseResult]
+    errors: Dict[str, str]
+
 class AuthOut(BaseModel):
     token: str
     user_name: str
@@ -462,100 +634,233 @@ async def login(body: StaffUserIn):
         "role": user["role"]
     }
 
+def _dated(doc: dict) -> dict:
+    """``doc`` ready to store: time as a date (422 if it does not parse) plus search fields."""
+    try:
+        return search.add_shadow_fields(txn_dates.normalize(doc))
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
 @app.post("/detect", response_model=DetectOut)
 async def detect(txn: TxnIn, uid=Depends(current_user)):
-   
-    df_raw = pd.DataFrame([txn.model_dump()])
-    df_raw["is_fraud"] = 0
-    X_proc, _, _ = build_features(
-        df_raw,
-        training=False,
-        preprocessor=feature_preproc,
-        te=enc,
-        cat_encoder=cat_ohe,
-    )
-    df_proc = pd.DataFrame(X_proc, columns=feature_preproc.get_feature_names_out())
-    df_proc["state"] = df_raw["state"].values
-    df_proc["state_risk"] = df_proc["state"].map(state_rate).fillna(global_rate)
-    df_proc = df_proc.drop(columns=["state"])
-    expected_cols = [col for _, _, cols in fitted_prep.transformers_ for col in cols]
-    missing = [c for c in expected_cols if c not in df_proc.columns]
-    extra = [c for c in df_proc.columns if c not in expected_cols]
-    if missing:
-        for col in missing:
-            df_proc[col] = np.nan
-    if extra:
-        df_proc = df_proc.drop(columns=extra)
-    df_proc = df_proc[expected_cols]
-    proba = fraud_model.predict_proba(df_proc)[0, FRAUD_IDX]
-    y_pred = int(proba >= 0.64)
-    doc = txn.model_dump()
+    raw = txn.model_dump()
+    doc = _dated(dict(raw))
+    with serving.lease() as m:
+        vec = m.row_scorer.transform(raw) if m.row_scorer is not None else None
+        if vec is not None:
+            proba = float(await m.batcher.submit(vec))
+        else:
+            df_proc = await m.batcher.run(m.features_frame, raw)
+            proba = float((await m.batcher.run(m.score_frame, df_proc))[0])
+    y_pred = int(proba >= DETECT_CUTOFF)
     doc.update(
-        id=await next_seq("transactions"),
-        trans_num=Binary(uuid.uuid4().bytes, UUID_SUBTYPE),
+        trans_num=trans_nums.new(),
         is_fraud=y_pred,
+        predicted_fraud=y_pred,
         fraud_score=proba,
         user_id=uid,
     )
+    # Ids and the inserts into all/new/fraud_transaction and cases happen in the writer's next flush.
+    await writer.put(doc)
     return {"is_fraud": y_pred, "score": proba}
 
 
+def _score_batch(m: ServingModel, rows: List[dict]) -> List[dict]:
+    items = [
+        {"error": "Unparseable trans_date_trans_time or dob"} for _ in rows
+    ]
+    try:
+        kept, probas = m.score_raw(pd.DataFrame(rows))
+    except ValueError as e:
+        return [{"error": str(e)} for _ in rows]
+
+    for i, proba in zip(kept, probas):
+        items[i] = {"is_fraud": int(proba >= DETECT_CUTOFF), "score": float(proba)}
+    return items
+
+@app.post("/detect/batch", response_model=DetectBatchOut)
+async def detect_batch(txns: List[TxnIn], uid=Depends(current_user)):
+    if len(txns) > MAX_DETECT_BATCH:
+        raise HTTPException(413, f"Batch too large: {len(txns)} > {MAX_DETECT_BATCH}")
+    if not txns:
+        return {"items": []}
+    with serving.lease() as m:
+        items = await m.batcher.run(_score_batch, m, [t.model_dump() for t in txns])
+    return {"items": items}
+
+
+_reload_lock = asyncio.Lock()
+# Fire-and-forget tasks; the loop only keeps weak references to them.
+_background: set = set()
+
+
+def _spawn(coro, what: str):
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(lambda t: _finished(t, what))
+
+
+def _finished(task: asyncio.Task, what: str):
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️  {what} failed: {task.exception()!r}")
+
+
+async def reload_model(version: Optional[str] = None, force: bool = False) -> dict:
+    """Load, canary-check and swap in a model; requests already running finish on the old one."""
+    global serving
+    async with _reload_lock:
+        t0 = time.perf_counter()
+        if version is None:
+            bundle = await asyncio.to_thread(model_store.load, MODEL_STORE, MODEL_DIR)
+        else:
+            bundle = await asyncio.to_thread(model_store.load_version, MODEL_STORE, version)
+        if bundle.version == serving.version and not force:
+            return {"reloaded": False, "version": serving.version}
+        new = await asyncio.to_thread(_serve, bundle)
+        load_seconds = time.perf_counter() - t0
+        try:
+            report = await asyncio.to_thread(canary, new, CANARY_ROWS)
+        except Exception:
+            await new.close()
+            raise
+        new.start()
+        old, serving = serving, new
+        _spawn(old.close(), f"Closing model {old.version}")
+        print(f"✓ Swapped model {old.version} -> {new.version} (loaded in {load_seconds:.2f}s)")
+        return {
+            "reloaded": True,
+            "version": new.version,
+            "previous_version": old.version,
+            "load_seconds": round(load_seconds, 3),
+            "canary": report,
+        }
+
+
+async def watch_model():
+    token = await asyncio.to_thread(model_store.watch_token, MODEL_STORE, MODEL_DIR)
+    while True:
+        await asyncio.sleep(MODEL_WATCH_SECONDS)
+        new_token = await asyncio.to_thread(model_store.watch_token, MODEL_STORE, MODEL_DIR)
+        if new_token is None or new_token == token:
+            continue
+        # Record the token even on failure so a broken artifact is not retried every tick.
+        token = new_token
+        try:
+            await reload_model()
+        except Exception as e:
+            print(f"⚠️  Model reload failed, still serving {serving.version}: {e}")
+
+
+async def require_admin(uid=Depends(current_user)):
+    user = await STAFF_COLL.find_one({"_id": ObjectId(uid)}) if ObjectId.is_valid(uid) else None
+    if not user or user.get("role") != "admin":
+        raise HTTPException(403, "Admin role required")
+    return uid
+
+@app.get("/admin/model", response_model=dict)
+async def model_info(uid=Depends(require_admin)):
+    return {
+        "version": serving.version,
+        "loaded_at": datetime.fromtimestamp(serving.loaded_at, timezone.utc).isoformat(),
+        "row_scorer": serving.row_scorer is not None,
+        "scoring_mode": SCORING_MODE,
+        "watch_seconds": MODEL_WATCH_SECONDS,
+    }
+
+@app.post("/admin/model/reload", response_model=dict)
+async def model_reload(
+    version: Optional[str] = Query(None, pattern="^[0-9a-f]{16}$"),
+    force: bool = False,
+    uid=Depends(require_admin),
+):
+    try:
+        return await reload_model(version, force)
+    except FileNotFoundError as e:
+        raise HTTPException(404, f"Model not found: {e}")
+    except ValueError as e:
+        raise HTTPException(422, f"Model rejected: {e}")
+
+@app.post("/admin/counts/reconcile", response_model=dict)
+async def reconcile_counts(uid=Depends(require_admin)):
+    """Recount every tracked total and correct the drifted ones (see counts.py for scheduling)."""
+    return {"drift": await counts.reconcile()}
+
+@app.post("/admin/rollups/rebuild", response_model=dict)
+async def rebuild_rollups(uid=Depends(require_admin)):
+    """Recompute the dashboard rollups from cases, e.g. after writes that bypassed the API."""
+    return await rollups.rebuild()
+
+@app.get("/admin/indexes", response_model=dict)
+async def index_report(
+    verbosity: Literal["queryPlanner", "executionStats"] = "queryPlanner",
+    uid=Depends(require_admin),
+):
+    """explain() every query shape the API issues and flag the ones not served by an index."""
+    rows = await explain_report(db, verbosity)
+    return {
+        "queries": rows,
+        "unindexed": [r["endpoint"] for r in rows if not r.get("uses_index")],
+        "in_memory_sorts": [r["endpoint"] for r in rows if r.get("in_memory_sort")],
+    }
+
 @app.post("/cases", response_model=Case)
 async def create_case(body: Case, uid=Depends(current_user)): 
-    doc = body.model_dump(exclude={"case_id", "status", "created_at"})
+    doc = _dated(body.model_dump(exclude={"case_id", "status", "created_at"}))
+    doc["txn_ids"] = [trans_nums.to_binary(t) for t in doc["txn_ids"]]
+    if doc.get("trans_num"):
+        doc["trans_num"] = trans_nums.to_binary(doc["trans_num"])
     doc["case_id"] = await next_seq("cases")
     doc["status"] = "open"
     doc["created_at"] = datetime.now(timezone.utc)
     await db.cases.insert_one(doc)
-    return Case(**doc)
+    await counts.add(counts_mod.deltas_for("cases", [doc]))
+    await rollups.add(rollups_mod.deltas_for([doc]))
+    return _lean(CASE_SHAPE.rows([doc], CASE_SHAPE.keys)[0])
 
 @app.get("/cases/timeseries", response_model=list[dict])
 async def cases_timeseries(
     granularity: str = Query("month", enum=["day", "month", "year"]),
+    start: Optional[datetime] = Query(None, description="Only cases on or after this day"),
+    end: Optional[datetime] = Query(None, description="Only cases before this time"),
     uid=Depends(current_user) 
 ):
-    cursor = db.cases.find({}, {"trans_date_trans_time": 1, "is_fraud": 1})
-    counts = defaultdict(lambda: {"fraud_count": 0, "non_fraud_count": 0})
-    async for doc in cursor:
-        dt_str = doc.get("trans_date_trans_time")
-        if not dt_str:
-            continue
-        try:
-            dt = datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
-        except Exception:
-            try:
-                dt = datetime.fromisoformat(dt_str)
-            except Exception:
-                continue
-        if granularity == "day":
-            key = dt.strftime("%Y-%m-%d")
-        elif granularity == "month":
-            key = dt.strftime("%Y-%m")
-        elif granularity == "year":
-            key = dt.strftime("%Y")
-        else:
-            continue
-        if doc.get("is_fraud", 0) == 1:
-            counts[key]["fraud_count"] += 1
-        else:
-            counts[key]["non_fraud_count"] += 1
-    result = [
-        {"period": k, **v}
-        for k, v in sorted(counts.items())
-    ]
-    return result
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(400, "start must be before end")
+    series = await rollups.series(granularity, start, end)
+    return [{k: p[k] for k in ("period", "fraud_count", "non_fraud_count")} for p in series]
+
+@app.get("/cases/rollups", response_model=list[dict])
+async def cases_rollups(
+    granularity: str = Query("month", enum=["day", "month", "year"]),
+    start: Optional[datetime] = Query(None, description="Only cases on or after this day"),
+    end: Optional[datetime] = Query(None, description="Only cases before this time"),
+    state: Optional[str] = None,
+    category: Optional[str] = None,
+    merchant: Optional[str] = None,
+    uid=Depends(current_user)
+):
+    """Per-period fraud / non-fraud counts, amounts and score histograms from the rollups."""
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(400, "start must be before end")
+    return await rollups.series(granularity, start, end, state=state, category=category, merchant=merchant)
 
 @app.get("/cases", response_model=CaseListOut)
 async def list_cases(
     txn_id: Optional[str] = None,
     status: Optional[str] = None,
-    limit: int = 20,
+    limit: int = Query(20, ge=1, le=1000),
     offset: int = 0,
+    cursor: Optional[str] = None,
+    count: Literal["cached", "exact", "estimated", "none"] = "cached",
+    fields: Optional[str] = FIELDS_QUERY,
+    format: Literal["rows", "columns"] = FORMAT_QUERY,
     uid=Depends(current_user)
 ):
+    keys = _fields(CASE_SHAPE, fields)
     q: dict = {}
     if txn_id:
-        q["txn_ids"] = txn_id
+        q["txn_ids"] = trans_nums.to_binary(txn_id)
     
     if status:
         today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
@@ -572,18 +877,113 @@ async def list_cases(
     
             q["status"] = status
 
-    total_count = await db.cases.count_documents(q)
-    cursor = db.cases.find(q).sort("created_at", -1).skip(offset).limit(limit)
-    out: list[Case] = []
-    
-    async for doc in cursor:
-        doc.pop("_id", None)
-        if isinstance(doc.get("trans_num"), Binary):
-            doc["trans_num"] = uuid.UUID(bytes=doc["trans_num"]).hex
-        
-        out.append(Case(**doc))
-        
-    return {"items": out, "total": total_count}
+    next_cursor = prev_cursor = None
+    if cursor or not offset:
+        try:
+            raw, next_cursor, prev_cursor = await keyset_page(
+                db.cases, q, "created_at", limit, cursor, CASE_SHAPE.projection(keys, "created_at"),
+            )
+        except CursorError as e:
+            raise HTTPException(400, str(e))
+    else:
+        # Legacy offset paging; cost grows with the offset.
+        raw = await db.cases.find(q, CASE_SHAPE.projection(keys)).sort([("created_at", -1), ("_id", -1)]).skip(offset).limit(limit).to_list(length=limit)
+    if count == "cached" and not txn_id:
+        total_count = await _cached_case_total(status)
+    else:
+        total_count = await _list_total(db.cases, q, count)
+    return _lean({
+        "items": CASE_SHAPE.items(raw, keys, format),
+        "total": total_count, "next_cursor": next_cursor, "prev_cursor": prev_cursor,
+    })
+
+def _case_fields(changes: dict) -> dict:
+    """Projection of what a case's counts and rollups depend on when ``changes`` is applied."""
+    fields = {"status", "is_fraud"}
+    if "is_fraud" in changes:
+        fields.update(rollups_mod.CASE_FIELDS)
+    return {f: 1 for f in fields}
+
+async def _move_case_counts(before: List[dict], changes: dict):
+    after = [{**d, **changes} for d in before]
+    deltas = counts_mod.deltas_for("cases", after)
+    deltas.subtract(counts_mod.deltas_for("cases", before))
+    await counts.add(deltas)
+    if "is_fraud" in changes:
+        await rollups.add(rollups_mod.merge(rollups_mod.deltas_for(after), rollups_mod.deltas_for(before, -1)))
+
+async def _update_cases(query: dict, changes: dict):
+    """``$set`` ``changes`` on matching cases and move their counts and rollups along."""
+    before = await db.cases.find(query, _case_fields(changes)).to_list(length=None)
+    res = await db.cases.update_many(query, {"$set": changes})
+    await _move_case_counts(before, changes)
+    return res
+
+async def _in_order(*aws):
+    # A session runs one operation at a time, so transactional writes cannot be gathered.
+    return [await a for a in aws]
+
+async def _bulk_case_update(txn_ids: List[str], changes: dict, rollback: bool, atomic: bool) -> dict:
+    """``changes`` on every case holding one of ``txn_ids``; with ``rollback`` also clear the transactions' fraud flag.
+
+    One read finds the cases, then each collection gets a single ``$in``
+    write: ``is_fraud: 0`` on the all/new buckets, a delete on
+    fraud_transaction, ``$set`` on the cases found. They run concurrently,
+    or in order inside one multi-document transaction with ``atomic``.
+    Counts and rollups move after the writes (after the commit).
+    """
+    # Stored id -> the spelling the caller sent (first one wins for repeats).
+    ids: Dict[Binary, str] = {}
+    for t in txn_ids:
+        ids.setdefault(trans_nums.to_binary(t), t)
+    in_txns = {"trans_num": {"$in": list(ids)}}
+    fields = {**_case_fields(changes), "txn_ids": 1}
+
+    async def run(session=None):
+        before = await db.cases.find({"txn_ids": {"$in": list(ids)}}, fields, session=session).to_list(length=None)
+        writes = {"cases": db.cases.update_many({"_id": {"$in": [c["_id"] for c in before]}}, {"$set": changes}, session=session)}
+        if rollback:
+            for bucket in ("all", "new"):
+                writes[COLL_MAP[bucket].name] = COLL_MAP[bucket].update_many(in_txns, {"$set": {"is_fraud": 0}}, session=session)
+            writes["fraud_transaction"] = COLL_MAP["fraud"].delete_many(in_txns, session=session)
+        if session is None:
+            results = await asyncio.gather(*writes.values(), return_exceptions=True)
+        else:
+            results = await _in_order(*writes.values())
+        return before, dict(zip(writes, results))
+
+    if atomic:
+        try:
+            async with await client.start_session() as session:
+                before, results = await session.with_transaction(run)
+        except OperationFailure as e:
+            if e.code == 20:  # IllegalOperation: standalone server
+                raise HTTPException(400, "transaction=true needs MongoDB running as a replica set")
+            raise
+    else:
+        before, results = await run()
+
+    errors = {name: str(r) for name, r in results.items() if isinstance(r, Exception)}
+    for name, r in errors.items():
+        print(f"⚠️  Bulk case update: {name} write failed: {r}")
+    removed = 0
+    fraud = results.get("fraud_transaction")
+    if fraud is not None and "fraud_transaction" not in errors:
+        removed = fraud.deleted_count
+        await counts.add({"fraud_transaction": -removed})
+    if "cases" not in errors:
+        await _move_case_counts(before, changes)
+
+    found = Counter(t for c in before for t in c.get("txn_ids", []))
+    return {
+        "matched": len(before),
+        "fraud_removed": removed,
+        "results": [
+            {"txn_id": t, "outcome": "error" if "cases" in errors else "updated" if found[b] else "not_found", "cases": found[b]}
+            for b, t in ids.items()
+        ],
+        "errors": errors,
+    }
 
 @app.post("/cases/rollback/{txn_id}/", response_model=dict)
 async def rollback_case_and_transaction(
@@ -591,106 +991,263 @@ async def rollback_case_and_transaction(
     status: Literal["open", "investigating", "closed"],
     uid=Depends(current_user) 
 ):
-    bin_id = _uuid_binary(txn_id)
-    for bucket in ("all", "new"):
-        await COLL_MAP[bucket].update_many(
-            {"trans_num": {"$in": [txn_id, bin_id] if bin_id else [txn_id]}},
-            {"$set": {"is_fraud": 0}}
-        )
-    await COLL_MAP["fraud"].delete_many(
-        {"trans_num": {"$in": [txn_id, bin_id] if bin_id else [txn_id]}}
-    )
-    res = await db.cases.update_many(
-        {"txn_ids": txn_id},
-        {"$set": {"status": status, "is_fraud": 0}}
-    )
-    if res.matched_count == 0:
+    res = await _bulk_case_update([txn_id], {"status": status, "is_fraud": 0}, True, False)
+    if res["errors"]:
+        raise HTTPException(500, f"Rollback failed: {res['errors']}")
+    if res["matched"] == 0:
         raise HTTPException(404, f"No case found for txn {txn_id}")
     return {"ok": 1}
 
+@app.post("/cases/rollback", response_model=BulkCaseOut)
+async def rollback_cases(body: BulkCaseIn, uid=Depends(current_user)):
+    """``POST /cases/rollback/{txn_id}/`` for many transactions in one write per collection."""
+    return await _bulk_case_update(body.txn_ids, {"status": body.status, "is_fraud": 0}, True, body.transaction)
+
+@app.patch("/cases/by-txn", response_model=BulkCaseOut)
+async def set_case_status_by_txns(body: BulkCaseIn, uid=Depends(current_user)):
+    """``PATCH /cases/by-txn/{txn_id}`` for many transactions in one write."""
+    return await _bulk_case_update(body.txn_ids, {"status": body.status}, False, body.transaction)
+
 @app.patch("/cases/by-txn/{txn_id}", response_model=dict)
 async def set_case_status_by_txn(
     txn_id: str,
     status: Literal["open", "investigating", "closed"],
     uid=Depends(current_user) 
 ):
-    res = await db.cases.update_many(
-        {"txn_ids": txn_id},
-        {"$set": {"status": status}}
-    )
+    res = await _update_cases({"txn_ids": trans_nums.to_binary(txn_id)}, {"status": status})
     if res.matched_count == 0:
         raise HTTPException(404, f"No case contains txn {txn_id}")
     return {"ok": 1}
 
+def _prepare_bulk(body: bytes):
+    """Parse a JSON array or NDJSON body into insertable documents plus per-row errors.
+
+    A malformed array fails the whole body; a malformed NDJSON line is an error for that row only.
+    """
+    text = body.decode("utf-8")
+    errors = {}
+    if text.lstrip().startswith("["):
+        rows = json.loads(text)
+    else:
+        rows = []
+        for line in (line for line in text.splitlines() if line.strip()):
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                errors[len(rows)] = f"Invalid JSON: {e}"
+                rows.append(None)
+    if len(rows) > MAX_BULK_ROWS:
+        raise HTTPException(413, f"Too many rows: {len(rows)} > {MAX_BULK_ROWS}")
+
+    docs, index = [], []
+    for i, row in enumerate(rows):
+        if i in errors:
+            continue
+        try:
+            txn = TxnFull.model_validate(row)
+        except ValidationError as e:
+            err = e.errors()[0]
+            errors[i] = f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}"
+            continue
+        try:
+            raw = search.add_shadow_fields(txn_dates.normalize(txn.model_dump(by_alias=True, exclude={"id"})))
+        except ValueError as e:
+            errors[i] = str(e)
+            continue
+        raw["trans_num"] = trans_nums.to_binary(raw["trans_num"])
+        docs.append(raw)
+        index.append(i)
+    return len(rows), docs, index, errors
+
+@app.post("/transactions/bulk", response_model=BulkIngestOut)
+async def add_txn_bulk(request: Request, uid=Depends(current_user)):
+    """Insert a JSON array or NDJSON stream of TxnFull rows in one pass per collection."""
+    body = await request.body()
+    try:
+        received, docs, index, errors = await asyncio.to_thread(_prepare_bulk, body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise HTTPException(400, f"Body is not a JSON array or NDJSON: {e}")
+    write_errors = await write_transactions(db, seq, docs, counts, rollups)
+    for k, msg in write_errors.items():
+        errors[index[k]] = msg
+    return {
+        "received": received,
+        "inserted": received - len(errors),
+        "errors": [{"row": i, "error": msg} for i, msg in sorted(errors.items())],
+    }
+
+@app.post("/transactions/ingest", response_model=IngestOut)
+async def ingest_stream(
+    request: Request,
+    format: Literal["csv", "ndjson"] = "csv",
+    job: Optional[str] = Query(None, max_length=200),
+    offset: Optional[int] = Query(None, ge=0),
+    chunk: int = Query(INGEST_CHUNK_ROWS, ge=1, le=MAX_BULK_ROWS),
+    uid=Depends(current_user),
+):
+    """Score and store a streamed CSV/NDJSON body chunk by chunk.
+
+    With ``job`` set, progress is checkpointed in ``ingest_jobs``; posting the
+    same file again under that job skips the rows already stored.
+    """
+    last = None
+    errors: List[dict] = []
+    with serving.lease() as m:
+        async for last in stream_ingest.ingest(
+            stream_ingest.body_lines(request.stream()), db, seq, m, fmt=format,
+            chunk_rows=chunk, job=job, offset=offset, cutoff=DETECT_CUTOFF, extra={"user_id": uid}, counts=counts,
+            rollups=rollups,
+        ):
+            errors = (errors + last["sample_errors"])[:stream_ingest.SAMPLE_ERRORS]
+            print(f"✓ Ingest {job or '-'}: offset {last['offset']}, {last['rows_per_s']:.0f} rows/s")
+    if last is None:
+        # Nothing past the checkpoint: report where the job already is.
+        saved = await db["ingest_jobs"].find_one({"_id": job}) if job else None
+        state = {k: (saved or {}).get(k, 0) for k in ("offset", "inserted", "errors")}
+        if offset is not None:
+            state["offset"] = offset
+        return {"job": job, **state, "rows": 0, "elapsed_s": 0.0, "rows_per_s": 0.0,
+                "model_version": m.version, "sample_errors": []}
+    return {**last, "job": job, "sample_errors": errors}
+
+@app.get("/transactions/ingest/{job}")
+async def ingest_status(job: str, uid=Depends(current_user)):
+    doc = await db["ingest_jobs"].find_one({"_id": job})
+    if doc is None:
+        raise HTTPException(404, "Unknown ingest job")
+    doc["job"] = doc.pop("_id")
+    return doc
+
 @app.post("/transactions/{bucket}", response_model=dict)
 async def add_txn(
     bucket: Literal["all", "new", "fraud"], 
     txn: TxnFull, 
     uid=Depends(current_user)
 ):
-    raw = txn.model_dump(by_alias=True, exclude={"id"})
-    trans_num_str = raw["trans_num"]
-    try:
-        raw["trans_num"] = Binary(uuid.UUID(trans_num_str).bytes, UUID_SUBTYPE)
-    except Exception:
-        pass
+    raw = _dated(txn.model_dump(by_alias=True, exclude={"id"}))
+    raw["trans_num"] = trans_nums.to_binary(raw["trans_num"])
     target_buckets = {"all", "new"}
     if txn.is_fraud == 1:
         target_buckets.add("fraud")
-    for b in target_buckets:
-        await insert_with_seq(f"{b}_transaction", raw)
+    # all_transaction's unique trans_num index turns a repeated id away before anything else is written.
+    try:
+        await insert_with_seq("all_transaction", raw)
+    except DuplicateKeyError:
+        raise HTTPException(409, f"Transaction {txn.txn_id} already exists")
+    writes = [insert_with_seq(f"{b}_transaction", raw) for b in target_buckets - {"all"}]
+    deltas = Counter({f"{b}_transaction": 1 for b in target_buckets})
     if txn.is_fraud == 1:
         case_doc = {
             **raw,
-            "txn_ids": [trans_num_str],
+            "txn_ids": [raw["trans_num"]],
             "case_id": await next_seq("cases"),
             "status": "open",
             "created_at": datetime.now(timezone.utc),
         }
-        await db.cases.insert_one(case_doc)
+        writes.append(db.cases.insert_one(case_doc))
+        deltas.update(counts_mod.deltas_for("cases", [case_doc]))
+    await asyncio.gather(*writes)
+    await counts.add(deltas)
+    if txn.is_fraud == 1:
+        await rollups.add(rollups_mod.deltas_for([case_doc]))
     return {"ok": 1}
 
 @app.get("/transactions/{bucket}", response_model=TxnListOut)
 async def list_txn(
     bucket: Literal["all", "new", "fraud"],
-    limit: int = 50,
-    offset: int = 0, 
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    count: Literal["cached", "exact", "estimated", "none"] = "cached",
+    fields: Optional[str] = FIELDS_QUERY,
+    format: Literal["rows", "columns"] = FORMAT_QUERY,
     uid=Depends(current_user) 
 ):
-    cursor = COLL_MAP[bucket].find().sort("trans_time", -1).skip(offset).limit(limit)
-    docs: List[TxnFull] = []
-    async for doc in cursor:
-        doc.pop("_id", None)
-        if isinstance(doc.get("trans_num"), Binary):
-            doc["trans_num"] = uuid.UUID(bytes=doc["trans_num"]).hex
-        docs.append(TxnFull(**doc))
-    total_count = await COLL_MAP[bucket].count_documents({})
-    return {"items": docs, "total": total_count}
-
-@app.get("/transactions/export/{category}")
-async def export_transactions(category: str, limit: int = 1000, uid=Depends(current_user)): # EDITED: Added protection
-    if category not in COLL_MAP:
+    coll = COLL_MAP[bucket]
+    keys = _fields(TXN_SHAPE, fields)
+    next_cursor = prev_cursor = None
+    if cursor or not offset:
+        try:
+            raw, next_cursor, prev_cursor = await keyset_page(
+                coll, {}, "trans_date_trans_time", limit, cursor, TXN_SHAPE.projection(keys, "trans_date_trans_time"),
+            )
+        except CursorError as e:
+            raise HTTPException(400, str(e))
+    else:
+        # Legacy offset paging; cost grows with the offset.
+        raw = await coll.find({}, TXN_SHAPE.projection(keys)).sort([("trans_date_trans_time", -1), ("_id", -1)]).skip(offset).limit(limit).to_list(length=limit)
+    total_count = await _list_total(coll, {}, count)
+    return _lean({
+        "items": TXN_SHAPE.items(raw, keys, format),
+        "total": total_count, "next_cursor": next_cursor, "prev_cursor": prev_cursor,
+    })
+
+def _day(value: Optional[str], name: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(400, f"{name} must be YYYY-MM-DD, got {value!r}")
+
+def analysis_filter(
+    merchant: Optional[str] = Query(None, description="Merchant name or its beginning, any case"),
+    category: Optional[str] = Query(None, description="Transaction category or its beginning, any case"),
+    state: Optional[str] = Query(None, description="State or its beginning, any case"),
+    min_amount: Optional[float] = Query(None, description="Minimum transaction amount"),
+    max_amount: Optional[float] = Query(None, description="Maximum transaction amount"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD), inclusive"),
+    match: Literal["prefix", "exact"] = Query("prefix", description="How merchant/category/state match"),
+) -> dict:
+    """Transaction filter shared by the fraud analysis and export endpoints."""
+    return search.analysis_query(
+        merchant, category, state, min_amount, max_amount,
+        _day(start_date, "start_date"), _day(end_date, "end_date"), match,
+    )
+
+@app.get("/transactions/export/{bucket}")
+async def export_transactions(
+    bucket: str,
+    query_filter: dict = Depends(analysis_filter),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum rows; every matching row when omitted"),
+    gzip: bool = Query(False, description="Send the CSV gzip-compressed as a .csv.gz"),
+    batch_size: int = Query(EXPORT_BATCH_ROWS, ge=1, le=100_000, description="Documents per cursor batch"),
+    uid=Depends(current_user),
+):
+    """Stream the bucket as CSV straight from the cursor; memory stays flat at any size."""
+    if bucket not in COLL_MAP:
         raise HTTPException(status_code=400, detail="Invalid category")
-    # ... (rest of the function remains the same)
-    cursor = COLL_MAP[category].find().limit(limit)
-    transactions = []
-    async for doc in cursor:
-        doc.pop("_id", None)
-        if isinstance(doc.get("trans_num"), Binary):
-            doc["trans_num"] = uuid.UUID(bytes=doc["trans_num"]).hex
-        transactions.append(doc)
-    if not transactions:
+    projection = {"_id": 0, **{c: 1 for c in EXPORT_COLUMNS}}
+    cursor = COLL_MAP[bucket].find(query_filter, projection).batch_size(batch_size)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    rows = cursor.__aiter__()
+    # Read one row up front: once the response starts it is too late for a 404.
+    try:
+        first = await rows.__anext__()
+    except StopAsyncIteration:
         raise HTTPException(status_code=404, detail="No transactions found")
-    df = pd.DataFrame(transactions)
-    csv_data = df.to_csv(index=False)
-    buffer = io.StringIO(csv_data)
-    buffer.seek(0)
-    return StreamingResponse(buffer, media_type="text/csv", headers={"Content-Disposition": f"attachment; filename={category}_transactions.csv"})
+
+    async def body():
+        try:
+            async for chunk in csv_chunks(first, rows, compress=gzip):
+                yield chunk
+        finally:
+            # Also runs when the client disconnects mid-download.
+            await cursor.close()
+
+    filename = f"{bucket}_transactions.csv" + (".gz" if gzip else "")
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 @app.get("/fraud/successRate", response_model=dict)
 async def get_fraud_success_rate(uid=Depends(current_user)): 
-    fraud_count = await db.cases.count_documents({"is_fraud": 1})
-    non_fraud_count = await db.cases.count_documents({"is_fraud": 0})
+    fraud_count = await counts.get("cases:is_fraud:1")
+    non_fraud_count = await counts.get("cases:is_fraud:0")
     total_cases = fraud_count + non_fraud_count
     if total_cases == 0:
         return {"success_rate": 0.0, "total_cases": 0}
@@ -707,64 +1264,35 @@ async def get_fraud_success_rate(uid=Depends(current_user)):
 
 @app.get("/transactions/fraud/analysis", response_model=List[TxnFull])
 async def get_fraud_analysis(
-    merchant: Optional[str] = Query(None, description="Filter by merchant name"),
-    category: Optional[str] = Query(None, description="Filter by transaction category"),
-    state: Optional[str] = Query(None, description="Filter by state"),
-    min_amount: Optional[float] = Query(None, description="Minimum transaction amount"),
-    max_amount: Optional[float] = Query(None, description="Maximum transaction amount"),
-    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    query_filter: dict = Depends(analysis_filter),
     limit: int = Query(1000, description="Maximum number of records to return"),
+    fields: Optional[str] = FIELDS_QUERY,
+    format: Literal["rows", "columns"] = FORMAT_QUERY,
     uid=Depends(current_user) 
 ):
-    query_filter = {}
-    if merchant:
-        query_filter["merchant"] = {"$regex": merchant, "$options": "i"}
-    if category:
-        query_filter["category"] = {"$regex": category, "$options": "i"}
-    if state:
-        query_filter["state"] = {"$regex": state, "$options": "i"}
-    if min_amount is not None:
-        query_filter["amt"] = {"$gte": min_amount}
-    if max_amount is not None:
-        if "amt" in query_filter:
-            query_filter["amt"]["$lte"] = max_amount
-        else:
-            query_filter["amt"] = {"$lte": max_amount}
-    if start_date:
-        try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            query_filter["trans_date_trans_time"] = {"$gte": start_dt.strftime("%Y-%m-%d %H:%M:%S")}
-        except ValueError:
-            pass
-    if end_date:
-        try:
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-            end_dt = end_dt.replace(hour=23, minute=59, second=59)
-            if "trans_date_trans_time" in query_filter:
-                query_filter["trans_date_trans_time"]["$lte"] = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                query_filter["trans_date_trans_time"] = {"$lte": end_dt.strftime("%Y-%m-%d %H:%M:%S")}
-        except ValueError:
-            pass
-    cursor = db.fraud_transaction.find(query_filter).sort("trans_date_trans_time", -1).limit(limit)
-    docs: List[TxnFull] = []
-    async for doc in cursor:
-        doc.pop("_id", None)
-        if isinstance(doc.get("trans_num"), Binary):
-            doc["trans_num"] = uuid.UUID(bytes=doc["trans_num"]).hex
-        docs.append(TxnFull(**doc))
-    return docs
-
-async def next_seq(coll_name: str) -> int:
-    res = await db.counters.find_one_and_update(
-        {"_id": coll_name}, {"$inc": {"seq": 1}}, upsert=True, return_document=True
-    )
-    return int(res["seq"])
+    """Matching fraud transactions newest first; with format=columns, one array per field."""
+    keys = _fields(TXN_SHAPE, fields)
+    cursor = db.fraud_transaction.find(query_filter, {"_id": 0, **TXN_SHAPE.projection(keys)})
+    docs = await cursor.sort("trans_date_trans_time", -1).limit(limit).to_list(length=None)
+    return _lean(TXN_SHAPE.items(docs, keys, format))
+
+@app.get("/transactions/fraud/facets", response_model=dict)
+async def get_fraud_facets(
+    query_filter: dict = Depends(analysis_filter),
+    top: int = Query(10, ge=1, le=100, description="Entries in each top merchants/categories/states list"),
+    granularity: Literal["day", "month", "year"] = "month",
+    uid=Depends(current_user),
+):
+    """What the analysis page charts, aggregated over every matching fraud transaction."""
+    pipeline = facets.pipeline(query_filter, top, granularity)
+    result = await db.fraud_transaction.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+    out = facets.shape(result[0] if result else {})
+    for end in ("first", "last"):
+        out["totals"][end] = txn_dates.display(out["totals"][end])
+    return out
 
 async def insert_with_seq(coll_name: str, doc: dict):
-    row = deepcopy(doc)
-    row["record_id"] = await next_seq(coll_name)
+    row = {**doc, "record_id": await next_seq(coll_name)}
     await db[coll_name].insert_one(row)
 
 @app.get("/staff", response_model=StaffListOut) 
@@ -773,7 +1301,7 @@ async def list_staff(
     limit: int = 20,
     uid=Depends(current_user) 
 ):
-    total_count = await STAFF_COLL.count_documents({})
+    total_count = await counts.get("staff_user")
     cursor = STAFF_COLL.find({}, {"_id": 0, "password": 0})
     docs = await cursor.skip(offset).limit(limit).to_list(length=limit)
     items = [StaffUserOut(**doc) for doc in docs]
@@ -796,6 +1324,7 @@ async def create_staff(body: StaffUserCreate, uid=Depends(current_user)):
  
     doc["id"] = await next_seq("staff_user")
     await STAFF_COLL.insert_one(doc)
+    await counts.add({"staff_user": 1})
     return StaffUserOut(**doc)
 
 @app.patch("/staff/{staff_id}", response_model=StaffUserOut)
@@ -824,5 +1353,6 @@ async def delete_staff(staff_id: int, uid=Depends(current_user)):
         raise HTTPException(400, "User cannot be deleted")
     if result.deleted_count == 0:
         raise HTTPException(404, f"Staff user {staff_id} not found")
+    await counts.add({"staff_user": -1})
     return {"ok": 1}
 
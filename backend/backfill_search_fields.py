@@ -0,0 +1,59 @@
+"""Add the folded merchant/category/state fields to documents stored before them.
+
+Usage: python backfill_search_fields.py [--batch 1000] [--dry-run]
+
+Fills ``merchant_lc``, ``category_lc`` and ``state_lc`` (see search.py) on
+transactions and cases that do not have them yet, in batches. Safe to stop
+and re-run: filled documents no longer match.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import find_dotenv, load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from search import SHADOW_FIELDS, add_shadow_fields
+
+COLLECTIONS = ["fraud_transaction", "cases", "all_transaction", "new_transaction"]
+
+
+async def backfill(coll, batch: int, dry_run: bool) -> dict:
+    todo = {"$or": [{shadow: {"$exists": False}} for shadow in SHADOW_FIELDS.values()]}
+    stats = {"pending": await coll.count_documents(todo), "filled": 0}
+    ops, t0 = [], time.perf_counter()
+    async for doc in coll.find(todo, {field: 1 for field in SHADOW_FIELDS}).batch_size(batch):
+        shadows = add_shadow_fields({f: doc.get(f) for f in SHADOW_FIELDS})
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {s: shadows[s] for s in SHADOW_FIELDS.values()}}))
+        if len(ops) == batch:
+            stats["filled"] += await _flush(coll, ops, dry_run)
+            ops = []
+    if ops:
+        stats["filled"] += await _flush(coll, ops, dry_run)
+    stats["elapsed_s"] = round(time.perf_counter() - t0, 1)
+    return stats
+
+
+async def _flush(coll, ops, dry_run: bool) -> int:
+    if dry_run:
+        return len(ops)
+    result = await coll.bulk_write(ops, ordered=False)
+    return result.modified_count
+
+
+async def main(args):
+    load_dotenv(find_dotenv())
+    db = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))[os.getenv("DB_NAME", "cc-fraud-web")]
+    for name in COLLECTIONS:
+        stats = await backfill(db[name], args.batch, args.dry_run)
+        verb = "would fill" if args.dry_run else "filled"
+        print(f"✓ {name}: {verb} {stats['filled']} of {stats['pending']} in {stats['elapsed_s']}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Count what would change without writing")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""explain() benchmark of /transactions/fraud/analysis filters, regex vs folded fields.
+
+Usage: python bench_analysis.py [--docs 2000000] [--db cc-fraud-bench] [--skip-load] [--repeat 3]
+
+Loads ``--docs`` synthetic fraud transactions (bench_indexes' generator, which
+adds the folded search fields) into a scratch database's fraud_transaction.
+Each analyst query is then explained twice with executionStats:
+- as the endpoint used to send it (unanchored case-insensitive $regex on
+  the raw fields), with only the indexes that existed for it;
+- as search.analysis_query builds it, after ensure_indexes.
+Never point --db at the application database: the load drops the collection.
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+
+from bench_indexes import _fill, _txns
+from indexes import _execution, _plan_nodes, _winning_plan, ensure_indexes
+from search import analysis_query
+
+YEAR = {"$gte": datetime(2020, 1, 1), "$lt": datetime(2021, 1, 1)}
+
+
+def _regex(value: str) -> dict:
+    return {"$regex": value, "$options": "i"}
+
+
+# (label, filter the endpoint used to send, filter it sends now)
+QUERIES = [
+    ("state", {"state": _regex("NY")}, analysis_query(state="NY", match="exact")),
+    ("category", {"category": _regex("shopping")}, analysis_query(category="shopping")),
+    ("merchant", {"merchant": _regex("Merchant 12")}, analysis_query(merchant="merchant 12")),
+    ("state + category + year",
+     {"state": _regex("NY"), "category": _regex("travel"), "trans_date_trans_time": YEAR},
+     analysis_query(state="NY", category="travel", match="exact",
+                    start=datetime(2020, 1, 1), end=datetime(2020, 12, 31))),
+    ("merchant + amount",
+     {"merchant": _regex("Merchant 12"), "amt": {"$gte": 100, "$lte": 500}},
+     analysis_query(merchant="merchant 12", min_amount=100, max_amount=500)),
+]
+
+
+async def explain(coll, query: dict) -> dict:
+    cmd = {"find": coll.name, "filter": query, "sort": {"trans_date_trans_time": -1}, "limit": 1000}
+    explain = await coll.database.command({"explain": cmd, "verbosity": "executionStats"})
+    stats = _execution(explain)
+    nodes = _plan_nodes(_winning_plan(explain))
+    return {
+        "ms": stats.get("executionTimeMillis"),
+        "docs": stats.get("totalDocsExamined"),
+        "keys": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+        "plan": ",".join(sorted({n["indexName"] for n in nodes if "indexName" in n})) or "COLLSCAN",
+    }
+
+
+async def best(coll, query: dict, repeat: int) -> dict:
+    runs = [await explain(coll, query) for _ in range(repeat)]
+    return min(runs, key=lambda r: r["ms"] or 0)
+
+
+async def main(args):
+    if args.db == os.getenv("DB_NAME", "cc-fraud-web"):
+        raise SystemExit(f"Refusing to benchmark in the application database {args.db!r}")
+    db = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))[args.db]
+    coll = db.fraud_transaction
+    if not args.skip_load:
+        rng = np.random.default_rng(0)
+        await _fill(coll, _txns(rng, args.docs, 1.0), args.docs)
+
+    # Before: the indexes the regex filters had to work with.
+    await coll.drop_indexes()
+    await coll.create_index([("trans_date_trans_time", DESCENDING), ("amt", ASCENDING)], name="trans_time_amt")
+    before = {label: await best(coll, old, args.repeat) for label, old, _ in QUERIES}
+    t0 = time.perf_counter()
+    await ensure_indexes(db)
+    print(f"✓ Indexes built in {time.perf_counter() - t0:.0f}s")
+    after = {label: await best(coll, new, args.repeat) for label, _, new in QUERIES}
+
+    print(f"\n{'query':<26} {'regex ms':>9} {'docs':>9} {'keys':>9} {'n':>5}   {'folded ms':>9} {'docs':>7} {'keys':>7} {'n':>5}  index")
+    for label, _, _ in QUERIES:
+        old, new = before[label], after[label]
+        print(
+            f"{label:<26} {old['ms']:>9} {old['docs']:>9} {old['keys']:>9} {old['returned']:>5}   "
+            f"{new['ms']:>9} {new['docs']:>7} {new['keys']:>7} {new['returned']:>5}  {new['plan']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2_000_000)
+    parser.add_argument("--db", default="cc-fraud-bench")
+    parser.add_argument("--skip-load", action="store_true", help="Reuse the data from a previous run")
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""Parity check and speed benchmark for the flat-array forest.
+
+Usage: python bench_flat_forest.py [--csv PATH] [--rows N]
+
+Builds features for N rows of the Kaggle test CSV, scores them with the
+per-classifier EnsembleClassifier loop and with its FlatForest export, fails
+if any probability differs by more than 1e-9 and prints per-row and
+per-batch timings for both.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import api
+from ensemble import EnsembleClassifier, FlatForest
+
+BATCH_SIZES = [1, 10, 100, 1000]
+
+
+def feature_matrix(csv_path, rows):
+    df_raw = pd.read_csv(csv_path, nrows=rows, low_memory=False)
+    df_raw = df_raw[list(api.TxnIn.model_fields)]
+    df_raw["is_fraud"] = 0
+    X_proc, _, _, kept = api.serving.build_features(df_raw, return_index=True)
+    df_proc = api.serving.model_frame(X_proc, df_raw.loc[kept, "state"].values)
+    return api.serving.fraud_model.named_steps["prep"].transform(df_proc)
+
+
+def timed(fn, X, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default=Path(__file__).parent / "TrainCode/data/fraudTest.csv")
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    clf = api.serving.clf
+    if not isinstance(clf, EnsembleClassifier):
+        print(f"✗ Loaded model is {type(clf).__name__}, not an EnsembleClassifier")
+        sys.exit(1)
+    ref = EnsembleClassifier(clf.clfs, clf.weights)
+
+    t0 = time.perf_counter()
+    flat = FlatForest.from_ensemble(ref)
+    print(f"Exported {flat.n_trees} trees / {len(flat.is_leaf)} nodes in {time.perf_counter() - t0:.2f}s")
+
+    X = feature_matrix(args.csv, args.rows)
+    diff = np.abs(ref.predict_proba(X) - flat.predict_proba(X)).max()
+    print(f"max |Δp| over {len(X)} rows = {diff:.3e}")
+
+    print(f"{'batch':>6} {'ensemble ms':>12} {'flat ms':>10} {'speedup':>8}")
+    for n in BATCH_SIZES:
+        Xb = X[:n]
+        t_ref = timed(ref.predict_proba, Xb)
+        t_flat = timed(flat.predict_proba, Xb)
+        print(f"{n:>6} {t_ref * 1000:>12.2f} {t_flat * 1000:>10.2f} {t_ref / t_flat:>7.1f}x")
+
+    if diff > 1e-9:
+        print("✗ Flat forest does not reproduce the ensemble probabilities")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Before/after benchmark of indexes.INDEXES on a synthetic database.
+
+Usage: python bench_indexes.py [--docs 10000000] [--db cc-fraud-bench] [--skip-load] [--repeat 3]
+
+Loads ``--docs`` synthetic transactions into all_transaction (new_transaction
+gets 10% of that, fraud_transaction and cases 2%, staff_user 1000 users) in a
+scratch database, then explains every API query shape with executionStats
+twice: once with only the _id indexes and once after ``ensure_indexes``.
+Prints server time and documents examined per query. Never point --db at the
+application database: the load drops the collections first.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from bson.binary import Binary, UUID_SUBTYPE
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import INDEXES, ensure_indexes, explain_report
+from search import add_shadow_fields
+
+STATES = ["NY", "CA", "IL", "TX", "AZ", "PA", "FL", "OH", "GA", "NC"]
+CATEGORIES = ["shopping_net", "food_dining", "gas_transport", "entertainment", "travel", "grocery_pos", "home", "misc_net"]
+BATCH = 10_000
+
+
+def _txns(rng, n: int, fraud_rate: float):
+    start = datetime(2019, 1, 1)
+    seconds = rng.integers(0, 2 * 365 * 86400, n)
+    amt = np.round(rng.lognormal(4, 1.2, n), 2)
+    is_fraud = (rng.random(n) < fraud_rate).astype(int)
+    for k in range(n):
+        when = start + timedelta(seconds=int(seconds[k]))
+        yield add_shadow_fields({
+            "trans_num": Binary(uuid.uuid4().bytes, UUID_SUBTYPE),
+            "cc_num": int(rng.integers(10**15, 10**16)),
+            "amt": float(amt[k]),
+            "merchant": f"fraud_Merchant {k % 700}",
+            "category": CATEGORIES[k % len(CATEGORIES)],
+            "trans_date_trans_time": when,
+            "first": "A", "last": "B", "gender": "MF"[k % 2], "street": "1 Main St", "city": "Town",
+            "state": STATES[k % len(STATES)], "zip": 10000 + k % 90000, "lat": 40.0, "long": -100.0,
+            "city_pop": 1000, "job": "Engineer", "dob": "1980-01-01",
+            "unix_time": int(when.replace(tzinfo=timezone.utc).timestamp()),
+            "merch_lat": 40.1, "merch_long": -100.1,
+            "is_fraud": int(is_fraud[k]), "fraud_score": float(rng.random()),
+        })
+
+
+async def _fill(coll, docs, total: int, extra=None):
+    await coll.drop()
+    batch, written, t0 = [], 0, time.perf_counter()
+    for i, doc in enumerate(docs):
+        batch.append({**doc, "record_id": i + 1, **(extra(i) if extra else {})})
+        if len(batch) == BATCH:
+            await coll.insert_many(batch, ordered=False)
+            written += len(batch)
+            batch = []
+            if written % (BATCH * 50) == 0:
+                print(f"  {coll.name}: {written}/{total} ({written / (time.perf_counter() - t0):.0f} docs/s)")
+    if batch:
+        await coll.insert_many(batch, ordered=False)
+    print(f"✓ {coll.name}: {total} docs in {time.perf_counter() - t0:.0f}s")
+
+
+async def load(db, docs: int):
+    rng = np.random.default_rng(0)
+    now = datetime.now(timezone.utc)
+    statuses = ["open", "investigating", "closed"]
+    await _fill(db.all_transaction, _txns(rng, docs, 0.02), docs)
+    await _fill(db.new_transaction, _txns(rng, docs // 10, 0.02), docs // 10)
+    await _fill(db.fraud_transaction, _txns(rng, docs // 50, 1.0), docs // 50)
+    await _fill(
+        db.cases, _txns(rng, docs // 50, 0.5), docs // 50,
+        extra=lambda i: {
+            "txn_ids": [uuid.uuid4().hex], "case_id": i + 1, "status": statuses[i % 3],
+            "created_at": now - timedelta(minutes=i),
+        },
+    )
+    await db.staff_user.drop()
+    await db.staff_user.insert_many([
+        {"email": f"user{i}@example.com", "password": "x", "user_name": f"user{i}", "role": "analyst", "id": i + 1}
+        for i in range(1000)
+    ])
+
+
+async def measure(db, repeat: int) -> dict:
+    best = {}
+    for _ in range(repeat):
+        for row in await explain_report(db, "executionStats"):
+            key = (row["endpoint"], row["collection"])
+            if key not in best or (row.get("time_ms") or 0) < (best[key].get("time_ms") or 0):
+                best[key] = row
+    return best
+
+
+async def main(args):
+    if args.db == os.getenv("DB_NAME", "cc-fraud-web"):
+        raise SystemExit(f"Refusing to benchmark in the application database {args.db!r}")
+    db = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))[args.db]
+    if not args.skip_load:
+        await load(db, args.docs)
+
+    for coll in INDEXES:
+        await db[coll].drop_indexes()
+    before = await measure(db, args.repeat)
+    t0 = time.perf_counter()
+    await ensure_indexes(db)
+    print(f"✓ Indexes built in {time.perf_counter() - t0:.0f}s")
+    after = await measure(db, args.repeat)
+
+    print(f"\n{'query':<52} {'collection':<18} {'before ms':>10} {'docs':>10} {'after ms':>9} {'docs':>8}  index")
+    for key, old in before.items():
+        new = after[key]
+        print(
+            f"{key[0][:52]:<52} {key[1]:<18} {old.get('time_ms', '-'):>10} {old.get('docs_examined', '-'):>10} "
+            f"{new.get('time_ms', '-'):>9} {new.get('docs_examined', '-'):>8}  {','.join(new.get('indexes', [])) or 'COLLSCAN'}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=10_000_000)
+    parser.add_argument("--db", default="cc-fraud-bench")
+    parser.add_argument("--skip-load", action="store_true", help="Reuse the data from a previous run")
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
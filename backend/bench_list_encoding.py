@@ -0,0 +1,80 @@
+"""CPU and payload size of a list page: validated models vs projection.Shape.
+
+Usage: python bench_list_encoding.py [--rows 50,1000] [--repeat 20]
+
+Builds synthetic transaction documents (bench_indexes' generator) and times
+the steps between the cursor and the response body. The "models" path is
+what /transactions/{bucket} used to do: TxnFull(**doc) per row, then
+FastAPI's response_model validation and serialization and a json.dumps.
+The other paths are the lean bodies for every field, for the table's
+columns, and for those columns with format=columns. No database is needed.
+"""
+import argparse
+import json
+import time
+import uuid
+
+import numpy as np
+from bson.binary import Binary
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from api import TXN_SHAPE, TxnFull, TxnListOut
+from bench_indexes import _txns
+from projection import dumps
+
+TABLE_FIELDS = "trans_num,trans_date_trans_time,amt,merchant,category,state,is_fraud,fraud_score"
+
+
+def models_body(docs) -> bytes:
+    items = []
+    for doc in docs:
+        doc = dict(doc)
+        doc.pop("_id", None)
+        if isinstance(doc.get("trans_num"), Binary):
+            doc["trans_num"] = uuid.UUID(bytes=doc["trans_num"]).hex
+        items.append(TxnFull(**doc))
+    payload = {"items": items, "total": len(docs), "next_cursor": None, "prev_cursor": None}
+    adapter = TypeAdapter(TxnListOut)
+    out = adapter.dump_python(adapter.validate_python(payload, from_attributes=True), mode="json", by_alias=True)
+    return json.dumps(jsonable_encoder(out)).encode()
+
+
+def lean_body(docs, fields=None, fmt="rows") -> bytes:
+    keys = TXN_SHAPE.select(fields)
+    return dumps({"items": TXN_SHAPE.items(docs, keys, fmt), "total": len(docs), "next_cursor": None, "prev_cursor": None})
+
+
+def timed(fn, repeat: int):
+    best, body = None, b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, len(body)
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    for n in (int(r) for r in args.rows.split(",")):
+        docs = list(_txns(rng, n, 0.5))
+        paths = [
+            ("models", lambda: models_body(docs)),
+            ("lean, all fields", lambda: lean_body(docs)),
+            ("lean, table fields", lambda: lean_body(docs, TABLE_FIELDS)),
+            ("lean, table, columns", lambda: lean_body(docs, TABLE_FIELDS, "columns")),
+        ]
+        print(f"\n{n} rows per page")
+        base_ms = None
+        for label, fn in paths:
+            ms, size = timed(fn, args.repeat)
+            base_ms = base_ms or ms
+            print(f"  {label:<22} {ms:8.2f} ms  {size / 1024:8.1f} KB  x{base_ms / ms:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="50,1000")
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
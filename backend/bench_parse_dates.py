@@ -0,0 +1,87 @@
+"""Parity check and benchmark for features2.parse_best against the old multi-format guesser.
+
+Usage: python bench_parse_dates.py [--csv PATH] [--rows N] [--single 2000]
+
+Parses trans_date_trans_time and dob of the whole CSV (fraudTrain.csv by
+default) with both implementations, fails if any value the old parser
+understood comes out different, and prints the bulk timings plus the
+one-row serving latency of each.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import features2
+from features2 import DOB_FORMATS, TXN_TIME_FORMATS, parse_best, parse_one
+
+COLUMNS = {"trans_date_trans_time": TXN_TIME_FORMATS, "dob": DOB_FORMATS}
+
+
+def legacy_parse_best(series, candidate_fmts):
+    # The previous implementation, minus the infer_datetime_format fallback
+    # that pandas 2 no longer accepts.
+    raw = series.astype(str).str.replace(r"\s+", " ", regex=True).str.strip()
+    best, best_na = None, len(raw) + 1
+    for fmt in candidate_fmts:
+        parsed = pd.to_datetime(raw, format=fmt, errors="coerce")
+        na_cnt = parsed.isna().sum()
+        if na_cnt < best_na:
+            best, best_na = parsed, na_cnt
+        if na_cnt <= 0.05 * len(raw):
+            break
+    return best
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def per_call_us(fn, values, fmts):
+    t0 = time.perf_counter()
+    for v in values:
+        fn(v, fmts)
+    return (time.perf_counter() - t0) / len(values) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default=Path(__file__).parent / "TrainCode/data/fraudTrain.csv")
+    parser.add_argument("--rows", type=int, default=None)
+    parser.add_argument("--single", type=int, default=2000, help="Rows for the one-row latency test")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, nrows=args.rows, usecols=list(COLUMNS), low_memory=False)
+    print(f"rows={len(df)}")
+
+    failed = False
+    for col, fmts in COLUMNS.items():
+        features2._FORMAT_CACHE.clear()
+        old, old_s = timed(legacy_parse_best, df[col], fmts)
+        new, new_s = timed(parse_best, df[col], fmts, col)
+        _, cached_s = timed(parse_best, df[col], fmts, col)
+
+        known = old.notna().to_numpy()
+        diff = int((old.to_numpy()[known] != new.to_numpy()[known]).sum())
+        gained = int((~known & new.notna().to_numpy()).sum())
+        print(
+            f"{col:>22}: old={old_s:.2f}s  new={new_s:.2f}s  cached={cached_s:.2f}s  "
+            f"({old_s / cached_s:.1f}x)  mismatches={diff}  newly_parsed={gained}"
+        )
+        failed |= diff > 0
+
+        sample = df[col].head(args.single).tolist()
+        old_us = per_call_us(lambda v, f: legacy_parse_best(pd.Series([v]), f), sample, fmts)
+        new_us = per_call_us(parse_one, sample, fmts)
+        print(f"{'':>22}  one row: old={old_us:.0f} us  parse_one={new_us:.1f} us")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Parity check and latency benchmark for the /detect row scorer.
+
+Usage: python bench_row_scorer.py [--csv PATH] [--rows N]
+
+Scores N rows of the Kaggle test CSV through both the build_features path and
+the compiled RowScorer, fails if any feature vector or probability differs
+or if the row scorer falls back on any row (every row of that CSV is one it
+should handle), and prints p50/p99 feature latency for each path.
+test_row_scorer.py checks the same parity on a small fitted model without
+the CSV.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import api
+
+TXN_FIELDS = list(api.TxnIn.model_fields)
+
+
+def pandas_vector(txn: dict) -> np.ndarray:
+    df_proc = api.serving.features_frame(txn)
+    return api.serving.fraud_model.named_steps["prep"].transform(df_proc)[0]
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return f"p50={np.percentile(ms, 50):.3f} ms  p99={np.percentile(ms, 99):.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default=Path(__file__).parent / "TrainCode/data/fraudTest.csv")
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    if api.serving.row_scorer is None:
+        print("✗ Row scorer is disabled for the loaded model")
+        sys.exit(1)
+
+    df = pd.read_csv(args.csv, nrows=args.rows, low_memory=False)
+    txns = df[TXN_FIELDS].to_dict("records")
+    clf = api.serving.clf
+
+    fast_t, slow_t = [], []
+    mismatches = fallbacks = 0
+    for txn in txns:
+        t0 = time.perf_counter()
+        vec = api.serving.row_scorer.transform(txn)
+        fast_t.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        ref = pandas_vector(txn)
+        slow_t.append(time.perf_counter() - t0)
+
+        if vec is None:
+            fallbacks += 1
+            continue
+        ref32 = ref.astype(np.float32)
+        p_fast = clf.predict_proba(vec[None, :])[0, api.serving.fraud_idx]
+        p_ref = clf.predict_proba(ref32[None, :])[0, api.serving.fraud_idx]
+        if not np.allclose(vec, ref32, rtol=1e-6, atol=1e-6, equal_nan=True) or abs(p_fast - p_ref) > 1e-9:
+            mismatches += 1
+
+    print(f"rows={len(txns)}  mismatches={mismatches}  fallbacks={fallbacks}")
+    print(f"row scorer     : {percentiles(fast_t)}")
+    print(f"build_features : {percentiles(slow_t)}")
+    if mismatches or fallbacks:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare API model start-up: eager joblib artifacts vs the mmap model store.
+
+Usage: python bench_startup.py [--repeat 3]
+
+Each variant runs in a fresh interpreter and reports wall time and peak RSS.
+Run ``python model_store.py export`` first so model/store has a CURRENT version.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).parent
+
+LEGACY = """
+import joblib, ensemble
+from pathlib import Path
+d = Path("model")
+joblib.load(d / "fraud_rf.joblib")
+joblib.load(d / "global_rf.joblib")
+joblib.load(d / "feature_preprocessor.joblib")
+joblib.load(d / "cat_encoder.joblib")
+"""
+
+STORE = """
+import model_store
+from pathlib import Path
+store = Path("model/store")
+model_store.load_version(store, model_store.current_version(store))
+"""
+
+PROBE = """
+import json, resource, time
+t0 = time.perf_counter()
+{body}
+print(json.dumps({{"seconds": time.perf_counter() - t0,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def run(body):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(body=body)],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, body in (("joblib (current)", LEGACY), ("model store (mmap)", STORE)):
+        runs = [run(body) for _ in range(args.repeat)]
+        best = min(r["seconds"] for r in runs)
+        rss = max(r["max_rss_mb"] for r in runs)
+        print(f"{name:<20} best={best:.2f}s  peak_rss={rss:.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
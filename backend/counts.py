@@ -0,0 +1,145 @@
+"""Document counts kept up to date by the API's write paths.
+
+Totals for list pages and dashboard counters are read from the small
+``stat_counts`` collection instead of counting the data collections on every
+request. Each write path reports what it changed as key deltas (``cases``,
+``cases:status:open``, ``cases:is_fraud:1``, ...) which ``add`` applies with
+one ``$inc`` bulk write. Reads come from an in-process snapshot refreshed at
+most every ``ttl_ms``.
+
+Deltas are best effort: a crash between a write and its ``$inc``, or a write
+that bypasses the API, makes the counters drift. ``reconcile`` recounts the
+data collections and applies the difference as another ``$inc``, so deltas
+that land while it runs are kept. It scans every tracked collection, so run
+it from one place: ``POST /admin/counts/reconcile`` or a scheduled
+
+    python counts.py reconcile
+
+rather than from every API worker (``reconcile_s`` is off by default).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterable, Mapping, Optional
+
+from dotenv import find_dotenv, load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+# Collections with a total, and the fields counted per value.
+TRACKED: Dict[str, tuple] = {
+    "all_transaction": (),
+    "new_transaction": (),
+    "fraud_transaction": (),
+    "cases": ("status", "is_fraud"),
+    "staff_user": (),
+}
+
+
+def key(coll: str, field: Optional[str] = None, value=None) -> str:
+    return coll if field is None else f"{coll}:{field}:{value}"
+
+
+def deltas_for(coll: str, docs: Iterable[dict], sign: int = 1) -> Counter:
+    """Deltas for adding (``sign=1``) or removing (``-1``) ``docs`` from ``coll``."""
+    out = Counter()
+    for doc in docs:
+        out[coll] += sign
+        for field in TRACKED.get(coll, ()):
+            out[key(coll, field, doc.get(field))] += sign
+    return out
+
+
+class Counts:
+    def __init__(self, db, ttl_ms: float = 1000.0, reconcile_s: float = 0.0):
+        self.coll = db["stat_counts"]
+        self.db = db
+        self.ttl = ttl_ms / 1000
+        self.reconcile_s = reconcile_s
+        self._snapshot: Dict[str, int] = {}
+        self._loaded = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def add(self, deltas: Mapping[str, int]):
+        ops = [UpdateOne({"_id": k}, {"$inc": {"n": v}}, upsert=True) for k, v in deltas.items() if v]
+        if not ops:
+            return
+        try:
+            await self.coll.bulk_write(ops, ordered=False)
+        except PyMongoError as e:
+            # Never fail the write that is being counted; reconcile repairs it.
+            print(f"⚠️  Count update failed, totals drift until the next reconcile: {e}")
+            return
+        for k, v in deltas.items():
+            if k in self._snapshot:
+                self._snapshot[k] += v
+
+    async def get(self, name: str) -> int:
+        if time.monotonic() - self._loaded > self.ttl:
+            self._snapshot = {doc["_id"]: int(doc["n"]) async for doc in self.coll.find()}
+            self._loaded = time.monotonic()
+        return self._snapshot.get(name, 0)
+
+    async def reconcile(self) -> Dict[str, dict]:
+        """Recount from the data collections; returns the keys that had drifted."""
+        drift: Dict[str, dict] = {}
+        for coll, fields in TRACKED.items():
+            exact = {coll: await self.db[coll].count_documents({})}
+            for field in fields:
+                async for row in self.db[coll].aggregate([{"$group": {"_id": f"${field}", "n": {"$sum": 1}}}]):
+                    exact[key(coll, field, row["_id"])] = row["n"]
+            # Read right after counting, so only deltas landing in between are off.
+            mine = {"$or": [{"_id": coll}, {"_id": {"$regex": f"^{re.escape(coll)}:"}}]}
+            stored = {doc["_id"]: int(doc["n"]) async for doc in self.coll.find(mine)}
+            fixes = {k: exact.get(k, 0) - stored.get(k, 0) for k in set(stored) | set(exact)}
+            fixes = {k: v for k, v in fixes.items() if v}
+            if fixes:
+                await self.coll.bulk_write(
+                    [UpdateOne({"_id": k}, {"$inc": {"n": v}}, upsert=True) for k, v in fixes.items()],
+                    ordered=False,
+                )
+                drift.update({k: {"stored": stored.get(k, 0), "exact": exact.get(k, 0)} for k in fixes})
+        if drift:
+            print(f"⚠️  Reconciled {len(drift)} drifted counts: {sorted(drift)}")
+        self._loaded = 0.0
+        return drift
+
+    def start(self):
+        if self._task is None and self.reconcile_s > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except PyMongoError as e:
+                print(f"⚠️  Count reconcile failed: {e}")
+            await asyncio.sleep(self.reconcile_s)
+
+
+async def main(args):
+    load_dotenv(find_dotenv())
+    db = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))[os.getenv("DB_NAME", "cc-fraud-web")]
+    drift = await Counts(db).reconcile()
+    print(f"✓ Counts reconciled, {len(drift)} had drifted")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["reconcile"])
+    asyncio.run(main(parser.parse_args()))
@@ -1,4 +1,6 @@
+import hashlib
 import numpy as np
+from pathlib import Path
 
 class EnsembleClassifier:
     def __init__(self, clfs, weights):
@@ -6,8 +8,167 @@ class EnsembleClassifier:
         self.weights = weights
         self.classes_ = self.clfs[0].classes_ if self.clfs else np.array([0, 1])
 
+    def compile(self, max_rows=256, flat=None):
+        """Score batches of up to ``max_rows`` rows with a FlatForest copy of the trees.
+
+        ``flat`` is an already built copy, e.g. one mapped from the model store.
+        """
+        self.flat_ = flat if flat is not None else FlatForest.from_ensemble(self)
+        self.flat_max_rows = max_rows
+        return self
+
     def predict_proba(self, X):
+        flat = getattr(self, "flat_", None)
+        if flat is not None and X.shape[0] <= self.flat_max_rows:
+            return flat.predict_proba(X)
         probs = np.zeros((X.shape[0], 2))
         for clf, w in zip(self.clfs, self.weights):
             probs += w * clf.predict_proba(X)
-        return probs
\ No newline at end of file
+        return probs
+
+
+def _trees_of(clf):
+    if hasattr(clf, "estimators_"):
+        return [est.tree_ for est in clf.estimators_]
+    if hasattr(clf, "tree_"):
+        return [clf.tree_]
+    raise NotImplementedError(f"Cannot flatten {type(clf).__name__}: no sklearn trees")
+
+
+class FlatForest:
+    """Every tree of an (ensemble of) sklearn forests packed into flat node arrays.
+
+    ``children`` holds the global ``(left, right)`` pair of each node, leaves
+    point at themselves, and every leaf value already carries its classifier
+    weight divided by the number of trees, so ``predict_proba`` is a single
+    traversal plus a sum over trees.
+    """
+
+    ROW_BLOCK = 1_000_000
+    COMPACT_EVERY = 3
+    ARRAYS = ("feature", "threshold", "children", "is_leaf", "value", "roots", "classes_")
+
+    def __init__(self, feature, threshold, children, is_leaf, value, roots, classes, missing_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.is_leaf = is_leaf
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.missing_left = missing_left
+
+    @classmethod
+    def from_ensemble(cls, model):
+        if isinstance(model, EnsembleClassifier):
+            clfs, weights = model.clfs, model.weights
+        else:
+            clfs, weights = [model], [1.0]
+        classes = np.asarray(model.classes_)
+
+        feature, threshold, children, is_leaf, value, roots, missing = [], [], [], [], [], [], []
+        offset = 0
+        for clf, w in zip(clfs, weights):
+            if not np.array_equal(clf.classes_, classes):
+                raise NotImplementedError("All classifiers must share the same classes_")
+            trees = _trees_of(clf)
+            for t in trees:
+                leaf = t.children_left == -1
+                ids = np.arange(t.node_count) + offset
+                feature.append(np.where(leaf, 0, t.feature))
+                threshold.append(t.threshold.astype(np.float64))
+                children.append(np.stack([
+                    np.where(leaf, ids, t.children_left + offset),
+                    np.where(leaf, ids, t.children_right + offset),
+                ], axis=1))
+                is_leaf.append(leaf)
+                v = t.value[:, 0, :].astype(np.float64)
+                norm = v.sum(axis=1, keepdims=True)
+                norm[norm == 0.0] = 1.0
+                value.append(v / norm * (w / len(trees)))
+                mgl = getattr(t, "missing_go_to_left", None)
+                missing.append(
+                    np.zeros(t.node_count, dtype=bool) if mgl is None else np.asarray(mgl, dtype=bool)
+                )
+                roots.append(offset)
+                offset += t.node_count
+
+        missing_left = np.concatenate(missing)
+        return cls(
+            np.concatenate(feature).astype(np.intp),
+            np.concatenate(threshold),
+            np.concatenate(children).ravel().astype(np.int32),
+            np.concatenate(is_leaf),
+            np.concatenate(value),
+            np.asarray(roots, dtype=np.int32),
+            classes,
+            missing_left if missing_left.any() else None,
+        )
+
+    def save(self, path):
+        """Write one uncompressed ``.npy`` per array so the files can be memory-mapped."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        if self.missing_left is not None:
+            np.save(path / "missing_left.npy", self.missing_left)
+
+    def digest(self):
+        h = hashlib.sha256()
+        for name in self.ARRAYS:
+            h.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+        return h.hexdigest()[:16]
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        path = Path(path)
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        missing = path / "missing_left.npy"
+        return cls(
+            arrays["feature"],
+            arrays["threshold"],
+            arrays["children"],
+            arrays["is_leaf"],
+            arrays["value"],
+            np.asarray(arrays["roots"]),
+            np.asarray(arrays["classes_"]),
+            np.load(missing, mmap_mode=mmap_mode) if missing.exists() else None,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Leaf index reached by every (row, tree) pair, shape ``(n_rows, n_trees)``."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, n_features = X.shape
+        flat_X = X.ravel()
+        node = np.tile(self.roots, n)
+        pos = np.flatnonzero(~self.is_leaf[node])
+        cur = node[pos]
+        row_off = (pos // self.n_trees) * n_features
+        depth = 0
+        while cur.size:
+            x = flat_X[row_off + self.feature[cur]]
+            go_right = ~(x <= self.threshold[cur])
+            if self.missing_left is not None:
+                go_right &= ~(np.isnan(x) & self.missing_left[cur])
+            cur = self.children[2 * cur + go_right]
+            depth += 1
+            if depth % self.COMPACT_EVERY == 0:
+                done = self.is_leaf[cur]
+                node[pos[done]] = cur[done]
+                keep = ~done
+                cur, pos, row_off = cur[keep], pos[keep], row_off[keep]
+        return node.reshape(n, self.n_trees)
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        block = max(1, self.ROW_BLOCK // max(self.n_trees, 1))
+        out = np.empty((X.shape[0], self.value.shape[1]))
+        for start in range(0, X.shape[0], block):
+            leaves = self.apply(X[start:start + block])
+            out[start:start + len(leaves)] = self.value[leaves].sum(axis=1)
+        return out
@@ -0,0 +1,141 @@
+"""Fraud analysis summaries computed server side in one ``$facet`` pass.
+
+``pipeline`` filters ``fraud_transaction`` once and fans the matching
+documents out to every summary the analysis page draws: totals, top
+merchants / categories / states by count and by amount, an amount histogram,
+hour-of-day and day-of-week distributions, a per-period series and fraud
+score quantiles. ``shape`` turns the single result document into the
+response. The page gets a few KB whatever the number of matching rows.
+
+Quantiles come from ``$bucketAuto`` (any server version, unlike
+``$percentile``, which needs 7.0): the scores are split into
+``QUANTILE_BUCKETS`` groups of near-equal size and each quantile is
+interpolated inside the group holding its rank, so it is off by at most one
+group's score range.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Sequence
+
+from txn_dates import FIELD, PERIOD_FORMATS
+
+DIMENSIONS = ("merchant", "category", "state")
+# Lower edges of the amount histogram bins; the last bin is open-ended.
+AMOUNT_EDGES: List[float] = [0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+QUANTILE_BUCKETS = 100
+WEEKDAYS = ("Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat")
+
+# Documents whose time is not a date yet (see migrate_txn_dates.py) would
+# make $hour and $dateToString fail the whole aggregation.
+_DATED = {"$match": {FIELD: {"$type": "date"}}}
+# The time as a date, else null, which $min / $max skip (a string would sort below every date).
+_DATE_OR_NULL = {"$cond": [{"$eq": [{"$type": f"${FIELD}"}, "date"]}, f"${FIELD}", None]}
+
+
+def _top(field: str, by: str, top: int) -> List[dict]:
+    return [
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}, "amt": {"$sum": "$amt"}}},
+        {"$sort": {by: -1, "_id": 1}},
+        {"$limit": top},
+    ]
+
+
+def _by(expr) -> List[dict]:
+    return [_DATED, {"$group": {"_id": expr, "count": {"$sum": 1}, "amt": {"$sum": "$amt"}}}]
+
+
+def pipeline(query: dict, top: int = 10, granularity: str = "month") -> List[dict]:
+    facets: Dict[str, List[dict]] = {
+        "totals": [{"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "amt": {"$sum": "$amt"},
+            "first": {"$min": _DATE_OR_NULL},
+            "last": {"$max": _DATE_OR_NULL},
+            "states": {"$addToSet": "$state"},
+        }}],
+        "amount": [{"$bucket": {
+            "groupBy": "$amt",
+            "boundaries": AMOUNT_EDGES,
+            "default": "other",
+            "output": {"count": {"$sum": 1}, "amt": {"$sum": "$amt"}},
+        }}],
+        "hour": _by({"$hour": f"${FIELD}"}),
+        "weekday": _by({"$dayOfWeek": f"${FIELD}"}),
+        "series": _by({"$dateToString": {"format": PERIOD_FORMATS[granularity], "date": f"${FIELD}"}}),
+        "score": [
+            {"$match": {"fraud_score": {"$type": "number"}}},
+            {"$bucketAuto": {
+                "groupBy": "$fraud_score",
+                "buckets": QUANTILE_BUCKETS,
+                "output": {"count": {"$sum": 1}, "lo": {"$min": "$fraud_score"}, "hi": {"$max": "$fraud_score"}},
+            }},
+        ],
+    }
+    for field in DIMENSIONS:
+        for by in ("count", "amt"):
+            facets[f"{field}:{by}"] = _top(field, by, top)
+    return [{"$match": query}, {"$facet": facets}]
+
+
+def quantiles(buckets: Sequence[dict], qs: Sequence[float] = QUANTILES) -> Dict[str, float]:
+    """Approximate quantiles from ``$bucketAuto`` groups sorted by score."""
+    n = sum(b["count"] for b in buckets)
+    out: Dict[str, float] = {}
+    if not n:
+        return out
+    for q in qs:
+        rank = q * (n - 1)
+        seen = 0
+        for b in buckets:
+            if rank < seen + b["count"] or b is buckets[-1]:
+                within = (rank - seen) / (b["count"] - 1) if b["count"] > 1 else 0.0
+                out[f"p{round(q * 100)}"] = round(b["lo"] + min(within, 1.0) * (b["hi"] - b["lo"]), 4)
+                break
+            seen += b["count"]
+    return out
+
+
+def _rows(rows: List[dict], key: str) -> List[dict]:
+    return [{key: r["_id"], "count": r["count"], "amt": round(r["amt"], 2)} for r in rows]
+
+
+def _dense(rows: List[dict], keys: Sequence) -> List[dict]:
+    seen = {r["_id"]: r for r in rows}
+    return [{"count": seen.get(k, {}).get("count", 0), "amt": round(seen.get(k, {}).get("amt", 0), 2)} for k in keys]
+
+
+def _amount_bins():
+    # The last bin is $bucket's "default": everything from the top edge up.
+    highs = AMOUNT_EDGES[1:] + [None]
+    return [(lo, hi, lo if hi is not None else "other") for lo, hi in zip(AMOUNT_EDGES, highs)]
+
+
+def shape(result: dict) -> dict:
+    """The response for the one document ``pipeline`` produces."""
+    totals = (result.get("totals") or [{}])[0]
+    bins = _amount_bins()
+    amount = _dense(result.get("amount", []), [key for _, _, key in bins])
+    return {
+        "totals": {
+            "count": totals.get("count", 0),
+            "amt": round(totals.get("amt", 0), 2),
+            "first": totals.get("first"),
+            "last": totals.get("last"),
+            "states": len(totals.get("states", [])),
+        },
+        "top": {
+            field: {by: _rows(result.get(f"{field}:{by}", []), "name") for by in ("count", "amt")}
+            for field in DIMENSIONS
+        },
+        "amount_histogram": [
+            {"min": lo, "max": hi, **row} for (lo, hi, _), row in zip(bins, amount)
+        ],
+        "hour_of_day": [{"hour": h, **row} for h, row in enumerate(_dense(result.get("hour", []), range(24)))],
+        "day_of_week": [
+            {"day": WEEKDAYS[d - 1], **row} for d, row in zip(range(1, 8), _dense(result.get("weekday", []), range(1, 8)))
+        ],
+        "series": sorted(_rows(result.get("series", []), "period"), key=lambda r: r["period"]),
+        "score_quantiles": quantiles(result.get("score", [])),
+    }
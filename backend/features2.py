@@ -3,6 +3,7 @@ from __future__ import annotations
 import numpy as np
 import pandas as pd
 import re
+from datetime import datetime, timedelta, timezone
 from category_encoders import TargetEncoder
 from pandas import DataFrame, Series
 from sklearn.compose import ColumnTransformer
@@ -10,35 +11,143 @@ from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from typing import Optional, Tuple, Union
+from weakref import WeakKeyDictionary
 
+TXN_TIME_FORMATS = [
+    "%m/%d/%y %H:%M",
+    "%m/%d/%y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %I:%M %p",
+]
+DOB_FORMATS = ["%m/%d/%y", "%m/%d/%Y", "%Y-%m-%d"]
 
-def parse_best(series: Series, candidate_fmts, col_name):
-    raw = (
-        series.astype(str).str.replace(r"\s+", " ", regex=True).str.strip()
-    )
-    best = None
-    best_na = len(raw) + 1
+_INPUT_COLUMNS: "WeakKeyDictionary[ColumnTransformer, list]" = WeakKeyDictionary()
+
+
+def input_columns(preprocessor: ColumnTransformer) -> list:
+    """Columns a fitted ColumnTransformer reads, computed once per instance."""
+    cols = _INPUT_COLUMNS.get(preprocessor)
+    if cols is None:
+        cols = []
+        for _, _, tcols in preprocessor.transformers_:
+            if tcols in (None, "remainder"):
+                continue
+            cols.extend(tcols)
+        _INPUT_COLUMNS[preprocessor] = cols
+    return cols
+
+
+ISO_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]
+
+# Below this many rows parse_best parses value by value (the serving path).
+SMALL_SERIES = 32
+SAMPLE_ROWS = 200
+
+_FORMAT_CACHE: dict = {}
+_LAST_FORMAT: dict = {}
+
+
+def _with_iso(candidate_fmts) -> list:
+    return list(candidate_fmts) + [f for f in ISO_FORMATS if f not in candidate_fmts]
+
+
+def parse_one(value, candidate_fmts) -> Optional[datetime]:
+    """Parse a single value with the first candidate format that fits.
+
+    The candidates never overlap (``%y`` rejects four-digit years, ``%H:%M``
+    rejects seconds), so the last format that worked is tried first and
+    ISO-shaped strings skip straight to the ISO formats.
+    """
+    if value is None:
+        return None
+    raw = " ".join(str(value).split())
+    key = tuple(candidate_fmts)
+    fmts = _with_iso(candidate_fmts)
+    if raw[4:5] == "-":
+        fmts = [f for f in fmts if f.startswith("%Y-")]
+    last = _LAST_FORMAT.get(key)
+    if last in fmts:
+        fmts = [last] + [f for f in fmts if f != last]
+    for fmt in fmts:
+        try:
+            parsed = datetime.strptime(raw, fmt)
+        except ValueError:
+            continue
+        _LAST_FORMAT[key] = fmt
+        return parsed
+    return None
+
+
+def detect_format(raw: Series, candidate_fmts) -> Optional[str]:
+    """The candidate that parses the most of a small sample of ``raw``."""
+    sample = raw.head(SAMPLE_ROWS)
+    best, best_ok = None, 0
     for fmt in candidate_fmts:
-        parsed = pd.to_datetime(raw, format=fmt, errors="coerce")
-        na_cnt = parsed.isna().sum()
-        if na_cnt < best_na:
-            best, best_na = parsed, na_cnt
-        if na_cnt <= 0.05 * len(raw):
+        ok = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+        if ok > best_ok:
+            best, best_ok = fmt, ok
+        if ok == len(sample):
             break
-    if best_na == len(raw):
-        best = pd.to_datetime(
-            raw,
-            errors='coerce',
-            infer_datetime_format=True,
-            utc=True
-        )
-    print(
-        f"{col_name}: parsed {len(best) - best.isna().sum()} of {len(best)} rows with "
-        f"{'fallback' if best_na == len(raw) else 'fmt match'}."
-    )
     return best
 
 
+def parse_best(series: Series, candidate_fmts, col_name, source: str = "default"):
+    """Parse ``series`` to naive datetimes; unparseable values become NaT.
+
+    The format is detected once on a sample and cached per ``(source,
+    col_name)``, so the distinct values are parsed in one vectorised pass.
+    Only values that format misses are normalised and retried against the
+    other candidates (and the ISO shapes).
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if len(series) <= SMALL_SERIES:
+        return pd.Series(
+            pd.to_datetime([parse_one(v, candidate_fmts) for v in series]), index=series.index
+        )
+
+    fmts = _with_iso(candidate_fmts)
+    key = (source, col_name, tuple(candidate_fmts))
+    # Dates repeat heavily (dob per card, minute-resolution timestamps), so
+    # parse each distinct string once and broadcast back through the codes.
+    codes, uniques = pd.factorize(series)
+    raw = pd.Series(uniques).astype(str)
+    fmt = _FORMAT_CACHE.get(key) or detect_format(raw, fmts)
+    if fmt is None:
+        values = np.full(len(raw), np.datetime64("NaT", "ns"))
+    else:
+        values = pd.to_datetime(raw, format=fmt, errors="coerce").to_numpy(copy=True)
+
+    pos = np.flatnonzero(np.isnat(values))
+    if len(pos):
+        rest = raw[pos].str.replace(r"\s+", " ", regex=True).str.strip()
+        for other in fmts:
+            if not len(pos):
+                break
+            got = pd.to_datetime(rest, format=other, errors="coerce").to_numpy()
+            ok = ~np.isnat(got)
+            values[pos[ok]] = got[ok]
+            pos, rest = pos[~ok], rest[~ok]
+    # Missing inputs have code -1, which picks the trailing NaT.
+    values = np.append(values, np.datetime64("NaT", "ns"))
+    parsed = pd.Series(values[codes], index=series.index)
+
+    n_ok = len(parsed) - int(parsed.isna().sum())
+    if fmt is not None and n_ok >= 0.95 * len(parsed):
+        _FORMAT_CACHE[key] = fmt
+    return parsed
+
+
+def parse_unix(value, offset: timedelta = timedelta(0)) -> Optional[datetime]:
+    """The transaction time ``unix_time`` stands for, ``offset`` before it in the model's data; scoring only."""
+    try:
+        return datetime.fromtimestamp(int(value), timezone.utc).replace(tzinfo=None) + offset
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
 def build_features(
     df: DataFrame,
     *,
@@ -49,6 +158,8 @@ def build_features(
     return_te: bool = False,
     return_preprocessor: bool = False,
     return_cat_encoder: bool = False,
+    return_index: bool = False,
+    unix_time_offset: timedelta = timedelta(0),
 ):
     """Feature‑engineering pipeline with reusable preprocessor."""
     df = df.copy()
@@ -56,24 +167,27 @@ def build_features(
     if "trans_date_trans_time" in df.columns:
         df["trans_date_trans_time"] = parse_best(
             df["trans_date_trans_time"],
-            [
-                "%m/%d/%y %H:%M",
-                "%m/%d/%y %H:%M:%S",
-                "%m/%d/%Y %H:%M",
-                "%m/%d/%Y %H:%M:%S",
-                "%m/%d/%Y %I:%M:%S %p",
-                "%m/%d/%Y %I:%M %p",
-            ],
+            TXN_TIME_FORMATS,
             "trans_date_trans_time",
         )
 
     if "dob" in df.columns:
         df["dob"] = parse_best(
             df["dob"],
-            ["%m/%d/%y", "%m/%d/%Y", "%Y-%m-%d"],
+            DOB_FORMATS,
             "dob",
         )
 
+    if "unix_time" in df.columns:
+        # Only rows without a usable trans_date_trans_time fall back to unix_time (see parse_unix).
+        if "trans_date_trans_time" not in df.columns:
+            df["trans_date_trans_time"] = pd.NaT
+        no_ts = df["trans_date_trans_time"].isna()
+        if no_ts.any():
+            df.loc[no_ts, "trans_date_trans_time"] = pd.to_datetime(
+                pd.to_numeric(df.loc[no_ts, "unix_time"], errors="coerce"), unit="s", errors="coerce"
+            ) + unix_time_offset
+
     df = df.dropna(subset=["trans_date_trans_time", "dob"])
     if df.empty:
         raise ValueError("All rows dropped after timestamp parsing.")
@@ -141,13 +255,8 @@ def build_features(
         )
         X_proc = preprocessor.fit_transform(df)
     else:
-        expected_cols = []
-        for _, _, cols in preprocessor.transformers_:
-            if cols in (None, "remainder"):
-                continue
-            expected_cols.extend(cols)
-
-        missing = [c for c in expected_cols if c not in df.columns]
+        present = set(df.columns)
+        missing = [c for c in input_columns(preprocessor) if c not in present]
         if missing:
             print(f"⚠️  Adding missing columns in test set: {missing}")
             for col in missing:
@@ -165,5 +274,7 @@ def build_features(
         output = (*output, te)
     if return_cat_encoder:
         output = (*output, cat_encoder)
+    if return_index:
+        output = (*output, df.index)
 
     return output
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""Indexes for every query shape the API issues, and an explain() report over them.
+
+``INDEXES`` is the single list ``setup_database`` provisions. ``query_shapes``
+mirrors the filters and sorts the endpoints send (with placeholder values),
+so ``explain_report`` can show whether each one is served by an index, scans
+the collection, or sorts in memory.
+"""
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+import trans_nums
+from facets import pipeline as facets_pipeline
+from search import analysis_query
+
+_TXN_BUCKETS = ("all_transaction", "new_transaction", "fraud_transaction")
+
+# rollback / status by txn id; one 16-byte binary per transaction (see trans_nums.py).
+TRANS_NUM_INDEX = IndexModel([("trans_num", ASCENDING)], name="trans_num", unique=True)
+
+_TXN_INDEXES = [
+    # list_txn: newest first, _id breaks ties between equal timestamps.
+    IndexModel([("trans_date_trans_time", DESCENDING), ("_id", DESCENDING)], name="trans_time_desc"),
+    TRANS_NUM_INDEX,
+]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "all_transaction": _TXN_INDEXES,
+    "new_transaction": _TXN_INDEXES,
+    "fraud_transaction": _TXN_INDEXES + [
+        # get_fraud_analysis: date-sorted with an amount range; amt in the key
+        # lets the range be checked on index entries before fetching documents.
+        IndexModel([("trans_date_trans_time", DESCENDING), ("amt", ASCENDING)], name="trans_time_amt"),
+        # Text filters on the folded shadow fields, equality/prefix first and
+        # the sort key after it, so an exact match also returns date order.
+        IndexModel([("state_lc", ASCENDING), ("category_lc", ASCENDING), ("trans_date_trans_time", DESCENDING)],
+                   name="state_category_time"),
+        IndexModel([("category_lc", ASCENDING), ("trans_date_trans_time", DESCENDING)], name="category_time"),
+        IndexModel([("merchant_lc", ASCENDING), ("trans_date_trans_time", DESCENDING)], name="merchant_time"),
+    ],
+    "cases": [
+        # list_cases by status (open/investigating split on created_at), newest first.
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created"),
+        IndexModel([("created_at", DESCENDING)], name="created_desc"),
+        # list_cases?txn_id=, rollback and by-txn status updates (multikey).
+        IndexModel([("txn_ids", ASCENDING)], name="txn_ids"),
+        # successRate counts.
+        IndexModel([("is_fraud", ASCENDING)], name="is_fraud"),
+    ],
+    "case_rollups": [
+        # $inc upserts match the whole key; dashboard reads fix g/level (and any
+        # dimensions) and range over t, which is last so the range stays on the index.
+        IndexModel(
+            [("g", ASCENDING), ("level", ASCENDING), ("state", ASCENDING), ("category", ASCENDING),
+             ("merchant", ASCENDING), ("t", ASCENDING)],
+            name="bucket", unique=True,
+        ),
+    ],
+    "staff_user": [
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("id", ASCENDING)], name="staff_id"),
+    ],
+}
+
+
+async def ensure_indexes(db) -> Dict[str, dict]:
+    """Create ``INDEXES`` (a no-op for ones that exist) and check each is present with its key and options."""
+    report = {}
+    for coll, models in INDEXES.items():
+        error = None
+        try:
+            await db[coll].create_indexes(models)
+        except OperationFailure as e:
+            error = str(e)
+        info = await db[coll].index_information()
+        missing = [m.document["name"] for m in models if not _matches(info.get(m.document["name"], {}), m)]
+        report[coll] = {
+            "indexes": sorted(info),
+            "missing": missing,
+            **({"error": error} if error else {}),
+        }
+        if missing:
+            print(f"⚠️  {coll}: indexes missing or with a different key or options: {missing} {error or ''}")
+        else:
+            print(f"✓ {coll}: {len(models)} indexes verified")
+    return report
+
+
+def _matches(existing: dict, model: IndexModel) -> bool:
+    want = model.document
+    return (
+        list(existing.get("key", [])) == list(want["key"].items())
+        and bool(existing.get("unique")) == bool(want.get("unique"))
+    )
+
+
+def _count(coll: str, query: dict) -> dict:
+    # What Collection.count_documents sends.
+    return {"aggregate": coll, "pipeline": [{"$match": query}, {"$group": {"_id": 1, "n": {"$sum": 1}}}], "cursor": {}}
+
+
+def query_shapes() -> List[dict]:
+    """The API's queries as explainable commands, tagged with the endpoint that issues them."""
+    txn_id = trans_nums.to_binary(uuid.UUID(int=0))
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    by_txn = {"trans_num": {"$in": [txn_id, trans_nums.new()]}}
+    shapes = []
+    for coll in _TXN_BUCKETS:
+        shapes += [
+            {"endpoint": "GET /transactions/{bucket}", "collection": coll,
+             "command": {"find": coll, "filter": {}, "sort": {"trans_date_trans_time": -1, "_id": -1}, "limit": 50}},
+            {"endpoint": "GET /transactions/{bucket} (total)", "collection": coll, "command": _count(coll, {})},
+        ]
+    shapes += [
+        {"endpoint": "POST /cases/rollback (all/new)", "collection": "all_transaction",
+         "command": {"update": "all_transaction", "updates": [{"q": by_txn, "u": {"$set": {"is_fraud": 0}}, "multi": True}]}},
+        {"endpoint": "POST /cases/rollback (fraud)", "collection": "fraud_transaction",
+         "command": {"delete": "fraud_transaction", "deletes": [{"q": by_txn, "limit": 0}]}},
+        {"endpoint": "POST /cases/rollback, PATCH /cases/by-txn", "collection": "cases",
+         "command": {"update": "cases", "updates": [{"q": {"txn_ids": txn_id}, "u": {"$set": {"status": "closed"}}, "multi": True}]}},
+        {"endpoint": "POST /cases/rollback, PATCH /cases/by-txn (bulk: cases to update)", "collection": "cases",
+         "command": {"find": "cases", "filter": {"txn_ids": {"$in": [txn_id, trans_nums.new()]}}}},
+        {"endpoint": "GET /cases", "collection": "cases",
+         "command": {"find": "cases", "filter": {}, "sort": {"created_at": -1}, "limit": 20}},
+        {"endpoint": "GET /cases?status=open", "collection": "cases",
+         "command": {"find": "cases", "filter": {"status": "open", "created_at": {"$gte": today}},
+                     "sort": {"created_at": -1}, "limit": 20}},
+        {"endpoint": "GET /cases?status=investigating", "collection": "cases",
+         "command": {"find": "cases", "filter": {"$or": [
+             {"status": "investigating"}, {"status": "open", "created_at": {"$lt": today}}]},
+             "sort": {"created_at": -1}, "limit": 20}},
+        {"endpoint": "GET /cases?txn_id=", "collection": "cases",
+         "command": {"find": "cases", "filter": {"txn_ids": txn_id}, "sort": {"created_at": -1}, "limit": 20}},
+        {"endpoint": "GET /fraud/successRate", "collection": "cases", "command": _count("cases", {"is_fraud": 1})},
+        {"endpoint": "GET /cases/timeseries?start=&end=", "collection": "case_rollups",
+         "command": {"aggregate": "case_rollups", "pipeline": [
+             {"$match": {"g": "day", "level": "total", "state": None, "category": None, "merchant": None,
+                         "t": {"$gte": datetime(2020, 1, 1), "$lt": datetime(2021, 1, 1)}}},
+             {"$group": {"_id": "$t", "fraud_count": {"$sum": "$fraud_count"}}}], "cursor": {}}},
+        {"endpoint": "GET /cases/rollups?state=", "collection": "case_rollups",
+         "command": {"aggregate": "case_rollups", "pipeline": [
+             {"$match": {"g": "month", "level": "detail", "state": "CA"}},
+             {"$group": {"_id": "$t", "fraud_count": {"$sum": "$fraud_count"}}}], "cursor": {}}},
+        {"endpoint": "POST /auth/login", "collection": "staff_user",
+         "command": {"find": "staff_user", "filter": {"email": "admin@gmail.com", "password": "x"}, "limit": 1}},
+        {"endpoint": "GET /staff/{id}", "collection": "staff_user",
+         "command": {"find": "staff_user", "filter": {"id": 1}, "limit": 1}},
+    ]
+    year = {"start": datetime(2020, 1, 1), "end": datetime(2020, 12, 31)}
+    for label, query in analysis_shapes(year):
+        shapes.append({
+            "endpoint": f"GET /transactions/fraud/analysis ({label})", "collection": "fraud_transaction",
+            "command": {"find": "fraud_transaction", "filter": query, "sort": {"trans_date_trans_time": -1}, "limit": 1000},
+        })
+    for label, query in analysis_shapes(year)[:4]:
+        shapes.append({
+            "endpoint": f"GET /transactions/fraud/facets ({label})", "collection": "fraud_transaction",
+            "command": {"aggregate": "fraud_transaction", "pipeline": facets_pipeline(query), "cursor": {}},
+        })
+    return shapes
+
+
+def analysis_shapes(year: dict) -> List[tuple]:
+    """The filter combinations the analysis page sends most, as (label, query)."""
+    return [
+        ("dates", analysis_query(**year)),
+        ("amount + dates", analysis_query(min_amount=100, max_amount=500, **year)),
+        ("state", analysis_query(state="NY", match="exact")),
+        ("state + category + dates", analysis_query(state="NY", category="shopping_net", match="exact", **year)),
+        ("category prefix", analysis_query(category="shop")),
+        ("merchant prefix", analysis_query(merchant="kirlin")),
+        ("merchant prefix + dates", analysis_query(merchant="kirlin", **year)),
+    ]
+
+
+def _plan_nodes(plan) -> List[dict]:
+    if not isinstance(plan, dict):
+        return []
+    # Slot-based plans nest the classic tree under "queryPlan".
+    out = [plan]
+    for key in ("queryPlan", "inputStage"):
+        out += _plan_nodes(plan.get(key))
+    for child in plan.get("inputStages", []):
+        out += _plan_nodes(child)
+    return out
+
+
+def _winning_plan(explain: dict) -> dict:
+    if "queryPlanner" in explain:
+        return explain["queryPlanner"]["winningPlan"]
+    # Aggregations report the $match/$sort part as the first ($cursor) stage.
+    for stage in explain.get("stages", []):
+        if "$cursor" in stage:
+            return stage["$cursor"]["queryPlanner"]["winningPlan"]
+    return {}
+
+
+def _execution(explain: dict) -> dict:
+    if "executionStats" in explain:
+        return explain["executionStats"]
+    for stage in explain.get("stages", []):
+        if "$cursor" in stage:
+            return stage["$cursor"].get("executionStats", {})
+    return {}
+
+
+async def explain_report(db, verbosity: str = "queryPlanner") -> List[dict]:
+    """Explain every query shape; ``executionStats`` also runs the reads (writes are never applied)."""
+    rows = []
+    for shape in query_shapes():
+        try:
+            explain = await db.command({"explain": shape["command"], "verbosity": verbosity})
+        except OperationFailure as e:
+            rows.append({"endpoint": shape["endpoint"], "collection": shape["collection"], "error": str(e)})
+            continue
+        nodes = _plan_nodes(_winning_plan(explain))
+        stages = [n["stage"] for n in nodes if "stage" in n]
+        used = sorted({n["indexName"] for n in nodes if "indexName" in n})
+        stats = _execution(explain)
+        rows.append({
+            "endpoint": shape["endpoint"],
+            "collection": shape["collection"],
+            "uses_index": "COLLSCAN" not in stages and bool(used or "IDHACK" in stages),
+            "indexes": used,
+            "collscan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+            "stages": stages,
+            **({
+                "docs_examined": stats.get("totalDocsExamined"),
+                "keys_examined": stats.get("totalKeysExamined"),
+                "returned": stats.get("nReturned"),
+                "time_ms": stats.get("executionTimeMillis"),
+            } if stats else {}),
+        })
+    return rows
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from counts import deltas_for
+import rollups as rollups_mod
+
+
+async def _insert_many(coll, docs: list) -> List[Tuple[int, str]]:
+    """Unordered insert; returns (position, message) for every document that failed."""
+    if not docs:
+        return []
+    try:
+        await coll.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        return [(err["index"], err.get("errmsg", "write failed")) for err in e.details.get("writeErrors", [])]
+    except PyMongoError as e:
+        return [(i, str(e)) for i in range(len(docs))]
+    return []
+
+
+async def write_transactions(
+    db, seq, docs: List[dict], counts=None, rollups=None
+) -> Dict[int, str]:
+    """Store transactions the way ``POST /transactions/{bucket}`` does, in bulk.
+
+    Every document goes to ``all_transaction`` first; its unique ``trans_num``
+    index rejects ids that are already stored, and only the rows that landed
+    there go on to ``new_transaction`` and, for fraud rows, to
+    ``fraud_transaction`` plus an open case listing their ``trans_num``.
+    Record and case ids are claimed as one contiguous range per collection,
+    and each collection gets a single unordered ``insert_many``. The documents
+    that landed are added to ``counts``, and the cases to ``rollups``, when
+    given. Returns ``{index into docs: error}`` for rows with a failed write.
+    """
+    if not docs:
+        return {}
+    frauds = [i for i, doc in enumerate(docs) if doc.get("is_fraud") == 1]
+    all_start, new_start, fraud_start, case_start = await asyncio.gather(
+        seq.claim("all_transaction", len(docs)),
+        seq.claim("new_transaction", len(docs)),
+        seq.claim("fraud_transaction", len(frauds)),
+        seq.claim("cases", len(frauds)),
+    )
+
+    rows = list(range(len(docs)))
+    first = ("all_transaction", rows, [{**d, "record_id": all_start + k} for k, d in enumerate(docs)])
+    first_failed = await _insert_many(db.all_transaction, first[2])
+    rejected = {pos for pos, _ in first_failed}
+    rows = [i for i in rows if i not in rejected]
+    frauds = [i for i in frauds if i not in rejected]
+
+    now = datetime.now(timezone.utc)
+    rest = [
+        ("new_transaction", rows, [{**docs[i], "record_id": new_start + k} for k, i in enumerate(rows)]),
+        ("fraud_transaction", frauds, [{**docs[i], "record_id": fraud_start + k} for k, i in enumerate(frauds)]),
+        ("cases", frauds, [
+            {
+                **docs[i],
+                "txn_ids": [docs[i]["trans_num"]],
+                "case_id": case_start + k,
+                "status": "open",
+                "created_at": now,
+            }
+            for k, i in enumerate(frauds)
+        ]),
+    ]
+    plans = [first, *rest]
+    results = [first_failed, *await asyncio.gather(*(_insert_many(db[name], batch) for name, _, batch in rest))]
+
+    errors: Dict[int, str] = {}
+    deltas = Counter()
+    cases = []
+    for (name, source, batch), failed in zip(plans, results):
+        for pos, msg in failed:
+            errors.setdefault(source[pos], f"{name}: {msg}")
+        bad = {pos for pos, _ in failed}
+        landed = [d for pos, d in enumerate(batch) if pos not in bad]
+        deltas.update(deltas_for(name, landed))
+        if name == "cases":
+            cases = landed
+    if counts is not None:
+        await counts.add(deltas)
+    if rollups is not None:
+        await rollups.add(rollups_mod.deltas_for(cases))
+    return errors
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from bisect import bisect_left
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+WAIT_BUCKETS_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250]
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row scoring calls into one vectorised call.
+
+    Callers ``await submit(vec)``; a background task takes the first queued
+    row, keeps collecting until ``max_batch`` rows or ``max_wait_ms`` have
+    passed, stacks them and runs ``score_fn`` once on ``score_executor`` (a
+    thread or process pool) so the event loop never blocks on the model.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch: int = 64,
+        max_wait_ms: float = 2.0,
+        executor: Optional[Executor] = None,
+        score_executor: Optional[Executor] = None,
+        max_queue: int = 10_000,
+        max_inflight: int = 2,
+    ):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix="score")
+        self.score_executor = score_executor or self.executor
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._inflight: set = set()
+
+        self.batch_hist = {}
+        self.wait_hist = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_total_ms = 0.0
+        self.rows = 0
+        self.batches = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        while not self.queue.empty():
+            _, _, fut = self.queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("Scoring stopped"))
+        self.executor.shutdown(wait=True)
+        if self.score_executor is not self.executor:
+            self.score_executor.shutdown(wait=True)
+
+    async def submit(self, vec: np.ndarray) -> np.ndarray:
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((vec, time.perf_counter(), fut))
+        return await fut
+
+    async def run(self, fn, *args):
+        """Run a CPU-bound call on the scoring executor without batching it."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _collect(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _record(self, batch: list, started: float):
+        size = len(batch)
+        bucket = 1 << (size - 1).bit_length()
+        self.batch_hist[bucket] = self.batch_hist.get(bucket, 0) + 1
+        self.batches += 1
+        self.rows += size
+        for _, enqueued, _ in batch:
+            wait_ms = (started - enqueued) * 1000
+            self.wait_total_ms += wait_ms
+            self.wait_hist[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    async def _score(self, batch: list):
+        futures = [fut for _, _, fut in batch]
+        try:
+            X = np.vstack([vec for vec, _, _ in batch])
+            out = await asyncio.get_running_loop().run_in_executor(self.score_executor, self.score_fn, X)
+        except Exception as e:
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        for fut, row in zip(futures, out):
+            if not fut.done():
+                fut.set_result(row)
+
+    async def _run(self):
+        # Holding a slot before collecting lets the queue keep filling while
+        # every executor thread is busy, so batches grow under load.
+        while True:
+            await self._slots.acquire()
+            batch = await self._collect()
+            self._record(batch, time.perf_counter())
+            task = asyncio.get_running_loop().create_task(self._score(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def metrics(self) -> dict:
+        labels = [f"le_{b}ms" for b in WAIT_BUCKETS_MS] + ["gt_250ms"]
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "batch_size_hist": {f"le_{k}": v for k, v in sorted(self.batch_hist.items())},
+            "queue_wait_ms_mean": self.wait_total_ms / self.rows if self.rows else 0.0,
+            "queue_wait_ms_hist": dict(zip(labels, self.wait_hist)),
+        }
@@ -0,0 +1,128 @@
+"""Convert stored ``trans_num`` values to 16-byte UUID binaries and make them unique.
+
+Usage: python migrate_trans_num.py [--batch 1000] [--dry-run]
+
+Walks the transaction collections and cases for ids that are not binaries
+yet (strings with or without dashes, and cases' ``txn_ids`` entries) and
+rewrites them with ``trans_nums.to_binary``. Legacy ids that are not UUIDs
+become the name-based UUID of their text, so the API still finds them by the
+string they had. Transactions with no id get a fresh one, since a unique
+index admits only one missing value. Then each transaction collection gets
+the unique ``trans_num`` index, replacing the old non-unique one; a
+collection where two documents now share an id is reported and keeps its
+old index until they are resolved. Safe to stop and re-run: converted
+documents no longer match.
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Tuple
+
+from dotenv import find_dotenv, load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+import trans_nums
+from indexes import TRANS_NUM_INDEX
+
+TXN_COLLECTIONS = ["all_transaction", "new_transaction", "fraud_transaction"]
+FIELD = "trans_num"
+NOT_BINARY = {"$not": {"$type": "binData"}}
+
+
+def _txn_changes(doc: dict) -> dict:
+    value = doc.get(FIELD)
+    return {FIELD: trans_nums.new() if value in (None, "") else trans_nums.to_binary(value)}
+
+
+def _case_changes(doc: dict) -> dict:
+    changes = {}
+    if doc.get(FIELD) not in (None, "") and not isinstance(doc[FIELD], bytes):
+        changes[FIELD] = trans_nums.to_binary(doc[FIELD])
+    txn_ids = doc.get("txn_ids")
+    if isinstance(txn_ids, list) and any(not isinstance(t, bytes) for t in txn_ids):
+        changes["txn_ids"] = [trans_nums.to_binary(t) for t in txn_ids]
+    return changes
+
+
+async def migrate(coll, todo: dict, changes_for, batch: int, dry_run: bool) -> dict:
+    stats = {"pending": await coll.count_documents(todo), "converted": 0}
+    ops, t0 = [], time.perf_counter()
+    async for doc in coll.find(todo, {FIELD: 1, "txn_ids": 1}).batch_size(batch):
+        changes = changes_for(doc)
+        if not changes:
+            continue
+        # The filter repeats the old values, so a document rewritten since it was read is skipped.
+        old = {k: doc.get(k) for k in changes}
+        ops.append(UpdateOne({"_id": doc["_id"], **old}, {"$set": changes}))
+        if len(ops) == batch:
+            stats["converted"] += await _flush(coll, ops, dry_run)
+            ops = []
+    if ops:
+        stats["converted"] += await _flush(coll, ops, dry_run)
+    stats["elapsed_s"] = round(time.perf_counter() - t0, 1)
+    return stats
+
+
+async def _flush(coll, ops, dry_run: bool) -> int:
+    if dry_run:
+        return len(ops)
+    result = await coll.bulk_write(ops, ordered=False)
+    return result.modified_count
+
+
+async def duplicates(coll) -> list:
+    pipeline = [
+        {"$group": {"_id": f"${FIELD}", "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    return await coll.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+
+async def unique_index(coll, dry_run: bool) -> Tuple[bool, str]:
+    """Swap the non-unique ``trans_num`` index for the unique one; returns (ok, what happened)."""
+    current = (await coll.index_information()).get(TRANS_NUM_INDEX.document["name"])
+    if current and current.get("unique"):
+        return True, "unique index already present"
+    dups = await duplicates(coll)
+    if dups:
+        shown = ", ".join(trans_nums.to_hex(d["_id"]) if d["_id"] is not None else "null" for d in dups[:5])
+        return False, f"{len(dups)} ids are shared by several documents (e.g. {shown}); unique index not built"
+    if dry_run:
+        return True, "would build the unique index"
+    if current:
+        await coll.drop_index(TRANS_NUM_INDEX.document["name"])
+    try:
+        await coll.create_indexes([TRANS_NUM_INDEX])
+    except OperationFailure as e:
+        # A duplicate written since the check; put the old index back so lookups stay indexed.
+        await coll.create_index([(FIELD, 1)], name=TRANS_NUM_INDEX.document["name"])
+        return False, f"unique index failed ({e}); restored the non-unique one"
+    return True, "built the unique index"
+
+
+async def main(args):
+    load_dotenv(find_dotenv())
+    db = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))[os.getenv("DB_NAME", "cc-fraud-web")]
+    verb = "would convert" if args.dry_run else "converted"
+    for name in TXN_COLLECTIONS:
+        stats = await migrate(db[name], {FIELD: NOT_BINARY}, _txn_changes, args.batch, args.dry_run)
+        print(f"✓ {name}: {verb} {stats['converted']} of {stats['pending']} in {stats['elapsed_s']}s")
+        ok, outcome = await unique_index(db[name], args.dry_run)
+        print(f"✓ {name}: {outcome}" if ok else f"⚠️  {name}: {outcome}")
+
+    todo = {"$or": [
+        {FIELD: {"$exists": True, "$ne": None, **NOT_BINARY}},
+        {"txn_ids": {"$elemMatch": NOT_BINARY}},
+    ]}
+    stats = await migrate(db.cases, todo, _case_changes, args.batch, args.dry_run)
+    print(f"✓ cases: {verb} {stats['converted']} of {stats['pending']} in {stats['elapsed_s']}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Count what would change without writing")
+    asyncio.run(main(parser.parse_args()))
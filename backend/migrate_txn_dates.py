@@ -0,0 +1,68 @@
+"""Convert stored ``trans_date_trans_time`` strings to BSON dates.
+
+Usage: python migrate_txn_dates.py [--batch 1000] [--dry-run]
+
+Walks cases and the transaction collections for documents whose transaction
+time is not yet a date and rewrites it with the parser the scorer uses.
+Documents where it does not parse are left alone and counted, for repair by
+hand: how ``unix_time`` relates to the transaction time depends on the data
+source (see ModelBundle.unix_time_offset), so it is not used to fill them in.
+Safe to stop and re-run: converted documents no longer match.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import find_dotenv, load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from txn_dates import FIELD, to_date
+
+COLLECTIONS = ["cases", "all_transaction", "new_transaction", "fraud_transaction"]
+
+
+async def migrate(coll, batch: int, dry_run: bool) -> dict:
+    todo = {FIELD: {"$not": {"$type": "date"}}}
+    stats = {"pending": await coll.count_documents(todo), "converted": 0, "unparseable": 0}
+    ops, t0 = [], time.perf_counter()
+    async for doc in coll.find(todo, {FIELD: 1}).batch_size(batch):
+        when = to_date(doc.get(FIELD))
+        if when is None:
+            stats["unparseable"] += 1
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"], FIELD: doc.get(FIELD)}, {"$set": {FIELD: when}}))
+        if len(ops) == batch:
+            stats["converted"] += await _flush(coll, ops, dry_run)
+            ops = []
+    if ops:
+        stats["converted"] += await _flush(coll, ops, dry_run)
+    stats["elapsed_s"] = round(time.perf_counter() - t0, 1)
+    return stats
+
+
+async def _flush(coll, ops, dry_run: bool) -> int:
+    if dry_run:
+        return len(ops)
+    # The filter repeats the old value, so a document rewritten since it was read is skipped.
+    result = await coll.bulk_write(ops, ordered=False)
+    return result.modified_count
+
+
+async def main(args):
+    load_dotenv(find_dotenv())
+    db = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))[os.getenv("DB_NAME", "cc-fraud-web")]
+    for name in COLLECTIONS:
+        stats = await migrate(db[name], args.batch, args.dry_run)
+        verb = "would convert" if args.dry_run else "converted"
+        print(f"✓ {name}: {verb} {stats['converted']} of {stats['pending']} in {stats['elapsed_s']}s")
+        if stats["unparseable"]:
+            print(f"⚠️  {name}: {stats['unparseable']} documents have no parseable time and were left as they are")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Count what would change without writing")
+    asyncio.run(main(parser.parse_args()))
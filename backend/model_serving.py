@@ -0,0 +1,286 @@
+"""Per-version scoring state and the canary check run before a hot swap.
+
+A ``ServingModel`` wraps one loaded ``ModelBundle`` together with everything
+derived from it (compiled forest, row scorer, micro-batcher, optional process
+pool) and is never mutated after construction. The API holds a single
+reference to the active one; requests take a ``lease()`` on whatever object
+that reference points at when they start, so a reload can swap the reference
+and close the old model only once its last lease is released.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+import serving_pool
+from ensemble import EnsembleClassifier, FlatForest
+from features2 import build_features
+from microbatch import MicroBatcher
+from model_store import ModelBundle
+from row_scorer import RowScorer
+
+# Scored by every new model before it goes live when no canary file is given.
+DEFAULT_CANARY = [
+    {
+        "trans_date_trans_time": "6/21/2020 12:14", "cc_num": 2291163933867244,
+        "merchant": "fraud_Kirlin and Sons", "category": "personal_care", "amt": 2.86,
+        "first": "Jeff", "last": "Elliott", "gender": "M", "street": "351 Darlene Green",
+        "city": "Columbia", "state": "SC", "zip": 29209, "lat": 33.9659, "long": -80.9355,
+        "city_pop": 333497, "job": "Mechanical engineer", "dob": "3/19/1968",
+        "unix_time": 1371816865, "merch_lat": 33.986391, "merch_long": -81.200714,
+    },
+    {
+        "trans_date_trans_time": "06/21/2020 10:06:39 PM", "cc_num": 4613314721966,
+        "merchant": "fraud_Rutherford-Mertz", "category": "grocery_pos", "amt": 311.59,
+        "first": "Melissa", "last": "Aguilar", "gender": "F", "street": "21326 Taylor Squares Suite 708",
+        "city": "Brandon", "state": "FL", "zip": 33510, "lat": 27.9551, "long": -82.2966,
+        "city_pop": 79613, "job": "Cytogeneticist", "dob": "12/16/1995",
+        "unix_time": 1371852399, "merch_lat": 27.630593, "merch_long": -82.308891,
+    },
+    {
+        "trans_date_trans_time": "12/31/20 23:59", "cc_num": 3560725013359375,
+        "merchant": "fraud_Unseen Merchant LLC", "category": "misc_net", "amt": 1041.51,
+        "first": "Kathy", "last": "Hughes", "gender": "F", "street": "0 Unknown Rd",
+        "city": "Nowhere", "state": "ZZ", "zip": 99999, "lat": 40.0, "long": -100.0,
+        "city_pop": 1, "job": "Unknown", "dob": "1/1/00",
+        "unix_time": 1388534399, "merch_lat": 40.5, "merch_long": -100.5,
+    },
+]
+
+
+class AlignmentPlan:
+    """Index map from feature_preproc's output columns to the model's input order.
+
+    Only the column mapping is built once per model; columns the model expects
+    but the preprocessor never produces are known up front instead of being
+    rediscovered per request. ``apply`` still allocates a fresh output array
+    (NaN-filled when columns are missing) and DataFrame on every call, then
+    fills it with one scatter. Callers keep the frame across executor calls
+    (see /detect), so a shared buffer could be overwritten under them.
+    """
+
+    def __init__(self, source_cols, target_cols, state_rate: dict, global_rate: float):
+        pos = {c: i for i, c in enumerate(source_cols)}
+        idx = np.array([pos.get(c, -1) for c in target_cols], dtype=np.intp)
+        self.columns = list(target_cols)
+        self.risk_dst = self.columns.index("state_risk") if "state_risk" in self.columns else None
+        if self.risk_dst is not None:
+            idx[self.risk_dst] = -2
+        self.dst = np.flatnonzero(idx >= 0)
+        self.src = idx[self.dst]
+        self.missing = [c for c, i in zip(self.columns, idx) if i == -1]
+        self.state_rate = {k: float(v) for k, v in state_rate.items() if not pd.isna(v)}
+        self.global_rate = float(global_rate)
+
+    def apply(self, X_proc, states) -> pd.DataFrame:
+        n = X_proc.shape[0]
+        out = np.full((n, len(self.columns)), np.nan) if self.missing else np.empty((n, len(self.columns)))
+        out[:, self.dst] = X_proc[:, self.src]
+        if self.risk_dst is not None:
+            out[:, self.risk_dst] = [self.state_rate.get(s, self.global_rate) for s in states]
+        return pd.DataFrame(out, columns=self.columns, copy=False)
+
+
+class ServingModel:
+    def __init__(
+        self,
+        bundle: ModelBundle,
+        mode: str = "thread",
+        threads: int = 2,
+        processes: int = 1,
+        shared_dir: Optional[Path] = None,
+        max_batch: int = 64,
+        max_wait_ms: float = 2.0,
+        flat_forest: bool = True,
+        flat_max_rows: int = 256,
+    ):
+        self.bundle = bundle
+        self.version = bundle.version
+        self.loaded_at = time.time()
+        self.fraud_model = bundle.fraud_model
+        self.clf = bundle.fraud_model.named_steps["clf"]
+        self.fraud_idx = list(self.clf.classes_).index(1)
+        self.alignment = AlignmentPlan(
+            bundle.feature_preproc.get_feature_names_out(),
+            [col for _, _, cols in bundle.fitted_prep.transformers_ for col in cols],
+            bundle.state_rate,
+            bundle.global_rate,
+        )
+        if self.alignment.missing:
+            print(f"⚠️  Model inputs not produced by the preprocessor, filled with NaN: {self.alignment.missing}")
+
+        if isinstance(self.clf, EnsembleClassifier) and flat_forest:
+            try:
+                stored = FlatForest.load(bundle.forest_dir) if bundle.forest_dir is not None else None
+                self.clf.compile(max_rows=flat_max_rows, flat=stored)
+            except NotImplementedError as e:
+                print(f"⚠️  Flat forest disabled: {e}")
+
+        self.row_scorer = None
+        if list(self.fraud_model.named_steps) == ["prep", "clf"]:
+            try:
+                self.row_scorer = RowScorer(
+                    bundle.feature_preproc, bundle.enc, bundle.cat_ohe, bundle.state_rate,
+                    bundle.global_rate, bundle.fitted_prep,
+                    model_prep=self.fraud_model.named_steps["prep"],
+                    unix_time_offset=bundle.unix_time_offset,
+                )
+            except NotImplementedError as e:
+                print(f"⚠️  Row scorer disabled, using build_features path: {e}")
+
+        self.score_fn, score_pool, score_slots = self.score_rows, None, threads
+        self.score_pool = None
+        if mode == "process":
+            try:
+                score_pool = self._start_pool(processes, shared_dir)
+                self.score_fn, score_slots = serving_pool.score, processes
+                self.score_pool = score_pool
+            except NotImplementedError as e:
+                print(f"⚠️  Process scoring disabled, using threads: {e}")
+
+        self.batcher = MicroBatcher(
+            self.score_fn,
+            max_batch=max_batch,
+            max_wait_ms=max_wait_ms,
+            executor=ThreadPoolExecutor(max_workers=threads, thread_name_prefix="score"),
+            score_executor=score_pool,
+            max_inflight=score_slots,
+        )
+        self._leases = 0
+        self._drained: Optional[asyncio.Event] = None
+
+    def _start_pool(self, processes: int, shared_dir: Optional[Path]):
+        if self.bundle.forest_dir is not None:
+            forest_dir = self.bundle.forest_dir
+        else:
+            flat = getattr(self.clf, "flat_", None) or FlatForest.from_ensemble(self.clf)
+            forest_dir = serving_pool.export_shared(flat, shared_dir or serving_pool.default_shared_dir())
+        pool = serving_pool.start_pool(forest_dir, processes, self.fraud_idx)
+        if isinstance(self.clf, EnsembleClassifier) and hasattr(self.clf, "flat_"):
+            # Share the same pages as the workers instead of a private copy.
+            self.clf.flat_ = FlatForest.load(forest_dir)
+        print(f"✓ Scoring on {processes} processes from {forest_dir}")
+        return pool
+
+    def score_rows(self, X):
+        return self.clf.predict_proba(X)[:, self.fraud_idx]
+
+    def score_matrix(self, X):
+        """``score_fn`` on model inputs from a worker thread: on the process pool in process mode.
+
+        Blocks the calling thread. Thread mode calls it directly, since waiting on
+        the thread pool from one of its own threads could deadlock.
+        """
+        if self.score_pool is None:
+            return self.score_fn(X)
+        return self.score_pool.submit(self.score_fn, X).result()
+
+    def prep(self, df_proc):
+        return self.fraud_model[:-1].transform(df_proc)
+
+    def score_frame(self, df_proc):
+        return self.score_matrix(self.prep(df_proc))
+
+    def model_frame(self, X_proc, states) -> pd.DataFrame:
+        return self.alignment.apply(X_proc, states)
+
+    def build_features(self, df_raw: pd.DataFrame, **kwargs):
+        return build_features(
+            df_raw,
+            training=False,
+            preprocessor=self.bundle.feature_preproc,
+            te=self.bundle.enc,
+            cat_encoder=self.bundle.cat_ohe,
+            unix_time_offset=self.bundle.unix_time_offset,
+            **kwargs,
+        )
+
+    def score_raw(self, df_raw: pd.DataFrame):
+        """Vectorized build_features + predict; returns (kept row positions, scores).
+
+        Rows build_features drops (unparseable dates) are left out of ``kept``.
+        Features are built on the calling thread and scored through ``score_matrix``,
+        so /detect/batch and streamed ingest use the process pool when there is one.
+        """
+        df_raw = df_raw.reset_index(drop=True).assign(is_fraud=0)
+        X_proc, _, _, kept = self.build_features(df_raw, return_index=True)
+        kept = np.asarray(kept)
+        df_proc = self.model_frame(X_proc, df_raw["state"].to_numpy()[kept])
+        return kept, self.score_frame(df_proc)
+
+    def features_frame(self, txn: dict) -> pd.DataFrame:
+        df_raw = pd.DataFrame([txn])
+        df_raw["is_fraud"] = 0
+        X_proc, _, _ = self.build_features(df_raw)
+        return self.model_frame(X_proc, df_raw["state"].values)
+
+    def start(self):
+        self.batcher.start()
+
+    @contextmanager
+    def lease(self):
+        self._leases += 1
+        try:
+            yield self
+        finally:
+            self._leases -= 1
+            if self._leases == 0 and self._drained is not None:
+                self._drained.set()
+
+    async def close(self):
+        """Stop once every request that leased this model has finished."""
+        self._drained = asyncio.Event()
+        if self._leases:
+            await self._drained.wait()
+        await self.batcher.stop()
+
+
+def load_canary(path: Optional[str]) -> List[dict]:
+    if not path or not os.path.exists(path):
+        return DEFAULT_CANARY
+    return pd.read_csv(path, low_memory=False)[list(DEFAULT_CANARY[0])].to_dict("records")
+
+
+def canary(model: ServingModel, rows: List[dict], tol: float = 1e-6) -> dict:
+    """Score ``rows`` through every path ``model`` will serve and check they agree.
+
+    Raises ValueError if scoring fails, a score is not a probability, or the row
+    scorer and score executor disagree with the build_features reference.
+    """
+    try:
+        # In-process reference, independent of the score executor checked below.
+        ref = np.array([model.score_rows(model.prep(model.features_frame(r)))[0] for r in rows])
+    except Exception as e:
+        raise ValueError(f"Canary scoring failed: {e}") from e
+    if not all(0.0 <= p <= 1.0 for p in ref):
+        raise ValueError(f"Canary scores out of range: {ref.tolist()}")
+
+    vecs, idx = [], []
+    if model.row_scorer is not None:
+        for i, r in enumerate(rows):
+            vec = model.row_scorer.transform(r)
+            if vec is not None:
+                vecs.append(vec)
+                idx.append(i)
+    max_diff = 0.0
+    if vecs:
+        X = np.vstack(vecs)
+        executor = model.batcher.score_executor
+        fast = executor.submit(model.score_fn, X).result()
+        max_diff = float(np.max(np.abs(fast - ref[idx])))
+        if not max_diff <= tol:
+            raise ValueError(f"Canary parity failed: fast path differs by {max_diff:.3g}")
+    return {
+        "rows": len(rows),
+        "fast_path_rows": len(vecs),
+        "max_abs_diff": max_diff,
+        "mean_score": float(ref.mean()),
+    }
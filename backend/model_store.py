@@ -0,0 +1,220 @@
+"""Versioned, memory-mappable model store for the API.
+
+Layout::
+
+    model/store/
+        CURRENT                 # name of the active version directory
+        <version>/
+            manifest.json       # format, version, lookup dicts (state_rate, ...)
+            preprocess.joblib   # feature_preproc, target encoder, cat encoder, prep (uncompressed)
+            classifier.joblib   # the sklearn classifier, for batches over the flat forest's row cutoff
+            forest/*.npy        # FlatForest arrays, loaded with mmap_mode="r"
+
+Usage: python model_store.py export [--model-dir model] [--store model/store]
+
+``export`` converts the legacy joblib artifacts into a new version directory
+and points ``CURRENT`` at it. Loading a store version maps the classifier's
+tree arrays and the forest from disk, so both are paged in on demand.
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import joblib
+from ensemble import FlatForest
+from sklearn.pipeline import Pipeline
+
+FORMAT_VERSION = 2
+
+
+class ModelBundle:
+    """Everything /detect needs from one model version."""
+
+    def __init__(
+        self,
+        pipeline,
+        target_encoder,
+        state_rate,
+        global_rate,
+        feature_preproc,
+        cat_encoder,
+        merchant_rate=None,
+        version="legacy",
+        forest_dir: Optional[Path] = None,
+        unix_time_offset_s: int = 0,
+    ):
+        if "target_encoder" in pipeline.named_steps:
+            pipeline = Pipeline([(n, s) for n, s in pipeline.steps if n != "target_encoder"])
+        if "prep" not in pipeline.named_steps:
+            raise ValueError(f"Model pipeline has no 'prep' step (steps: {list(pipeline.named_steps)})")
+        self.fraud_model = pipeline
+        self.fitted_prep = pipeline.named_steps["prep"]
+        self.enc = target_encoder
+        self.state_rate = state_rate
+        self.global_rate = global_rate
+        self.merchant_rate = merchant_rate or {}
+        self.feature_preproc = feature_preproc
+        self.cat_ohe = cat_encoder
+        self.version = version
+        self.forest_dir = forest_dir
+        # How far unix_time runs behind trans_date_trans_time in the training
+        # data; rows dated only by unix_time are shifted by it when scored.
+        self.unix_time_offset = timedelta(seconds=unix_time_offset_s)
+
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def load_legacy(model_dir: Path) -> ModelBundle:
+    art = joblib.load(model_dir / "global_rf.joblib")
+    return ModelBundle(
+        art["pipeline"],
+        art["target_encoder"],
+        art["state_rate"],
+        art["global_rate"],
+        joblib.load(model_dir / "feature_preprocessor.joblib"),
+        joblib.load(model_dir / "cat_encoder.joblib"),
+        merchant_rate=art.get("merchant_rate"),
+        version=_file_digest(model_dir / "global_rf.joblib"),
+        unix_time_offset_s=art.get("unix_time_offset_s", 0),
+    )
+
+
+def current_version(store: Path) -> Optional[str]:
+    pointer = Path(store) / "CURRENT"
+    if not pointer.exists():
+        return None
+    return pointer.read_text().strip() or None
+
+
+def load_version(store: Path, version: str) -> ModelBundle:
+    root = Path(store) / version
+    manifest = json.loads((root / "manifest.json").read_text())
+    if manifest["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model store format {manifest['format_version']} in {root}; "
+            f"re-export it with: python model_store.py export"
+        )
+    pre = joblib.load(root / "preprocess.joblib", mmap_mode="r")
+    clf = joblib.load(root / "classifier.joblib", mmap_mode="r")
+    return ModelBundle(
+        Pipeline([("prep", pre["prep"]), ("clf", clf)]),
+        pre["target_encoder"],
+        manifest["state_rate"],
+        manifest["global_rate"],
+        pre["feature_preproc"],
+        pre["cat_encoder"],
+        merchant_rate=manifest.get("merchant_rate"),
+        version=manifest["version"],
+        forest_dir=root / "forest",
+        unix_time_offset_s=manifest.get("unix_time_offset_s", 0),
+    )
+
+
+def load(store: Path, model_dir: Path) -> ModelBundle:
+    """The store's CURRENT version if there is one, else the legacy joblib files."""
+    version = current_version(store)
+    if version is None:
+        return load_legacy(model_dir)
+    return load_version(store, version)
+
+
+def watch_token(store: Path, model_dir: Path):
+    """Changes whenever ``load`` would pick up a different model."""
+    version = current_version(store)
+    if version is not None:
+        return version
+    path = Path(model_dir) / "global_rf.joblib"
+    return path.stat().st_mtime_ns if path.exists() else None
+
+
+def set_current(store: Path, version: str):
+    tmp = Path(store) / ".CURRENT.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, Path(store) / "CURRENT")
+
+
+def export(bundle: ModelBundle, store: Path) -> str:
+    clf = bundle.fraud_model.named_steps["clf"]
+    flat = getattr(clf, "flat_", None) or FlatForest.from_ensemble(clf)
+    # The forest is stored on its own; ServingModel attaches it again at load.
+    clf = copy.copy(clf)
+    clf.__dict__.pop("flat_", None)
+    clf.__dict__.pop("flat_max_rows", None)
+
+    store = Path(store)
+    store.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=store, prefix=".tmp-"))
+    try:
+        flat.save(tmp / "forest")
+        joblib.dump({
+            "prep": bundle.fitted_prep,
+            "target_encoder": bundle.enc,
+            "feature_preproc": bundle.feature_preproc,
+            "cat_encoder": bundle.cat_ohe,
+        }, tmp / "preprocess.joblib")
+        joblib.dump(clf, tmp / "classifier.joblib")
+        h = hashlib.sha256(flat.digest().encode())
+        h.update((tmp / "preprocess.joblib").read_bytes())
+        h.update((tmp / "classifier.joblib").read_bytes())
+        version = h.hexdigest()[:16]
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "classes": [int(c) for c in flat.classes_],
+            "n_trees": flat.n_trees,
+            "n_nodes": len(flat.is_leaf),
+            "state_rate": {k: float(v) for k, v in bundle.state_rate.items()},
+            "global_rate": float(bundle.global_rate),
+            "merchant_rate": {k: float(v) for k, v in bundle.merchant_rate.items()},
+            "unix_time_offset_s": int(bundle.unix_time_offset.total_seconds()),
+        }
+        (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        if (store / version).exists():
+            shutil.rmtree(tmp)
+        else:
+            os.rename(tmp, store / version)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--model-dir", type=Path, default=Path(__file__).parent / "model")
+    parser.add_argument("--store", type=Path, default=Path(__file__).parent / "model" / "store")
+    parser.add_argument("--no-activate", action="store_true", help="Write the version without updating CURRENT")
+    parser.add_argument(
+        "--unix-time-offset-s", type=int,
+        help="Seconds unix_time runs behind trans_date_trans_time in the training data (default: the artifact's, else 0)",
+    )
+    args = parser.parse_args()
+
+    bundle = load_legacy(args.model_dir)
+    if args.unix_time_offset_s is not None:
+        bundle.unix_time_offset = timedelta(seconds=args.unix_time_offset_s)
+    version = export(bundle, args.store)
+    if not args.no_activate:
+        set_current(args.store, version)
+    print(f"✓ Exported model version {version} to {args.store / version}")
+
+
+if __name__ == "__main__":
+    main()
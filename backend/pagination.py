@@ -0,0 +1,104 @@
+"""Keyset (cursor) pagination over a ``(field, _id)`` descending sort.
+
+A page is an index range seek that starts just past the last row of the page
+before, so its cost does not depend on how deep it is, unlike ``skip``. Cursors
+are opaque url-safe tokens holding the boundary row's sort value and ``_id``
+plus the direction to read in.
+
+Sort fields may hold values of different BSON types (strings and dates for
+transaction times written by different paths, or missing values). MongoDB
+compares ``$lt``/``$gt`` only within a type, so the seek also takes every
+value of the types that sort below (or above) the boundary's type.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import json_util
+
+# BSON sort order of the types these fields hold, lowest first.
+_TYPE_ORDER = ["null", "number", "string", "date"]
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(value, _id, direction: str) -> str:
+    raw = json_util.dumps({"v": value, "i": _id, "d": direction})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[object, object, str]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        doc = json_util.loads(raw)
+        value, _id, direction = doc["v"], doc["i"], doc["d"]
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeDecodeError) as e:
+        raise CursorError(f"Invalid cursor: {e}") from e
+    if direction not in ("next", "prev"):
+        raise CursorError(f"Invalid cursor direction {direction!r}")
+    return value, _id, direction
+
+
+def _type_of(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        raise CursorError("Boolean sort keys are not supported")
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime):
+        return "date"
+    raise CursorError(f"Unsupported sort key type {type(value).__name__}")
+
+
+def _type_clause(field: str, types: List[str]) -> List[dict]:
+    out = []
+    for t in types:
+        # {field: None} also matches a missing field, which sorts as null.
+        out.append({field: None} if t == "null" else {field: {"$type": t}})
+    return out
+
+
+def seek_filter(field: str, value, _id, direction: str) -> dict:
+    """Rows after (``next``) or before (``prev``) the boundary in ``field`` desc, ``_id`` desc order."""
+    op = "$lt" if direction == "next" else "$gt"
+    rank = _TYPE_ORDER.index(_type_of(value))
+    others = _TYPE_ORDER[:rank] if direction == "next" else _TYPE_ORDER[rank + 1:]
+    branches = [{field: value, "_id": {op: _id}}]
+    if value is not None:
+        branches.append({field: {op: value}})
+    branches += _type_clause(field, others)
+    return {"$or": branches}
+
+
+async def keyset_page(coll, query: dict, field: str, limit: int, cursor: Optional[str] = None, projection=None):
+    """Return ``(docs, next_cursor, prev_cursor)`` for one page of ``query`` newest first."""
+    direction, flt = "next", query
+    if cursor:
+        value, _id, direction = decode_cursor(cursor)
+        seek = seek_filter(field, value, _id, direction)
+        flt = {"$and": [query, seek]} if query else seek
+    order = -1 if direction == "next" else 1
+    docs = await coll.find(flt, projection).sort([(field, order), ("_id", order)]).limit(limit + 1).to_list(length=limit + 1)
+    more = len(docs) > limit
+    docs = docs[:limit]
+    if direction == "prev":
+        docs.reverse()
+    if not docs:
+        return docs, None, None
+
+    first, last = docs[0], docs[-1]
+    # Reading forward, there is a previous page unless this is the first one;
+    # reading backward, the page we came from is always next.
+    has_next = more if direction == "next" else True
+    has_prev = bool(cursor) if direction == "next" else more
+    next_cursor = encode_cursor(last.get(field), last["_id"], "next") if has_next else None
+    prev_cursor = encode_cursor(first.get(field), first["_id"], "prev") if has_prev else None
+    return docs, next_cursor, prev_cursor
@@ -0,0 +1,79 @@
+"""``fields=`` projections and lean bodies for the list endpoints.
+
+List rows come straight from our own collections, so they are not validated
+field by field through the response models. ``Shape`` rebuilds each document
+as a plain dict under the keys the model serializes to (aliases included, as
+FastAPI sends them) and pydantic-core encodes it. The model stays the
+documented ``response_model``. ``fields`` narrows the Mongo projection as well
+as the rows. ``format=columns`` sends one array per column instead of one
+object per row, so field names are not repeated on every row.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from bson.binary import Binary
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from trans_nums import to_hex
+from txn_dates import FIELD, display
+
+
+class FieldError(ValueError):
+    pass
+
+
+def _value(key: str, value):
+    if isinstance(value, Binary):
+        return to_hex(value)
+    if isinstance(value, list):
+        # cases.txn_ids
+        return [_value(key, v) for v in value]
+    if key == FIELD and isinstance(value, datetime):
+        # Stored as a date; shown the way rows are entered (see the models' validators).
+        return display(value)
+    return value
+
+
+class Shape:
+    """The response keys of ``model`` and what to send when a document lacks one."""
+
+    def __init__(self, model: type[BaseModel]):
+        self.defaults: Dict[str, object] = {}
+        for name, field in model.model_fields.items():
+            fixed = not field.is_required() and field.default_factory is None
+            self.defaults[field.alias or name] = field.default if fixed else None
+        self.keys: List[str] = list(self.defaults)
+
+    def select(self, fields: Optional[str]) -> List[str]:
+        """Keys named in a comma-separated ``fields``, in that order; every key when empty."""
+        if not fields:
+            return self.keys
+        wanted = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in wanted if f not in self.defaults]
+        if unknown:
+            raise FieldError(f"Unknown fields {', '.join(unknown)}; choose from {', '.join(self.keys)}")
+        return wanted or self.keys
+
+    def projection(self, keys: Iterable[str], *also: str) -> dict:
+        """Mongo projection for ``keys`` plus fields the query itself needs (e.g. a sort key)."""
+        return {k: 1 for k in (*keys, *also)}
+
+    def rows(self, docs: Iterable[dict], keys: List[str]) -> List[dict]:
+        d = self.defaults
+        return [{k: _value(k, doc.get(k, d[k])) for k in keys} for doc in docs]
+
+    def columns(self, docs: Iterable[dict], keys: List[str]) -> Dict[str, list]:
+        docs = list(docs)
+        d = self.defaults
+        return {k: [_value(k, doc.get(k, d[k])) for doc in docs] for k in keys}
+
+    def items(self, docs: Iterable[dict], keys: List[str], fmt: str):
+        return self.columns(docs, keys) if fmt == "columns" else self.rows(docs, keys)
+
+
+def dumps(payload) -> bytes:
+    # NaN scores would otherwise come out as the bare NaN literal, which JSON.parse rejects.
+    return to_json(payload, inf_nan_mode="null")
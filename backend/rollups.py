@@ -0,0 +1,192 @@
+"""Pre-aggregated case buckets for the dashboard.
+
+``case_rollups`` holds one document per (granularity, level, period, state,
+category, merchant). Granularity is ``day`` or ``month``, and the period is
+truncated from ``trans_date_trans_time``. Each case lands in a ``detail``
+bucket keyed by its state, category and merchant, and in a ``total`` bucket
+with those set to None. Buckets carry fraud / non-fraud counts, summed
+amounts and a 10-bin ``fraud_score`` histogram.
+
+Write paths report changed cases as deltas (``deltas_for``), which ``add``
+applies as ``$inc`` upserts. Dashboard reads touch only these buckets, so
+their cost follows the number of periods, not the number of cases.
+``rebuild`` recomputes everything from ``cases`` and corrects the buckets.
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from txn_dates import FIELD, PERIOD_FORMATS, to_date
+
+COLLECTION = "case_rollups"
+DIMENSIONS = ("state", "category", "merchant")
+HIST_BINS = 10
+# Fields of a case a bucket depends on; _update_cases reads these before changing is_fraud.
+CASE_FIELDS = (FIELD, "is_fraud", "amt", "fraud_score") + DIMENSIONS
+KEY_FIELDS = ("g", "level", "t") + DIMENSIONS
+
+Key = Tuple
+
+
+def _period(when: datetime, granularity: str) -> datetime:
+    day = when.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    return day if granularity == "day" else day.replace(day=1)
+
+
+def _bin(score) -> Optional[int]:
+    try:
+        return min(max(int(float(score) * HIST_BINS), 0), HIST_BINS - 1)
+    except (TypeError, ValueError):
+        return None
+
+
+def dated(case: dict) -> bool:
+    # Cases not migrated to a date yet (see migrate_txn_dates.py) have no period to file them under.
+    return isinstance(case.get(FIELD), datetime)
+
+
+def deltas_for(cases: Iterable[dict], sign: int = 1) -> Dict[Key, Counter]:
+    """Bucket increments for adding (``sign=1``) or removing (``-1``) ``cases``; undated cases are left out."""
+    out: Dict[Key, Counter] = defaultdict(Counter)
+    for case in cases:
+        if not dated(case):
+            continue
+        when = case[FIELD]
+        fraud = "fraud" if case.get("is_fraud") == 1 else "non_fraud"
+        inc = Counter({f"{fraud}_count": sign, f"{fraud}_amt": sign * float(case.get("amt") or 0)})
+        b = _bin(case.get("fraud_score"))
+        if b is not None:
+            inc[f"score_hist.{b}"] = sign
+        dims = tuple(case.get(d) for d in DIMENSIONS)
+        for g in ("day", "month"):
+            t = _period(when, g)
+            for level, key_dims in (("total", (None,) * len(DIMENSIONS)), ("detail", dims)):
+                out[(g, level, t) + key_dims].update(inc)
+    return out
+
+
+def merge(into: Dict[Key, Counter], deltas: Mapping[Key, Counter]) -> Dict[Key, Counter]:
+    for k, inc in deltas.items():
+        into.setdefault(k, Counter()).update(inc)
+    return into
+
+
+class Rollups:
+    def __init__(self, db):
+        self.db = db
+        self.coll = db[COLLECTION]
+
+    async def add(self, deltas: Mapping[Key, Counter]):
+        ops = [
+            UpdateOne(dict(zip(KEY_FIELDS, k)), {"$inc": {f: v for f, v in inc.items() if v}}, upsert=True)
+            for k, inc in deltas.items() if any(inc.values())
+        ]
+        if not ops:
+            return
+        try:
+            await self.coll.bulk_write(ops, ordered=False)
+        except PyMongoError as e:
+            # Like counts: never fail the write being rolled up; a rebuild repairs it.
+            print(f"⚠️  Rollup update failed, dashboard buckets drift until the next rebuild: {e}")
+
+    async def rebuild(self, batch: int = 10_000) -> dict:
+        """Recompute every bucket from ``cases`` and correct the stored ones in place.
+
+        Uses the same ``deltas_for`` as the write paths, so both agree on the
+        bucket definition. Each bucket gets its difference from the recount as
+        an ``$inc``, so increments that land while it runs are kept; only
+        cases written during the scan itself can be off until the next run.
+        Undated cases have no bucket and are counted as ``skipped``.
+        """
+        t0 = time.perf_counter()
+        buckets: Dict[Key, Counter] = {}
+        page, n, skipped = [], 0, 0
+        async for case in self.db.cases.find({}, {f: 1 for f in CASE_FIELDS}).batch_size(batch):
+            n += 1
+            if not dated(case):
+                skipped += 1
+                continue
+            page.append(case)
+            if len(page) == batch:
+                merge(buckets, deltas_for(page))
+                page = []
+        merge(buckets, deltas_for(page))
+
+        stored = {tuple(doc.get(f) for f in KEY_FIELDS): _flat(doc) async for doc in self.coll.find({})}
+        ops = []
+        for k in set(buckets) | set(stored):
+            want, have = buckets.get(k, Counter()), stored.get(k, Counter())
+            diff = {f: want[f] - have[f] for f in set(want) | set(have)}
+            diff = {f: v for f, v in diff.items() if abs(v) > 1e-9}
+            if diff:
+                ops.append(UpdateOne(dict(zip(KEY_FIELDS, k)), {"$inc": diff}, upsert=True))
+        for i in range(0, len(ops), batch):
+            await self.coll.bulk_write(ops[i:i + batch], ordered=False)
+        # Buckets whose cases are all gone; one that was just incremented no longer matches.
+        await self.coll.delete_many({"fraud_count": {"$in": [0, None]}, "non_fraud_count": {"$in": [0, None]}})
+
+        elapsed = time.perf_counter() - t0
+        print(f"✓ Rebuilt {len(buckets)} rollup buckets from {n} cases in {elapsed:.1f}s, corrected {len(ops)}")
+        if skipped:
+            print(f"⚠️  {skipped} cases have no trans_date_trans_time date and are not in the rollups")
+        return {
+            "cases": n, "skipped": skipped, "buckets": len(buckets), "corrected": len(ops),
+            "elapsed_s": round(elapsed, 1),
+        }
+
+    async def series(
+        self,
+        granularity: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        **dims,
+    ) -> List[dict]:
+        """Per-period totals oldest first, optionally for one state / category / merchant.
+
+        Month and year series read month buckets; a date range reads day
+        buckets, so ``start`` and ``end`` apply at day resolution.
+        """
+        ranged = start is not None or end is not None
+        g = "day" if granularity == "day" or ranged else "month"
+        dims = {d: v for d, v in dims.items() if v is not None}
+        match: dict = {"g": g, "level": "detail" if dims else "total", **dims}
+        if ranged:
+            match["t"] = {}
+            if start is not None:
+                match["t"]["$gte"] = _period(to_date(start), "day")
+            if end is not None:
+                match["t"]["$lt"] = to_date(end)
+        sums = {"fraud_count", "non_fraud_count", "fraud_amt", "non_fraud_amt"}
+        group = {"_id": "$t", **{f: {"$sum": f"${f}"} for f in sums}}
+        group.update({f"h{b}": {"$sum": f"$score_hist.{b}"} for b in range(HIST_BINS)})
+
+        periods: Dict[str, dict] = {}
+        async for row in self.coll.aggregate([{"$match": match}, {"$group": group}]):
+            label = row["_id"].strftime(PERIOD_FORMATS[granularity])
+            out = periods.setdefault(label, {
+                "period": label, **{f: 0 for f in sums}, "score_hist": [0] * HIST_BINS,
+            })
+            for f in sums:
+                out[f] += row[f]
+            for b in range(HIST_BINS):
+                out["score_hist"][b] += row[f"h{b}"]
+        return [periods[k] for k in sorted(periods)]
+
+
+def _flat(doc: dict) -> Counter:
+    """A stored bucket's values, keyed the way ``deltas_for`` names them."""
+    out = Counter()
+    for f, v in doc.items():
+        if f == "_id" or f in KEY_FIELDS:
+            continue
+        if isinstance(v, dict):
+            out.update({f"{f}.{inner}": n for inner, n in v.items()})
+        else:
+            out[f] = v
+    return out
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import math
+from datetime import timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from features2 import DOB_FORMATS, TXN_TIME_FORMATS, parse_one, parse_unix
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder, StandardScaler
+
+HIGH_CARD_COLS = {"id", "cc_num", "first", "last", "street", "city", "zip", "job", "trans_num", "unix_time"}
+_UNSEEN = "\x00unseen"
+
+
+def _is_identity(step) -> bool:
+    # Fitted ColumnTransformers store "passthrough" as an identity FunctionTransformer.
+    if isinstance(step, str) or step is None:
+        return step in (None, "passthrough")
+    return isinstance(step, FunctionTransformer) and step.func is None
+
+
+def _steps(transformer):
+    if isinstance(transformer, Pipeline):
+        return [step for _, step in transformer.steps if not _is_identity(step)]
+    if _is_identity(transformer):
+        return []
+    return [transformer]
+
+
+class _NumericBlock:
+    def __init__(self, cols, transformer):
+        self.cols = list(cols)
+        self.ops = []
+        for step in _steps(transformer):
+            if isinstance(step, SimpleImputer):
+                if not (isinstance(step.missing_values, float) and math.isnan(step.missing_values)):
+                    raise NotImplementedError("SimpleImputer with non-NaN missing_values")
+                stats = step.statistics_.astype(float)
+                keep = None
+                if not getattr(step, "keep_empty_features", False) and np.isnan(stats).any():
+                    keep = np.flatnonzero(~np.isnan(stats))
+                self.ops.append(("fill", stats, keep))
+            elif isinstance(step, StandardScaler):
+                mean = step.mean_ if step.with_mean else None
+                scale = step.scale_ if step.with_std else None
+                self.ops.append(("scale", mean, scale))
+            else:
+                raise NotImplementedError(f"Unsupported numeric step {type(step).__name__}")
+
+    def apply(self, row: dict) -> np.ndarray:
+        x = np.array([row.get(c, np.nan) for c in self.cols], dtype=float)
+        for op, a, b in self.ops:
+            if op == "fill":
+                x = np.where(np.isnan(x), a, x)
+                if b is not None:
+                    x = x[b]
+            else:
+                if a is not None:
+                    x = x - a
+                if b is not None:
+                    x = x / b
+        return x
+
+
+class _CategoricalBlock:
+    def __init__(self, cols, transformer):
+        self.cols = list(cols)
+        self.fill = None
+        self.encoder = None
+        for step in _steps(transformer):
+            if isinstance(step, SimpleImputer):
+                self.fill = list(step.statistics_)
+            elif isinstance(step, OneHotEncoder) and self.encoder is None:
+                if getattr(step, "drop_idx_", None) is not None or getattr(step, "_infrequent_enabled", False):
+                    raise NotImplementedError("OneHotEncoder with drop/infrequent categories")
+                self.encoder = "onehot"
+                self.ignore_unknown = step.handle_unknown != "error"
+                self._encoder_tables(step)
+            elif isinstance(step, OrdinalEncoder) and self.encoder is None:
+                self.encoder = "ordinal"
+                self.unknown_value = (
+                    step.unknown_value if step.handle_unknown == "use_encoded_value" else None
+                )
+                self._encoder_tables(step)
+            else:
+                raise NotImplementedError(f"Unsupported categorical step {type(step).__name__}")
+        if self.encoder is None:
+            raise NotImplementedError("Categorical block without an encoder")
+
+    def _encoder_tables(self, encoder):
+        self.index = [{v: i for i, v in enumerate(cats)} for cats in encoder.categories_]
+        self.offsets = np.cumsum([0] + [len(cats) for cats in encoder.categories_])
+
+    def apply(self, row: dict) -> Optional[np.ndarray]:
+        if self.encoder == "onehot":
+            out = np.zeros(self.offsets[-1])
+        else:
+            out = np.empty(len(self.cols))
+        for j, col in enumerate(self.cols):
+            value = row.get(col)
+            if self.fill is not None and (value is None or value != value):
+                value = self.fill[j]
+            pos = self.index[j].get(value)
+            if self.encoder == "onehot":
+                if pos is None:
+                    if not self.ignore_unknown:
+                        return None
+                    continue
+                out[self.offsets[j] + pos] = 1.0
+            else:
+                if pos is None:
+                    if self.unknown_value is None:
+                        return None
+                    pos = self.unknown_value
+                out[j] = pos
+        return out
+
+
+def _compile_column_transformer(ct: ColumnTransformer):
+    blocks = []
+    for name, transformer, cols in ct.transformers_:
+        if isinstance(transformer, str) and transformer == "drop" or len(cols) == 0:
+            continue
+        cols = list(cols)
+        if name == "remainder" and not isinstance(cols[0], str):
+            cols = [ct.feature_names_in_[i] for i in cols]
+        steps = _steps(transformer)
+        if any(isinstance(s, (OneHotEncoder, OrdinalEncoder)) for s in steps):
+            blocks.append(_CategoricalBlock(cols, transformer))
+        else:
+            blocks.append(_NumericBlock(cols, transformer))
+    return blocks
+
+
+class RowScorer:
+    """Turns one raw transaction dict into the float32 vector the classifier sees.
+
+    Every fitted transformer is flattened into plain lookup tables at startup so
+    scoring a single row never touches pandas. ``transform`` returns ``None``
+    for inputs it cannot reproduce exactly (unknown timestamp shapes, unknown
+    categories with ``handle_unknown="error"``); callers fall back to
+    ``build_features`` in that case.
+    """
+
+    def __init__(
+        self, feature_preproc, te, cat_encoder, state_rate, global_rate, fitted_prep, model_prep=None,
+        unix_time_offset: timedelta = timedelta(0),
+    ):
+        self.feature_blocks = _compile_column_transformer(feature_preproc)
+        self.feature_names = list(feature_preproc.get_feature_names_out())
+        self.model_blocks = _compile_column_transformer(model_prep if model_prep is not None else fitted_prep)
+
+        te_col = next(m for m in te.ordinal_encoder.mapping if m["col"] == "merchant")
+        merchants = [m for m in te_col["mapping"].index if isinstance(m, str)]
+        te_values = te.transform(pd.DataFrame({"merchant": merchants + [_UNSEEN]}))["merchant"].to_numpy(dtype=float)
+        self.merchant_index = {m: i for i, m in enumerate(merchants)}
+        self.merchant_te = te_values[:-1]
+        self.merchant_te_unknown = float(te_values[-1])
+
+        self.category_index = {c: i for i, c in enumerate(cat_encoder.categories_[0])}
+        self.amt_x_cols = [f"amt_x_{c}" for c in cat_encoder.get_feature_names_out(["category"])]
+
+        self.state_rate = {
+            k: v for k, v in state_rate.items() if v is not None and v == v
+        }
+        self.global_rate = float(global_rate)
+        self.unix_time_offset = unix_time_offset
+
+    def _raw_features(self, txn: dict) -> Optional[dict]:
+        trans_time = parse_one(txn.get("trans_date_trans_time"), TXN_TIME_FORMATS)
+        if trans_time is None and "unix_time" in txn:
+            trans_time = parse_unix(txn["unix_time"], self.unix_time_offset)
+        dob = parse_one(txn["dob"], DOB_FORMATS)
+        if trans_time is None or dob is None:
+            return None
+
+        row = {
+            k: v for k, v in txn.items()
+            if k not in HIGH_CARD_COLS
+        }
+        for k in ("trans_date_trans_time", "dob", "merchant", "amt", "lat", "long", "merch_lat", "merch_long"):
+            row.pop(k, None)
+        row.setdefault("is_fraud", 0)
+        row["age"] = (trans_time - dob).days // 365
+        row["txn_hour"] = trans_time.hour
+        row["txn_dow"] = trans_time.weekday()
+        row["txn_month"] = trans_time.month
+
+        pos = self.merchant_index.get(txn["merchant"])
+        row["merchant_te"] = self.merchant_te[pos] if pos is not None else self.merchant_te_unknown
+
+        amt_log = math.log1p(txn["amt"])
+        row["amt_log"] = amt_log
+        row["distance"] = math.sqrt((txn["merch_lat"] - txn["lat"]) ** 2 + (txn["merch_long"] - txn["long"]) ** 2)
+        cat_pos = self.category_index.get(txn["category"])
+        for i, col in enumerate(self.amt_x_cols):
+            row[col] = amt_log if i == cat_pos else 0.0
+        return row
+
+    @staticmethod
+    def _apply(blocks, row: dict) -> Optional[np.ndarray]:
+        parts = []
+        for block in blocks:
+            part = block.apply(row)
+            if part is None:
+                return None
+            parts.append(part)
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def transform(self, txn: dict) -> Optional[np.ndarray]:
+        try:
+            row = self._raw_features(txn)
+            if row is None:
+                return None
+            features = self._apply(self.feature_blocks, row)
+            if features is None:
+                return None
+            aligned = dict(zip(self.feature_names, features))
+            aligned["state_risk"] = self.state_rate.get(txn["state"], self.global_rate)
+            vec = self._apply(self.model_blocks, aligned)
+        except (TypeError, ValueError):
+            return None
+        if vec is None:
+            return None
+        return vec.astype(np.float32)
@@ -0,0 +1,96 @@
+"""Index-friendly text filters for transaction analysis.
+
+Every transaction stores a folded copy of ``merchant``, ``category`` and
+``state`` (``merchant_lc`` and so on). The copy is case-folded, stripped of
+accents and whitespace-normalised. Filters fold the analyst's input the same
+way and match the copy exactly or by prefix. A prefix becomes a
+``$gte``/``$lt`` range on the plain index, so both kinds of match are index
+bounds. An unanchored case-insensitive ``$regex`` has to test every key or
+document.
+"""
+from __future__ import annotations
+
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+SHADOW_FIELDS: Dict[str, str] = {"merchant": "merchant_lc", "category": "category_lc", "state": "state_lc"}
+SHADOW_COLUMNS: List[str] = list(SHADOW_FIELDS.values())
+# The source dataset prefixes every merchant name with "fraud_"; searching
+# for "kirlin" should find "fraud_Kirlin and Sons".
+_MERCHANT_PREFIX = "fraud_"
+
+
+def fold(value, field: Optional[str] = None) -> Optional[str]:
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    text = unicodedata.normalize("NFKD", str(value))
+    text = " ".join("".join(ch for ch in text if not unicodedata.combining(ch)).casefold().split())
+    if field == "merchant" and text.startswith(_MERCHANT_PREFIX):
+        text = text[len(_MERCHANT_PREFIX):]
+    return text
+
+
+def add_shadow_fields(doc: dict) -> dict:
+    for field, shadow in SHADOW_FIELDS.items():
+        if field in doc:
+            doc[shadow] = fold(doc[field], field)
+    return doc
+
+
+def shadow_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """``add_shadow_fields`` for a chunk; each distinct value is folded once."""
+    for field, shadow in SHADOW_FIELDS.items():
+        if field in df.columns:
+            codes, uniques = pd.factorize(df[field])
+            folded = [fold(v, field) for v in uniques] + [None]
+            # Missing values have code -1, which picks the trailing None. Object
+            # dtype keeps it None; an inferred string column would make it NaN.
+            df[shadow] = pd.Series([folded[c] for c in codes], index=df.index, dtype=object)
+    return df
+
+
+def _prefix_range(text: str) -> dict:
+    # Strings starting with `text` sort in [text, text with its last character bumped).
+    return {"$gte": text, "$lt": text[:-1] + chr(ord(text[-1]) + 1)}
+
+
+def text_filter(field: str, value: str, match: str = "prefix") -> dict:
+    text = fold(value, field)
+    if not text:
+        return {}
+    return {SHADOW_FIELDS[field]: text if match == "exact" else _prefix_range(text)}
+
+
+def analysis_query(
+    merchant: Optional[str] = None,
+    category: Optional[str] = None,
+    state: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    match: str = "prefix",
+) -> dict:
+    """Filter for the analysis and export endpoints; ``end`` is a day and includes all of it."""
+    query: dict = {}
+    for field, value in (("merchant", merchant), ("category", category), ("state", state)):
+        if value:
+            query.update(text_filter(field, value, match))
+    amt = {}
+    if min_amount is not None:
+        amt["$gte"] = min_amount
+    if max_amount is not None:
+        amt["$lte"] = max_amount
+    if amt:
+        query["amt"] = amt
+    when = {}
+    if start is not None:
+        when["$gte"] = start
+    if end is not None:
+        when["$lt"] = end + timedelta(days=1)
+    if when:
+        query["trans_date_trans_time"] = when
+    return query
@@ -72,42 +72,42 @@ def generate_random_transaction():
     
     return transaction
 
-def seed_transactions(count=100):
-    """Seed the database with random transactions"""
+def seed_transactions(count=100, chunk=1000):
+    """Seed the database with random transactions through the bulk endpoint"""
     
     print(f"Starting to seed {count} transactions...")
     success_count = 0
     error_count = 0
+    t0 = time.perf_counter()
     
-    for i in range(count):
+    for start in range(0, count, chunk):
+        batch = [generate_random_transaction() for _ in range(min(chunk, count - start))]
         try:
-            transaction = generate_random_transaction()
-            
-            # Call the API
             response = requests.post(
-                f"{API_BASE}/transactions/all",
+                f"{API_BASE}/transactions/bulk",
                 headers=HEADERS,
-                json=transaction
+                data="\n".join(json.dumps(t) for t in batch),
             )
-            
             if response.status_code == 200:
-                success_count += 1
-                print(f"✓ Transaction {i+1}/{count} created successfully")
+                result = response.json()
+                success_count += result["inserted"]
+                error_count += len(result["errors"])
+                for err in result["errors"][:5]:
+                    print(f"✗ Row {start + err['row'] + 1} failed: {err['error']}")
             else:
-                error_count += 1
-                print(f"✗ Transaction {i+1}/{count} failed: {response.status_code} - {response.text}")
-                
+                error_count += len(batch)
+                print(f"✗ Rows {start + 1}-{start + len(batch)} failed: {response.status_code} - {response.text}")
         except Exception as e:
-            error_count += 1
-            print(f"✗ Transaction {i+1}/{count} error: {str(e)}")
-        
-        # Small delay to avoid overwhelming the server
-        time.sleep(0.1)
+            error_count += len(batch)
+            print(f"✗ Rows {start + 1}-{start + len(batch)} error: {str(e)}")
+        print(f"✓ {start + len(batch)}/{count} sent")
     
+    elapsed = time.perf_counter() - t0
     print(f"\nSeeding completed!")
     print(f"Success: {success_count}")
     print(f"Errors: {error_count}")
     print(f"Total: {count}")
+    print(f"Rate: {count / elapsed:.0f} rows/s")
 
 def test_success_rate():
     """Test the success rate endpoint"""
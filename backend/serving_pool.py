@@ -0,0 +1,70 @@
+"""Process-pool scoring over a memory-mapped FlatForest.
+
+The parent exports the flat forest once as ``.npy`` files (on tmpfs when
+available); every worker process ``np.load(mmap_mode="r")``s the same files,
+so the node arrays live once in the page cache and each worker only adds its
+interpreter overhead to RSS. This module is imported by spawned workers and
+must stay free of the API's import-time model loading.
+"""
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from ensemble import FlatForest
+
+_forest = None
+_fraud_idx = 1
+
+
+def default_shared_dir() -> Path:
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+    return base / "cc-fraud-flat-forest"
+
+
+def export_shared(flat: FlatForest, base_dir: Path) -> Path:
+    """Save ``flat`` under ``base_dir/<digest>`` unless an identical copy is already there."""
+    target = Path(base_dir) / flat.digest()
+    if target.exists():
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=target.parent, prefix=".tmp-"))
+    try:
+        flat.save(tmp)
+        os.rename(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not target.exists():
+            raise
+    return target
+
+
+def _init_worker(path: str, fraud_idx: int):
+    global _forest, _fraud_idx
+    _forest = FlatForest.load(path, mmap_mode="r")
+    _fraud_idx = fraud_idx
+
+
+def score(X):
+    return _forest.predict_proba(X)[:, _fraud_idx]
+
+
+def start_pool(path: Path, workers: int, fraud_idx: int) -> ProcessPoolExecutor:
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(str(path), fraud_idx),
+    )
+    # Start workers now so the first requests do not pay process start-up.
+    list(pool.map(_ping, range(workers)))
+    return pool
+
+
+def _ping(_):
+    return os.getpid()
@@ -0,0 +1,302 @@
+"""Streaming CSV/NDJSON ingestion: score and store transactions chunk by chunk.
+
+Usage: python stream_ingest.py FILE [--format csv|ndjson] [--chunk 5000] [--job NAME] [--offset N]
+
+Rows in the ``fraudTrain.csv`` schema are read ``chunk`` at a time, scored with
+the vectorized build_features + model path and written with
+``ingest.write_transactions``, so memory is bounded by the chunk size rather
+than the file. Scoring the next chunk overlaps with writing the previous one.
+
+Every stored row gets the model's ``fraud_score`` and ``predicted_fraud``.
+A row with a 0/1 ``is_fraud`` (fraudTrain.csv has one) keeps it as its
+label, which decides the fraud bucket and case; other rows take the
+prediction there, as /detect does.
+
+After every written chunk the number of data rows consumed so far is saved in
+the ``ingest_jobs`` collection under the job name (the file name by default).
+Running the same job again skips that many rows, so a crashed backfill resumes
+where it stopped. A chunk is checkpointed only once its writes finish; rows of
+the chunk in flight during a crash may be written twice.
+
+``POST /transactions/ingest`` runs the same loop over a streamed request body.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import pandas as pd
+from bson.binary import Binary
+
+from ingest import write_transactions
+import search
+import trans_nums
+import txn_dates
+
+# Columns stored with every transaction, as in TxnFull.
+STORED_COLUMNS = [
+    "trans_num", "cc_num", "amt", "merchant", "category", "trans_date_trans_time",
+    "first", "last", "gender", "street", "city", "state", "zip", "lat", "long",
+    "city_pop", "job", "dob", "unix_time", "merch_lat", "merch_long",
+]
+UNPARSEABLE = "Unparseable trans_date_trans_time or dob"
+SAMPLE_ERRORS = 5
+
+
+async def file_lines(path) -> AsyncIterator[str]:
+    with open(path, encoding="utf-8", newline="") as f:
+        for line in f:
+            yield line
+
+
+async def body_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed request body into lines without holding all of it."""
+    rest = b""
+    async for part in chunks:
+        *lines, rest = (rest + part).split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8") + "\n"
+    if rest:
+        yield rest.decode("utf-8")
+
+
+def parse_chunk(lines: List[str], fmt: str, header: Optional[str]) -> Tuple[pd.DataFrame, List[int], Dict[int, str]]:
+    """Parse ``lines`` into a frame; returns (frame, chunk position of each frame row, errors)."""
+    if fmt == "csv":
+        df = pd.read_csv(io.StringIO(header + "".join(lines)), dtype={"trans_num": str}, low_memory=False)
+        if len(df) != len(lines):
+            raise ValueError(f"Expected {len(lines)} CSV rows, parsed {len(df)} (multi-line fields are not supported)")
+        return df.loc[:, ~df.columns.str.startswith("Unnamed")], list(range(len(lines))), {}
+
+    records, positions, errors = [], [], {}
+    for i, line in enumerate(lines):
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError as e:
+            errors[i] = f"Invalid JSON: {e}"
+            continue
+        if not isinstance(rec, dict):
+            errors[i] = "Expected a JSON object"
+            continue
+        records.append(rec)
+        positions.append(i)
+    return pd.DataFrame.from_records(records), positions, errors
+
+
+def _trans_num(value) -> Binary:
+    # Rows without an id get a fresh one, like /detect.
+    if isinstance(value, str) and value:
+        return trans_nums.to_binary(value)
+    return trans_nums.new()
+
+
+def score_chunk(model, lines: List[str], fmt: str, header: Optional[str], cutoff: float, extra: dict):
+    """Parse and score one chunk; returns (docs, chunk position per doc, errors)."""
+    try:
+        df, positions, errors = parse_chunk(lines, fmt, header)
+        if df.empty:
+            return [], [], errors
+        # Parsed once here; build_features takes a datetime column as it is.
+        df[txn_dates.FIELD] = txn_dates.to_dates(df[txn_dates.FIELD]) if txn_dates.FIELD in df else pd.NaT
+        # Without unix_time, scoring drops undated rows too: storage does not date them from it (see txn_dates).
+        kept, probas = model.score_raw(df.drop(columns="unix_time", errors="ignore"))
+    except (ValueError, KeyError, pd.errors.ParserError) as e:
+        return [], [], {i: str(e) for i in range(len(lines))}
+
+    for i in set(range(len(df))) - set(kept.tolist()):
+        errors[positions[i]] = UNPARSEABLE
+    search.shadow_frame(df)
+    names = [c for c in STORED_COLUMNS + search.SHADOW_COLUMNS if c in df.columns]
+    # Column-wise tolist() is several times faster than DataFrame.to_dict("records").
+    # (datetime64 tolist() gives integers, so that column goes through object.)
+    columns = [(df[c].astype(object) if c == txn_dates.FIELD else df[c]).to_numpy()[kept].tolist() for c in names]
+    rows = [dict(zip(names, vals)) for vals in zip(*columns)]
+
+    labels = pd.to_numeric(df["is_fraud"], errors="coerce") if "is_fraud" in df else pd.Series(index=df.index, dtype=float)
+    labels = labels.where(labels.isin([0, 1])).to_numpy()[kept].tolist()
+
+    docs = []
+    for doc, proba, label in zip(rows, probas, labels):
+        predicted = int(proba >= cutoff)
+        doc["trans_num"] = _trans_num(doc.get("trans_num"))
+        doc.update(
+            is_fraud=predicted if pd.isna(label) else int(label),
+            predicted_fraud=predicted,
+            fraud_score=float(proba),
+            **extra,
+        )
+        docs.append(doc)
+    return docs, [positions[i] for i in kept], errors
+
+
+async def _chunks(lines: AsyncIterator[str], size: int, skip: int) -> AsyncIterator[List[str]]:
+    batch = []
+    async for line in lines:
+        if not line.strip():
+            continue
+        if skip:
+            skip -= 1
+            continue
+        batch.append(line)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ingest(
+    lines: AsyncIterator[str],
+    db,
+    seq,
+    model,
+    fmt: str = "csv",
+    chunk_rows: int = 5000,
+    job: Optional[str] = None,
+    offset: Optional[int] = None,
+    cutoff: float = 0.64,
+    extra: Optional[dict] = None,
+    counts=None,
+    rollups=None,
+) -> AsyncIterator[dict]:
+    """Score and store ``lines``, yielding a progress dict after every written chunk.
+
+    ``offset`` is the number of data rows to skip; when it is None and ``job``
+    has a checkpoint in ``ingest_jobs``, ingestion resumes from there.
+    """
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Unknown format {fmt!r}, expected csv or ndjson")
+    jobs = db["ingest_jobs"]
+    state = {"offset": 0, "inserted": 0, "errors": 0}
+    if job is not None:
+        saved = await jobs.find_one({"_id": job})
+        if saved and offset is None:
+            state = {k: saved.get(k, 0) for k in state}
+    if offset is not None:
+        state["offset"] = offset
+    start_offset = state["offset"]
+
+    lines = lines.__aiter__()
+    header = None
+    if fmt == "csv":
+        async for line in lines:
+            if line.strip():
+                header = line if line.endswith("\n") else line + "\n"
+                break
+        if header is None:
+            return
+
+    t0 = time.perf_counter()
+
+    async def write(base, batch, scored):
+        docs, doc_rows, errors = scored
+        if docs:
+            ids = await seq.claim("transactions", len(docs))
+            for i, doc in enumerate(docs):
+                doc["id"] = ids + i
+            failed = await write_transactions(db, seq, docs, counts, rollups)
+            for k, msg in failed.items():
+                errors[doc_rows[k]] = msg
+        state["offset"] = base + len(batch)
+        state["inserted"] += len(batch) - len(errors)
+        state["errors"] += len(errors)
+        elapsed = time.perf_counter() - t0
+        progress = {
+            **state,
+            "rows": state["offset"] - start_offset,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round((state["offset"] - start_offset) / elapsed, 1) if elapsed else 0.0,
+            "model_version": model.version,
+            "sample_errors": [{"row": base + i, "error": errors[i]} for i in sorted(errors)[:SAMPLE_ERRORS]],
+        }
+        if job is not None:
+            await jobs.update_one(
+                {"_id": job},
+                {"$set": {**state, "status": "running", "updated_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        return progress
+
+    # At most two chunks are held: the one being written and the one being scored.
+    pending = None
+    base = state["offset"]
+    try:
+        async for batch in _chunks(lines, chunk_rows, state["offset"]):
+            scored = await asyncio.to_thread(score_chunk, model, batch, fmt, header, cutoff, extra or {})
+            if pending is not None:
+                yield await pending
+            pending = asyncio.ensure_future(write(base, batch, scored))
+            base += len(batch)
+        if pending is not None:
+            yield await pending
+            pending = None
+    except BaseException:
+        if pending is not None:
+            pending.cancel()
+        if job is not None:
+            await jobs.update_one({"_id": job}, {"$set": {"status": "failed"}})
+        raise
+    if job is not None:
+        await jobs.update_one({"_id": job}, {"$set": {"status": "done"}}, upsert=True)
+
+
+async def _main(args):
+    from dotenv import find_dotenv, load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    import model_store
+    from counts import Counts
+    from model_serving import ServingModel
+    from rollups import Rollups
+    from sequences import SequenceAllocator
+
+    load_dotenv(find_dotenv())
+    db = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))[os.getenv("DB_NAME", "cc-fraud-web")]
+    seq = SequenceAllocator(db["counters"], block=int(os.getenv("SEQ_BLOCK", "1000")))
+    model = ServingModel(model_store.load(args.store, args.model_dir))
+    job = args.job or Path(args.file).name
+    print(f"✓ Ingesting {args.file} as job {job!r} with model {model.version}")
+
+    last = None
+    try:
+        async for last in ingest(
+            file_lines(args.file), db, seq, model, fmt=args.format, chunk_rows=args.chunk,
+            job=job, offset=args.offset, cutoff=args.cutoff, counts=Counts(db), rollups=Rollups(db),
+        ):
+            print(
+                f"✓ offset {last['offset']}: {last['inserted']} inserted, {last['errors']} errors, "
+                f"{last['rows_per_s']:.0f} rows/s"
+            )
+            for err in last["sample_errors"]:
+                print(f"⚠️  row {err['row']}: {err['error']}")
+    finally:
+        await model.close()
+    if last is not None:
+        print(f"✓ Done: {last['rows']} rows in {last['elapsed_s']:.1f}s ({last['rows_per_s']:.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None, help="Defaults to the file extension")
+    parser.add_argument("--chunk", type=int, default=5000)
+    parser.add_argument("--job", default=None, help="Checkpoint name; defaults to the file name")
+    parser.add_argument("--offset", type=int, default=None, help="Data rows to skip instead of the saved checkpoint")
+    parser.add_argument("--cutoff", type=float, default=0.64)
+    parser.add_argument("--model-dir", type=Path, default=Path(__file__).parent / "model")
+    parser.add_argument("--store", type=Path, default=Path(os.getenv("MODEL_STORE", Path(__file__).parent / "model" / "store")))
+    args = parser.parse_args()
+    if args.format is None:
+        args.format = "ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv"
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""CSV export chunks, plain and gzip.
+
+Run from backend/: python -m pytest -q test_csv_export.py
+"""
+import asyncio
+import csv
+import gzip
+import io
+import uuid
+from datetime import datetime
+
+import pytest
+from bson.binary import Binary, UUID_SUBTYPE
+
+import csv_export
+from csv_export import EXPORT_COLUMNS, csv_chunks
+
+U = uuid.UUID("1e8d17e4-61f8-4104-9784-29175f863fc9")
+
+
+def _docs(n):
+    return [
+        {
+            "record_id": i,
+            "trans_num": Binary(U.bytes, UUID_SUBTYPE),
+            "trans_date_trans_time": datetime(2020, 6, 21, 12, 14),
+            "merchant": 'fraud_Kirlin, "and" Sons',
+            "amt": 1.5 + i,
+            "is_fraud": i % 2,
+            "state": None,
+            "ignored": "not exported",
+        }
+        for i in range(n)
+    ]
+
+
+async def _cursor(docs):
+    for doc in docs:
+        yield doc
+
+
+def _export(docs, **kwargs):
+    async def run():
+        return [chunk async for chunk in csv_chunks(docs[0] if docs else None, _cursor(docs[1:]), **kwargs)]
+    return asyncio.run(run())
+
+
+def _rows(data: bytes):
+    return list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_export(compress, monkeypatch):
+    monkeypatch.setattr(csv_export, "CHUNK_BYTES", 1024)
+    docs = _docs(50)
+    chunks = _export(docs, compress=compress)
+    assert len(chunks) > 1
+    data = b"".join(chunks)
+    if compress:
+        data = gzip.decompress(data)
+    assert data.splitlines()[0].decode() == ",".join(EXPORT_COLUMNS)
+    rows = _rows(data)
+    assert len(rows) == 50
+    assert rows[3]["record_id"] == "3"
+    assert rows[3]["trans_num"] == U.hex
+    assert rows[3]["trans_date_trans_time"] == "2020-06-21 12:14:00"
+    assert rows[3]["merchant"] == 'fraud_Kirlin, "and" Sons'
+    assert rows[3]["amt"] == "4.5"
+    assert rows[3]["state"] == ""
+    assert "ignored" not in rows[3]
+
+
+def test_gzip_is_one_stream(monkeypatch):
+    # Every chunk continues the same member, so a reader sees one file.
+    monkeypatch.setattr(csv_export, "CHUNK_BYTES", 1024)
+    chunks = _export(_docs(50), compress=True)
+    assert len(chunks) > 1 and chunks[0][:2] == b"\x1f\x8b"
+    assert all(not c.startswith(b"\x1f\x8b") for c in chunks[1:])
+    assert gzip.decompress(b"".join(chunks)) == b"".join(_export(_docs(50)))
+
+
+def test_empty_export_has_the_header():
+    assert b"".join(_export([])).decode() == ",".join(EXPORT_COLUMNS) + "\n"
+    assert gzip.decompress(b"".join(_export([], compress=True))).decode() == ",".join(EXPORT_COLUMNS) + "\n"
@@ -0,0 +1,84 @@
+"""FlatForest against the per-classifier EnsembleClassifier loop.
+
+Run from backend/: python -m pytest -q test_flat_forest.py
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from ensemble import EnsembleClassifier, FlatForest
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 8))
+    y = ((X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(0, 0.5, 600)) > 0.5).astype(int)
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def ensemble(data):
+    X, y = data
+    clfs = [
+        RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X[::2], y[::2]),
+        ExtraTreesClassifier(n_estimators=10, random_state=1).fit(X[1::2], y[1::2]),
+        DecisionTreeClassifier(max_depth=5, random_state=2).fit(X, y),
+    ]
+    return EnsembleClassifier(clfs, np.array([0.5, 0.3, 0.2]))
+
+
+def _reference(model: EnsembleClassifier, X):
+    return EnsembleClassifier(model.clfs, model.weights).predict_proba(X)
+
+
+def test_parity(ensemble, data):
+    X = np.random.default_rng(1).normal(size=(300, data[0].shape[1]))
+    flat = FlatForest.from_ensemble(ensemble)
+    assert flat.n_trees == 26
+    np.testing.assert_allclose(flat.predict_proba(X), _reference(ensemble, X), atol=1e-9)
+
+
+def test_parity_across_row_blocks(ensemble, data, monkeypatch):
+    monkeypatch.setattr(FlatForest, "ROW_BLOCK", 26 * 7)
+    X = data[0][:50]
+    np.testing.assert_allclose(FlatForest.from_ensemble(ensemble).predict_proba(X), _reference(ensemble, X), atol=1e-9)
+
+
+def test_parity_with_missing_values(data):
+    X, y = data
+    X = X.copy()
+    X[::5, 0] = np.nan
+    clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    flat = FlatForest.from_ensemble(clf)
+    assert flat.missing_left is not None
+    np.testing.assert_allclose(flat.predict_proba(X), clf.predict_proba(X), atol=1e-9)
+
+
+def test_saved_forest_maps_back(ensemble, data, tmp_path):
+    flat = FlatForest.from_ensemble(ensemble)
+    flat.save(tmp_path / "forest")
+    loaded = FlatForest.load(tmp_path / "forest")
+    assert isinstance(loaded.value, np.memmap)
+    assert loaded.digest() == flat.digest()
+    np.testing.assert_array_equal(loaded.predict_proba(data[0]), flat.predict_proba(data[0]))
+    assert EnsembleClassifier(ensemble.clfs, ensemble.weights).compile(flat=loaded).flat_ is loaded
+
+
+def test_compile_cutoff(ensemble, data):
+    model = EnsembleClassifier(ensemble.clfs, ensemble.weights).compile(max_rows=10)
+    calls = []
+    predict = model.flat_.predict_proba
+    model.flat_.predict_proba = lambda X: calls.append(len(X)) or predict(X)
+    X = data[0]
+    np.testing.assert_allclose(model.predict_proba(X[:10]), _reference(ensemble, X[:10]), atol=1e-9)
+    np.testing.assert_allclose(model.predict_proba(X[:11]), _reference(ensemble, X[:11]), atol=1e-9)
+    assert calls == [10]
+
+
+def test_mismatched_classes_are_refused(data):
+    X, y = data
+    other = DecisionTreeClassifier(max_depth=2).fit(X, y + 1)
+    with pytest.raises(NotImplementedError):
+        FlatForest.from_ensemble(EnsembleClassifier([DecisionTreeClassifier(max_depth=2).fit(X, y), other], [0.5, 0.5]))
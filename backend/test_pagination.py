@@ -0,0 +1,65 @@
+"""Keyset cursor encoding and seek filters.
+
+Run from backend/: python -m pytest -q test_pagination.py
+"""
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from pagination import CursorError, decode_cursor, encode_cursor, seek_filter
+
+BOUNDARIES = [None, 42, 12.5, "6/21/2020 12:14", datetime(2020, 6, 21, 12, 14, 0, 123000)]
+
+
+@pytest.mark.parametrize("value", BOUNDARIES)
+@pytest.mark.parametrize("direction", ["next", "prev"])
+def test_cursor_round_trip(value, direction):
+    _id = ObjectId()
+    token = encode_cursor(value, _id, direction)
+    assert "=" not in token and "/" not in token and "+" not in token
+    assert decode_cursor(token) == (value, _id, direction)
+
+
+@pytest.mark.parametrize("token", ["", "not a cursor", "!!!!", encode_cursor(1, 2, "next")[:-3]])
+def test_garbage_cursor_is_rejected(token):
+    with pytest.raises(CursorError):
+        decode_cursor(token)
+
+
+def test_unknown_direction_is_rejected():
+    with pytest.raises(CursorError, match="direction"):
+        decode_cursor(encode_cursor(1, 2, "sideways"))
+
+
+def test_seek_next_takes_lower_types():
+    when = datetime(2020, 1, 1)
+    flt = seek_filter("t", when, 7, "next")
+    assert flt["$or"] == [
+        {"t": when, "_id": {"$lt": 7}},
+        {"t": {"$lt": when}},
+        {"t": None},
+        {"t": {"$type": "number"}},
+        {"t": {"$type": "string"}},
+    ]
+
+
+def test_seek_prev_takes_higher_types():
+    flt = seek_filter("t", "abc", 7, "prev")
+    assert flt["$or"] == [
+        {"t": "abc", "_id": {"$gt": 7}},
+        {"t": {"$gt": "abc"}},
+        {"t": {"$type": "date"}},
+    ]
+
+
+def test_seek_from_null_boundary():
+    # Nothing sorts below null, and there is no range within it.
+    assert seek_filter("t", None, 7, "next") == {"$or": [{"t": None, "_id": {"$lt": 7}}]}
+
+
+def test_unsupported_sort_key():
+    with pytest.raises(CursorError):
+        seek_filter("t", True, 7, "next")
+    with pytest.raises(CursorError):
+        seek_filter("t", [1], 7, "next")
@@ -0,0 +1,72 @@
+"""Bucket math behind the dashboard rollups.
+
+Run from backend/: python -m pytest -q test_rollups.py
+"""
+from collections import Counter
+from datetime import datetime
+
+from rollups import _bin, _flat, dated, deltas_for, merge
+
+CASE = {
+    "trans_date_trans_time": datetime(2020, 6, 21, 12, 14, 25),
+    "is_fraud": 1, "amt": 12.5, "fraud_score": 0.93,
+    "state": "NY", "category": "travel", "merchant": "fraud_Kirlin",
+}
+DAY, MONTH = datetime(2020, 6, 21), datetime(2020, 6, 1)
+TOTAL = (None, None, None)
+DETAIL = ("NY", "travel", "fraud_Kirlin")
+
+
+def test_case_lands_in_four_buckets():
+    out = deltas_for([CASE])
+    assert set(out) == {
+        ("day", "total", DAY) + TOTAL, ("day", "detail", DAY) + DETAIL,
+        ("month", "total", MONTH) + TOTAL, ("month", "detail", MONTH) + DETAIL,
+    }
+    for inc in out.values():
+        assert inc == Counter({"fraud_count": 1, "fraud_amt": 12.5, "score_hist.9": 1})
+
+
+def test_totals_add_up_across_cases():
+    other = {**CASE, "trans_date_trans_time": datetime(2020, 6, 2), "is_fraud": 0, "amt": 3, "fraud_score": 0.05, "state": "CA"}
+    out = deltas_for([CASE, other])
+    assert out[("month", "total", MONTH) + TOTAL] == Counter({
+        "fraud_count": 1, "fraud_amt": 12.5, "non_fraud_count": 1, "non_fraud_amt": 3.0,
+        "score_hist.9": 1, "score_hist.0": 1,
+    })
+    assert ("month", "detail", MONTH, "CA", "travel", "fraud_Kirlin") in out
+    assert len(out) == 7  # the month total is shared
+
+
+def test_removal_cancels_addition():
+    moved = {**CASE, "is_fraud": 0}
+    out = merge(deltas_for([moved]), deltas_for([CASE], -1))
+    inc = out[("day", "total", DAY) + TOTAL]
+    assert +inc == Counter({"non_fraud_count": 1, "non_fraud_amt": 12.5})
+    assert -inc == Counter({"fraud_count": 1, "fraud_amt": 12.5})
+    assert inc["score_hist.9"] == 0
+
+
+def test_score_bins():
+    assert [_bin(s) for s in (0, 0.0999, 0.1, 0.5, 0.999, 1.0, 1.7, -0.2)] == [0, 0, 1, 5, 9, 9, 9, 0]
+    assert _bin(None) is None and _bin("n/a") is None
+
+
+def test_missing_score_and_amount():
+    out = deltas_for([{**CASE, "fraud_score": None, "amt": None}])
+    assert out[("day", "total", DAY) + TOTAL] == Counter({"fraud_count": 1, "fraud_amt": 0.0})
+
+
+def test_undated_cases_are_left_out():
+    undated = [{**CASE, "trans_date_trans_time": v} for v in (None, "6/21/2020 12:14")]
+    assert not any(dated(c) for c in undated) and dated(CASE)
+    assert deltas_for(undated) == {}
+    assert deltas_for(undated + [CASE]) == deltas_for([CASE])
+
+
+def test_stored_bucket_reads_back_as_deltas():
+    stored = {
+        "_id": "x", "g": "day", "level": "total", "t": DAY, "state": None, "category": None, "merchant": None,
+        "fraud_count": 1, "fraud_amt": 12.5, "score_hist": {"9": 1},
+    }
+    assert _flat(stored) == deltas_for([CASE])[("day", "total", DAY) + TOTAL]
@@ -0,0 +1,120 @@
+"""RowScorer parity with the build_features path on a small fitted model.
+
+Run from backend/: python -m pytest -q test_row_scorer.py
+
+The model prep uses "passthrough" as a pipeline step, as a block and as the
+remainder; once fitted, sklearn stores those as identity FunctionTransformers,
+which the row scorer must treat as no-ops instead of falling back. The rows'
+unix_time runs UNIX_TIME_OFFSET behind their dates, as in the training data,
+and the bundle declares it.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from features2 import build_features, parse_unix
+from model_serving import ServingModel
+from model_store import ModelBundle
+
+MERCHANTS = [f"fraud_M{i}" for i in range(12)]
+CATEGORIES = ["grocery_pos", "gas_transport", "shopping_net", "travel"]
+STATES = ["NY", "CA", "TX", "SC"]
+UNIX_TIME_OFFSET = timedelta(days=2557)
+
+
+def _raw(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = datetime(2020, 1, 1)
+    when = [start + timedelta(minutes=int(m)) for m in rng.integers(0, 525_600, n)]
+    lat, lon = rng.uniform(25, 48, n), rng.uniform(-120, -70, n)
+    return pd.DataFrame({
+        "trans_date_trans_time": [w.strftime("%m/%d/%Y %H:%M") for w in when],
+        "cc_num": rng.integers(10**15, 10**16, n),
+        "merchant": rng.choice(MERCHANTS, n),
+        "category": rng.choice(CATEGORIES, n),
+        "amt": rng.gamma(2.0, 40.0, n).round(2),
+        "first": "A", "last": "B",
+        "gender": rng.choice(["M", "F"], n),
+        "street": "1 Main St", "city": "Town",
+        "state": rng.choice(STATES, n),
+        "zip": rng.integers(10000, 99999, n),
+        "lat": lat, "long": lon,
+        "city_pop": rng.integers(100, 10**6, n),
+        "job": "Engineer",
+        "dob": [f"{m}/{d}/{y}" for m, d, y in zip(rng.integers(1, 13, n), rng.integers(1, 29, n), rng.integers(1950, 2000, n))],
+        "trans_num": [f"t{i}" for i in range(n)],
+        "unix_time": [int((w - UNIX_TIME_OFFSET).timestamp()) for w in when],
+        "merch_lat": lat + rng.normal(0, 0.5, n), "merch_long": lon + rng.normal(0, 0.5, n),
+        "is_fraud": rng.integers(0, 2, n),
+    })
+
+
+@pytest.fixture(scope="module")
+def model():
+    df = _raw(400)
+    X, y, _, pre, te, cat = build_features(
+        df, training=True, return_preprocessor=True, return_te=True, return_cat_encoder=True
+    )
+    names = list(pre.get_feature_names_out())
+    rates = df.groupby("state")["is_fraud"].mean().to_dict()
+    frame = pd.DataFrame(X, columns=names).assign(state_risk=df["state"].map(rates).to_numpy())
+
+    half = len(names) // 2
+    prep = ColumnTransformer(
+        [
+            ("num", Pipeline([("imputer", SimpleImputer()), ("noop", "passthrough"), ("scaler", StandardScaler())]), names[:half]),
+            ("risk", "passthrough", ["state_risk"]),
+        ],
+        remainder="passthrough",
+    )
+    pipeline = Pipeline([("prep", prep), ("clf", LogisticRegression(max_iter=500))]).fit(frame, y)
+    bundle = ModelBundle(
+        pipeline, te, rates, float(df["is_fraud"].mean()), pre, cat,
+        unix_time_offset_s=int(UNIX_TIME_OFFSET.total_seconds()),
+    )
+    return ServingModel(bundle, mode="thread", flat_forest=False)
+
+
+def _txns(df: pd.DataFrame):
+    return df.drop(columns=["is_fraud"]).to_dict("records")
+
+
+def _reference(model, txn: dict) -> np.ndarray:
+    return model.fraud_model.named_steps["prep"].transform(model.features_frame(txn))[0].astype(np.float32)
+
+
+def test_row_scorer_compiles(model):
+    assert model.row_scorer is not None
+
+
+def test_parity_without_fallbacks(model):
+    df = _raw(60, seed=1)
+    df.loc[0, "merchant"] = "fraud_unseen"
+    df.loc[1, "category"] = "unseen_category"
+    df.loc[2, "state"] = "ZZ"
+    for txn in _txns(df):
+        vec = model.row_scorer.transform(txn)
+        assert vec is not None, txn
+        np.testing.assert_allclose(vec, _reference(model, txn), rtol=1e-6, atol=1e-6)
+
+
+def test_unix_time_fallback_matches_dated_row(model):
+    txn = _txns(_raw(1, seed=2))[0]
+    undated = {**txn, "trans_date_trans_time": None}
+    np.testing.assert_allclose(model.row_scorer.transform(undated), model.row_scorer.transform(txn))
+    np.testing.assert_allclose(model.row_scorer.transform(undated), _reference(model, undated), rtol=1e-6, atol=1e-6)
+
+
+def test_unix_time_without_declared_offset_is_an_epoch():
+    when = datetime(2020, 6, 21, 12, 14)
+    epoch = int((when - datetime(1970, 1, 1)).total_seconds())
+    assert parse_unix(epoch) == when
+    assert parse_unix(epoch - int(UNIX_TIME_OFFSET.total_seconds()), UNIX_TIME_OFFSET) == when
+    assert parse_unix("not a time") is None
@@ -0,0 +1,67 @@
+"""Folding and the index ranges behind the analysis filters.
+
+Run from backend/: python -m pytest -q test_search.py
+"""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from search import _prefix_range, add_shadow_fields, analysis_query, fold, shadow_frame, text_filter
+
+
+@pytest.mark.parametrize("value, field, expected", [
+    ("Kirlin and Sons", None, "kirlin and sons"),
+    ("  KIRLIN   and\tSons ", None, "kirlin and sons"),
+    ("Café Zürich", None, "cafe zurich"),
+    ("Straße", None, "strasse"),
+    ("ﬁsh", None, "fish"),
+    ("fraud_Kirlin and Sons", "merchant", "kirlin and sons"),
+    ("fraud_Kirlin and Sons", "category", "fraud_kirlin and sons"),
+    (12, None, "12"),
+    (None, None, None),
+    (float("nan"), None, None),
+])
+def test_fold(value, field, expected):
+    assert fold(value, field) == expected
+
+
+def _in(text: str, bounds: dict) -> bool:
+    return bounds["$gte"] <= text < bounds["$lt"]
+
+
+def test_prefix_range_bounds():
+    bounds = _prefix_range("kirl")
+    assert bounds == {"$gte": "kirl", "$lt": "kirm"}
+    for inside in ("kirl", "kirlin", "kirl and sons", "kirl￿"):
+        assert _in(inside, bounds), inside
+    for outside in ("kir", "kirk", "kirm", "kirma", "kis"):
+        assert not _in(outside, bounds), outside
+
+
+def test_text_filter_folds_input():
+    assert text_filter("merchant", "fraud_KIRL") == {"merchant_lc": {"$gte": "kirl", "$lt": "kirm"}}
+    assert text_filter("state", " ny ", match="exact") == {"state_lc": "ny"}
+    assert text_filter("state", "   ") == {}
+
+
+def test_analysis_query_end_includes_the_whole_day():
+    query = analysis_query(category="Travel", min_amount=5, end=datetime(2020, 6, 21))
+    assert query == {
+        "category_lc": {"$gte": "travel", "$lt": "travem"},
+        "amt": {"$gte": 5},
+        "trans_date_trans_time": {"$lt": datetime(2020, 6, 22)},
+    }
+
+
+def test_shadow_frame_matches_add_shadow_fields():
+    rows = [
+        {"merchant": "fraud_Café", "category": "Travel", "state": "NY"},
+        {"merchant": "fraud_Café", "category": None, "state": "ny"},
+        {"merchant": "Other", "category": "travel", "state": None},
+    ]
+    df = shadow_frame(pd.DataFrame(rows))
+    for i, row in enumerate(rows):
+        expected = add_shadow_fields(dict(row))
+        for shadow in ("merchant_lc", "category_lc", "state_lc"):
+            assert df[shadow][i] == expected[shadow]
@@ -0,0 +1,38 @@
+"""trans_num conversions between the API's strings and the stored binary.
+
+Run from backend/: python -m pytest -q test_trans_nums.py
+"""
+import uuid
+
+import pytest
+from bson.binary import Binary, UUID_SUBTYPE
+
+from trans_nums import LEGACY_NAMESPACE, new, to_binary, to_hex
+
+U = uuid.UUID("1e8d17e4-61f8-4104-9784-29175f863fc9")
+
+
+@pytest.mark.parametrize("spelling", [
+    str(U), U.hex, str(U).upper(), f"{{{U}}}", f"urn:uuid:{U}", f"  {U}\n",
+    U, Binary(U.bytes, UUID_SUBTYPE), Binary(U.bytes, 0),
+])
+def test_every_spelling_maps_to_one_binary(spelling):
+    value = to_binary(spelling)
+    assert value == Binary(U.bytes, UUID_SUBTYPE)
+    assert value.subtype == UUID_SUBTYPE
+    assert to_hex(spelling) == U.hex
+
+
+def test_legacy_ids_map_to_their_name_based_uuid():
+    value = to_binary("t123")
+    assert value == Binary(uuid.uuid5(LEGACY_NAMESPACE, "t123").bytes, UUID_SUBTYPE)
+    assert to_binary(" t123 ") == value
+    assert to_binary(to_hex("t123")) == value
+    assert to_binary("t124") != value
+
+
+def test_hex_round_trip():
+    stored = new()
+    assert stored.subtype == UUID_SUBTYPE and len(stored) == 16
+    assert to_binary(to_hex(stored)) == stored
+    assert new() != stored
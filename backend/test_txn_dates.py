@@ -0,0 +1,51 @@
+"""Transaction times stored as dates and shown in the frontend's shape.
+
+Run from backend/: python -m pytest -q test_txn_dates.py
+"""
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from txn_dates import FIELD, display, normalize, to_date, to_dates
+
+WHEN = datetime(2020, 6, 21, 12, 14)
+
+
+@pytest.mark.parametrize("value", [
+    "6/21/2020 12:14", "06/21/20 12:14", "6/21/2020 12:14:00", "6/21/2020 12:14 PM",
+    "2020-06-21 12:14:00", "2020-06-21T12:14:00", " 6/21/2020   12:14 ",
+    WHEN, datetime(2020, 6, 21, 14, 14, tzinfo=timezone(timedelta(hours=2))),
+])
+def test_to_date(value):
+    assert to_date(value) == WHEN
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "21/6/2020 12:14", 1592741640])
+def test_to_date_rejects(value):
+    assert to_date(value) is None
+
+
+def test_normalize_stores_a_date():
+    doc = normalize({FIELD: "6/21/2020 12:14", "amt": 1.0})
+    assert doc == {FIELD: WHEN, "amt": 1.0}
+
+
+@pytest.mark.parametrize("doc", [{}, {FIELD: None}, {FIELD: "soon"}])
+def test_normalize_refuses_undated_documents(doc):
+    with pytest.raises(ValueError, match=FIELD):
+        normalize(doc)
+
+
+def test_to_dates_matches_to_date():
+    values = pd.Series(["6/21/2020 12:14", "soon", None, "2020-06-21 12:14:00"] * 20)
+    parsed = to_dates(values)
+    for raw, got in zip(values, parsed):
+        expected = to_date(raw)
+        assert (pd.isna(got) and expected is None) or got == expected
+
+
+def test_display():
+    assert display(WHEN) == "2020-06-21 12:14:00"
+    assert display("6/21/2020 12:14") == "6/21/2020 12:14"
+    assert display(None) is None
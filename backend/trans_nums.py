@@ -0,0 +1,40 @@
+"""``trans_num`` stored as one 16-byte UUID binary.
+
+Transactions store their id as a subtype-4 ``Binary`` and cases list the
+same values in ``txn_ids``. A lookup by txn id is then a single exact
+match on a unique index. The API reads and returns ids as strings: 32 hex
+digits, with any UUID spelling accepted on input. Legacy ids that are not
+UUIDs map to a name-based UUID of their text, so they stay addressable by
+the string they were stored under (see migrate_trans_num.py).
+"""
+from __future__ import annotations
+
+import uuid
+
+from bson.binary import Binary, UUID_SUBTYPE
+
+# Fixed namespace for uuid5 ids of legacy non-UUID strings; changing it orphans migrated ids.
+LEGACY_NAMESPACE = uuid.UUID("5b1d7c0e-8f0a-4c47-9a55-3f1e2d6c9b40")
+
+
+def new() -> Binary:
+    return Binary(uuid.uuid4().bytes, UUID_SUBTYPE)
+
+
+def to_binary(value) -> Binary:
+    """The stored form of a txn id given as a string, UUID or binary."""
+    if isinstance(value, Binary) and len(value) == 16:
+        return value if value.subtype == UUID_SUBTYPE else Binary(bytes(value), UUID_SUBTYPE)
+    if isinstance(value, uuid.UUID):
+        return Binary(value.bytes, UUID_SUBTYPE)
+    text = str(value).strip()
+    try:
+        u = uuid.UUID(text)
+    except ValueError:
+        u = uuid.uuid5(LEGACY_NAMESPACE, text)
+    return Binary(u.bytes, UUID_SUBTYPE)
+
+
+def to_hex(value) -> str:
+    """The API form of a stored txn id."""
+    return uuid.UUID(bytes=bytes(to_binary(value))).hex
@@ -0,0 +1,49 @@
+"""``trans_date_trans_time`` stored as a BSON date.
+
+Rows arrive with the timestamp in any format the scorer accepts. Documents
+store it as a datetime so that range filters, sorts and ``$dateTrunc`` run
+server side. The API still returns it in the ``%Y-%m-%d %H:%M:%S`` shape the
+frontend shows. Values are naive UTC. A document is only stored with a date
+here: ``normalize`` rejects a missing or unparseable value rather than storing
+it as it came or guessing one from ``unix_time``, whose relation to the
+transaction time depends on the model's source data.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Optional
+
+import pandas as pd
+
+from features2 import TXN_TIME_FORMATS, parse_best, parse_one
+
+FIELD = "trans_date_trans_time"
+DISPLAY_FORMAT = "%Y-%m-%d %H:%M:%S"
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+
+
+def to_date(value) -> Optional[datetime]:
+    """``value`` as a naive UTC datetime; None if it does not parse."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    return parse_one(value, TXN_TIME_FORMATS) if value is not None else None
+
+
+def normalize(doc: dict) -> dict:
+    """Store ``doc``'s transaction time as a date; ValueError if it is missing or does not parse."""
+    when = to_date(doc.get(FIELD))
+    if when is None:
+        raise ValueError(f"Unparseable {FIELD}: {doc.get(FIELD)!r}")
+    doc[FIELD] = when
+    return doc
+
+
+def to_dates(values: pd.Series) -> pd.Series:
+    """Vectorised ``to_date`` over a chunk; rows that do not parse are NaT."""
+    return parse_best(values, TXN_TIME_FORMATS, FIELD, source="ingest")
+
+
+def display(value):
+    return value.strftime(DISPLAY_FORMAT) if isinstance(value, datetime) else value
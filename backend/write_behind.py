@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from bson import json_util
+from pymongo.errors import PyMongoError
+
+from ingest import write_transactions
+
+_STOP = object()
+
+
+class WriteBehind:
+    """Buffers scored transactions and writes them to MongoDB in batches.
+
+    ``put`` only enqueues, so request latency never includes a database round
+    trip; it blocks when ``max_buffer`` documents are pending, which pushes
+    back on callers instead of growing memory without bound. A background task
+    flushes once ``flush_rows`` documents are queued or the oldest one has
+    waited ``flush_ms`` and writes the batch with ``write_transactions``:
+    one claimed id range and one unordered ``insert_many`` per collection.
+
+    The caller was already told the row was accepted, so a failed write is
+    retried ``retries`` times with doubling waits from ``retry_ms``. Only rows
+    that wrote nothing go again; the rest, and rows still failing after the
+    last attempt, are kept in the ``dead_letter`` collection with their error,
+    or appended to ``dead_letter_file`` when that insert fails too.
+    """
+
+    def __init__(
+        self, db, seq, flush_rows: int = 500, flush_ms: float = 100.0, max_buffer: int = 10_000,
+        counts=None, rollups=None, retries: int = 3, retry_ms: float = 200.0,
+        dead_letter: str = "write_behind_dead_letter", dead_letter_file: str = "write_behind_dead_letter.ndjson",
+    ):
+        self.db = db
+        self.seq = seq
+        self.counts = counts
+        self.rollups = rollups
+        self.flush_rows = flush_rows
+        self.flush_wait = flush_ms / 1000
+        self.retries = retries
+        self.retry_wait = retry_ms / 1000
+        self.dead_letter = dead_letter
+        self.dead_letter_file = dead_letter_file
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.lost = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._oldest: Optional[float] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out everything still buffered."""
+        if self._task is not None:
+            await self.queue.put((_STOP, time.perf_counter()))
+            await self._task
+            self._task = None
+
+    async def put(self, doc: dict):
+        await self.queue.put((doc, time.perf_counter()))
+
+    async def _collect(self) -> list:
+        batch = []
+        deadline = None
+        while len(batch) < self.flush_rows:
+            # Anything already queued joins the batch; only an empty queue waits.
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                if deadline is None:
+                    item = await self.queue.get()
+                else:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+            if item[0] is _STOP:
+                self._stopping = True
+                break
+            if deadline is None:
+                deadline = item[1] + self.flush_wait
+                self._oldest = item[1]
+            batch.append(item)
+        return batch
+
+    async def _flush(self, batch: list):
+        docs = [doc for doc, _ in batch]
+        errors = await self._write(docs)
+        if errors:
+            self.failed += len(errors)
+            await self._spill([(docs[i], msg) for i, msg in errors.items()])
+
+        lag_ms = (time.perf_counter() - min(t for _, t in batch)) * 1000
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.flushes += 1
+        self.written += len(docs) - len(errors)
+
+    async def _write(self, docs: List[dict]) -> Dict[int, str]:
+        """``write_transactions`` with retries; returns ``{index: error}`` for rows that did not land."""
+        errors: Dict[int, str] = {}
+        pending = list(range(len(docs)))
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += len(pending)
+                await asyncio.sleep(self.retry_wait * 2 ** (attempt - 1))
+            batch = [docs[i] for i in pending]
+            try:
+                unnumbered = [doc for doc in batch if "id" not in doc]
+                if unnumbered:
+                    start = await self.seq.claim("transactions", len(unnumbered))
+                    for k, doc in enumerate(unnumbered):
+                        doc["id"] = start + k
+                failed = await write_transactions(self.db, self.seq, batch, self.counts, self.rollups)
+                retry = {k for k, msg in failed.items() if _nothing_written(msg)}
+            except PyMongoError as e:
+                failed = {k: str(e) for k in range(len(batch))}
+                retry = set(failed)
+            last = attempt == self.retries
+            for k, msg in failed.items():
+                if last or k not in retry:
+                    errors[pending[k]] = msg
+            pending = [pending[k] for k in sorted(retry)]
+            if not pending:
+                break
+        return errors
+
+    async def _spill(self, failed: List[Tuple[dict, str]]):
+        now = datetime.now(timezone.utc)
+        entries = [{"doc": doc, "error": msg, "failed_at": now} for doc, msg in failed]
+        where = self.dead_letter
+        try:
+            await self.db[self.dead_letter].insert_many(entries, ordered=False)
+        except PyMongoError:
+            where = self.dead_letter_file
+            try:
+                await asyncio.to_thread(_append_ndjson, self.dead_letter_file, entries)
+            except OSError as e:
+                self.lost += len(entries)
+                print(f"⚠️  Lost {len(entries)} transactions, dead letter failed: {e}")
+                return
+        self.dead_lettered += len(entries)
+        print(f"⚠️  {len(entries)} buffered transactions failed, kept in {where}: {failed[0][1]}")
+
+    async def _run(self):
+        # After the stop sentinel, keep going until the queue is drained.
+        while not (self._stopping and self.queue.empty()):
+            batch = await self._collect()
+            if batch:
+                try:
+                    await self._flush(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    await self._spill([(doc, f"flush failed: {e!r}") for doc, _ in batch])
+            self._oldest = None
+
+    def metrics(self) -> dict:
+        pending_ms = (time.perf_counter() - self._oldest) * 1000 if self._oldest is not None else 0.0
+        return {
+            "pending": self.queue.qsize(),
+            "max_buffer": self.queue.maxsize,
+            "flushes": self.flushes,
+            "written": self.written,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "lost": self.lost,
+            "oldest_pending_ms": pending_ms,
+            "last_write_lag_ms": self.last_lag_ms,
+            "max_write_lag_ms": self.max_lag_ms,
+        }
+
+
+def _nothing_written(msg: str) -> bool:
+    # all_transaction is written first, so a row it rejected is safe to send
+    # again; one it rejected as a duplicate id would only be rejected again.
+    return msg.startswith("all_transaction: ") and "E11000" not in msg
+
+
+def _append_ndjson(path: str, entries: list):
+    with open(path, "a") as f:
+        for entry in entries:
+            f.write(json_util.dumps(entry) + "\n")
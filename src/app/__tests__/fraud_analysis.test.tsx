@@ -26,10 +26,28 @@ jest.mock('../component/UI/card', () => ({
   CardTitle: ({ children }: { children: React.ReactNode }) => <h5>{children}</h5>,
 }));
 
-const mockFraudTransactions = [
-    { id: 1, trans_num: 'abc', cc_num: 1234, merchant: 'Test Merchant 1', category: 'Gas', amt: 100, trans_date_trans_time: '2023-01-01', first: 'John', last: 'Doe', gender: 'M', street: '123 Main St', city: 'Anytown', state: 'CA', zip: 12345, lat: 0, long: 0, city_pop: 1000, job: 'Engineer', dob: '1990-01-01', unix_time: 1672531200, merch_lat: 0, merch_long: 0, is_fraud: 1, fraud_score: 0.9 },
-    { id: 2, trans_num: 'def', cc_num: 5678, merchant: 'Test Merchant 2', category: 'Groceries', amt: 200, trans_date_trans_time: '2023-01-02', first: 'Jane', last: 'Doe', gender: 'F', street: '456 Oak St', city: 'Othertown', state: 'NY', zip: 67890, lat: 0, long: 0, city_pop: 2000, job: 'Doctor', dob: '1985-05-05', unix_time: 1672617600, merch_lat: 0, merch_long: 0, is_fraud: 1, fraud_score: 0.8 },
-];
+const mockFacets = {
+  totals: { count: 2, amt: 300, first: '2023-01-01 00:00:00', last: '2023-01-02 00:00:00', states: 2 },
+  top: {
+    merchant: {
+      count: [{ name: 'Test Merchant 1', count: 1, amt: 100 }, { name: 'Test Merchant 2', count: 1, amt: 200 }],
+      amt: [{ name: 'Test Merchant 2', count: 1, amt: 200 }, { name: 'Test Merchant 1', count: 1, amt: 100 }],
+    },
+    category: {
+      count: [{ name: 'Gas', count: 1, amt: 100 }, { name: 'Groceries', count: 1, amt: 200 }],
+      amt: [{ name: 'Groceries', count: 1, amt: 200 }, { name: 'Gas', count: 1, amt: 100 }],
+    },
+    state: {
+      count: [{ name: 'CA', count: 1, amt: 100 }, { name: 'NY', count: 1, amt: 200 }],
+      amt: [{ name: 'NY', count: 1, amt: 200 }, { name: 'CA', count: 1, amt: 100 }],
+    },
+  },
+  amount_histogram: [{ min: 100, max: 250, count: 2, amt: 300 }],
+  hour_of_day: [{ hour: 0, count: 2, amt: 300 }],
+  day_of_week: [{ day: 'Sun', count: 1, amt: 100 }, { day: 'Mon', count: 1, amt: 200 }],
+  series: [{ period: '2023-01', count: 2, amt: 300 }],
+  score_quantiles: { p5: 0.8, p25: 0.82, p50: 0.85, p75: 0.88, p95: 0.9 },
+};
 
 // Mock the global fetch function
 global.fetch = jest.fn();
@@ -42,7 +60,7 @@ beforeEach(() => {
 
 describe('FraudAnalysisPage', () => {
   test('renders the main heading', async () => {
-    mockFetch.mockResolvedValueOnce({ ok: true, json: async () => mockFraudTransactions });
+    mockFetch.mockResolvedValueOnce({ ok: true, json: async () => mockFacets });
     render(<FraudAnalysisPage />);
     expect(screen.getByRole('heading', { name: 'Fraud Analysis' })).toBeInTheDocument();
     // Wait for the dashboard to render to avoid act(...) warnings
@@ -66,7 +84,7 @@ describe('FraudAnalysisDashboard', () => {
   });
 
   test('fetches and displays analytics data successfully', async () => {
-    mockFetch.mockResolvedValueOnce({ ok: true, json: async () => mockFraudTransactions });
+    mockFetch.mockResolvedValueOnce({ ok: true, json: async () => mockFacets });
     render(<FraudAnalysisDashboard />);
 
     // Check for summary cards
@@ -77,10 +95,14 @@ describe('FraudAnalysisDashboard', () => {
     // Check for total amount with more specific selector
     const totalAmountCard = await screen.findByText('Total Amount');
     expect(within(totalAmountCard.parentElement!.parentElement!).getByText('$300')).toBeInTheDocument();
+    expect(mockFetch).toHaveBeenCalledWith(
+      expect.stringContaining('/transactions/fraud/facets?'),
+      expect.any(Object)
+    );
   });
 
   test('applies and clears filters', async () => {
-    mockFetch.mockResolvedValueOnce({ ok: true, json: async () => mockFraudTransactions });
+    mockFetch.mockResolvedValueOnce({ ok: true, json: async () => mockFacets });
     render(<FraudAnalysisDashboard />);
     await screen.findByText('Filters');
 
@@ -114,7 +136,7 @@ describe('FraudAnalysisDashboard', () => {
   });
 
   test('switches time series granularity', async () => {
-    mockFetch.mockResolvedValueOnce({ ok: true, json: async () => mockFraudTransactions });
+    mockFetch.mockResolvedValueOnce({ ok: true, json: async () => mockFacets });
     render(<FraudAnalysisDashboard />);
     await screen.findByText('Fraud Trends Over Time'); // Wait for initial load
 
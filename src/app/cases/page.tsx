@@ -23,14 +23,25 @@ export default function CasesPage() {
   const [currentPage, setCurrentPage] = useState(1);
   const [totalItems, setTotalItems] = useState(0);
   const [itemsPerPage, setItemsPerPage] = useState(10);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [prevCursor, setPrevCursor] = useState<string | null>(null);
   const fetchCases = async () => {
     setLoading(true);
     setError(null);
     try {
-      const offset = (currentPage - 1) * itemsPerPage;
+      // The total is only counted for the first page and kept while paging.
+      const params = new URLSearchParams({
+        status: tab,
+        limit: String(itemsPerPage),
+      });
+      if (cursor) {
+        params.append("cursor", cursor);
+        params.append("count", "none");
+      }
 
       const res = await fetch(
-        `${API}/cases?status=${tab}&limit=${itemsPerPage}&offset=${offset}`,
+        `${API}/cases?${params.toString()}`,
         {
           headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
         }
@@ -44,7 +55,9 @@ export default function CasesPage() {
 
       const data = await res.json();
       setCases(data.items);
-      setTotalItems(data.total);
+      if (data.total != null) setTotalItems(data.total);
+      setNextCursor(data.next_cursor ?? null);
+      setPrevCursor(data.prev_cursor ?? null);
     } catch (e: any) {
       setError(e.message);
     } finally {
@@ -53,19 +66,23 @@ export default function CasesPage() {
   };
 
   useEffect(() => {
-    if (currentPage !== 1) {
-      setCurrentPage(1);
-    }
+    setCursor(null);
+    setCurrentPage(1);
   }, [itemsPerPage, tab]);
 
   useEffect(() => {
     fetchCases();
-  }, [currentPage, itemsPerPage, tab]);
+  }, [cursor, itemsPerPage, tab]);
 
   const paginate = (pageNumber: number) => {
     setCurrentPage(pageNumber);
   };
 
+  const onCursor = (token: string, direction: "next" | "prev") => {
+    setCurrentPage((page) => (direction === "next" ? page + 1 : page - 1));
+    setCursor(token);
+  };
+
  
   const patchStatus = (txnId: string, status: Status) =>
     fetch(`${API}/cases/by-txn/${txnId}?status=${status}`, {
@@ -219,6 +236,9 @@ export default function CasesPage() {
               currentPage={currentPage}
               paginate={paginate}
               setItemsPerPage={setItemsPerPage}
+              nextCursor={nextCursor}
+              prevCursor={prevCursor}
+              onCursor={onCursor}
             />
           </div>
         </>
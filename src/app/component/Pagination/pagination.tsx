@@ -7,6 +7,12 @@ interface PaginationProps {
   paginate: (pageNumber: number) => void;
   
   setItemsPerPage: (size: number) => void; 
+
+  // Cursor mode: the server hands out next/prev cursors instead of offsets,
+  // so only neighbouring pages can be reached.
+  nextCursor?: string | null;
+  prevCursor?: string | null;
+  onCursor?: (cursor: string, direction: "next" | "prev") => void;
 }
 
 const PaginationComponent = ({
@@ -15,8 +21,12 @@ const PaginationComponent = ({
   currentPage,
   paginate,
   setItemsPerPage, 
+  nextCursor,
+  prevCursor,
+  onCursor,
 }: PaginationProps) => {
   const totalPages = Math.max(Math.ceil(totalItems / itemsPerPage), 1);
+  const cursorMode = onCursor !== undefined;
 
 
   const [pageInput, setPageInput] = useState(currentPage.toString());
@@ -28,17 +38,24 @@ const PaginationComponent = ({
 
 
   const nextPage = () => {
-    if (currentPage < totalPages) {
+    if (onCursor) {
+      if (nextCursor) onCursor(nextCursor, "next");
+    } else if (currentPage < totalPages) {
       paginate(currentPage + 1);
     }
   };
 
   const prevPage = () => {
-    if (currentPage > 1) {
+    if (onCursor) {
+      if (prevCursor) onCursor(prevCursor, "prev");
+    } else if (currentPage > 1) {
       paginate(currentPage - 1);
     }
   };
 
+  const hasNext = cursorMode ? Boolean(nextCursor) : currentPage < totalPages;
+  const hasPrev = cursorMode ? Boolean(prevCursor) : currentPage > 1;
+
  
   const handleGoToPage = (e: React.KeyboardEvent<HTMLInputElement>) => {
     if (e.key === 'Enter') {
@@ -75,7 +92,7 @@ const PaginationComponent = ({
     return pageNumbers;
   };
 
-  if (totalPages <= 1) {
+  if (!hasNext && !hasPrev) {
     return null; 
   }
   
@@ -101,13 +118,17 @@ const PaginationComponent = ({
         <div className="flex justify-center items-center space-x-2">
             <button
                 onClick={prevPage}
-                disabled={currentPage === 1}
+                disabled={!hasPrev}
                 className="px-4 py-2 bg-white border border-gray-300 rounded-md font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50"
             >
                 Previous
             </button>
 
-            {getPageNumbers().map((number) => (
+            {cursorMode ? (
+                <span className="px-4 py-2 text-gray-700">
+                Page {currentPage}{totalItems ? ` of ${totalPages}` : ""}
+                </span>
+            ) : getPageNumbers().map((number) => (
                 <button
                 key={number}
                 onClick={() => paginate(number)}
@@ -123,15 +144,15 @@ const PaginationComponent = ({
 
             <button
                 onClick={nextPage}
-                disabled={currentPage === totalPages}
+                disabled={!hasNext}
                 className="px-4 py-2 bg-white border border-gray-300 rounded-md font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50"
             >
                 Next
             </button>
         </div>
         
-        {/* Right Side: Go to page input */}
-        <div className="flex items-center space-x-2">
+        {/* Right Side: Go to page input (offset mode only) */}
+        {!cursorMode && <div className="flex items-center space-x-2">
             <span className="text-gray-600">Go to page:</span>
             <input
                 type="number"
@@ -141,7 +162,7 @@ const PaginationComponent = ({
                 className="w-16 px-2 py-1 text-center bg-white border border-gray-300 rounded-md focus:ring-blue-500 focus:border-blue-500"
             />
             <span className="text-gray-500">of {totalPages}</span>
-        </div>
+        </div>}
     </div>
   );
 };
@@ -10,31 +10,24 @@ import GeneralAlert, {
 
 const API = process.env.NEXT_PUBLIC_API ?? "http://localhost:8000";
 
-interface FraudTransaction {
-  id: number;
-  trans_num: string;
-  cc_num: number;
-  merchant: string;
-  category: string;
+interface FacetRow {
+  count: number;
   amt: number;
-  trans_date_trans_time: string;
-  first: string;
-  last: string;
-  gender: string;
-  street: string;
-  city: string;
-  state: string;
-  zip: number;
-  lat: number;
-  long: number;
-  city_pop: number;
-  job: string;
-  dob: string;
-  unix_time: number;
-  merch_lat: number;
-  merch_long: number;
-  is_fraud: number;
-  fraud_score: number;
+}
+
+interface NamedFacetRow extends FacetRow {
+  name: string;
+}
+
+// Response of /transactions/fraud/facets: every chart's numbers, aggregated server side.
+interface FraudFacets {
+  totals: FacetRow & { first: string | null; last: string | null; states: number };
+  top: Record<'merchant' | 'category' | 'state', { count: NamedFacetRow[]; amt: NamedFacetRow[] }>;
+  amount_histogram: Array<FacetRow & { min: number; max: number | null }>;
+  hour_of_day: Array<FacetRow & { hour: number }>;
+  day_of_week: Array<FacetRow & { day: string }>;
+  series: Array<FacetRow & { period: string }>;
+  score_quantiles: Record<string, number>;
 }
 
 interface FilterState {
@@ -62,12 +55,10 @@ const COLORS = {
 const PIE_COLORS = ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF'];
 
 const FraudAnalysisDashboard: React.FC = () => {
-  const [transactions, setTransactions] = useState<FraudTransaction[]>([]);
-  const [filteredTransactions, setFilteredTransactions] = useState<FraudTransaction[]>([]);
+  const [facets, setFacets] = useState<FraudFacets | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [granularity, setGranularity] = useState<"day" | "month" | "year">("month");
-  const [lineData, setLineData] = useState<Array<{period: string; fraud_count: number}>>([]);
   const [lineLoading, setLineLoading] = useState(true);
   const [showFilters, setShowFilters] = useState(false);
   
@@ -93,9 +84,9 @@ const FraudAnalysisDashboard: React.FC = () => {
 
 
   useEffect(() => {
-    const fetchTransactions = async () => {
+    const fetchFacets = async () => {
       try {
-        setLoading(true);
+        setLineLoading(true);
         setError(null);
         const token = localStorage.getItem("token");
         
@@ -108,107 +99,42 @@ const FraudAnalysisDashboard: React.FC = () => {
         if (filters.maxAmount) params.append('max_amount', filters.maxAmount);
         if (filters.startDate) params.append('start_date', filters.startDate);
         if (filters.endDate) params.append('end_date', filters.endDate);
-        params.append('limit', '1000');
+        params.append('granularity', granularity);
 
-        const response = await fetch(`${API}/transactions/fraud/analysis?${params.toString()}`, {
+        const response = await fetch(`${API}/transactions/fraud/facets?${params.toString()}`, {
           headers: { Authorization: `Bearer ${token}` },
         });
 
         if (!response.ok) {
-          throw new Error('Failed to fetch fraud transactions');
+          throw new Error('Failed to fetch fraud facets');
         }
 
-        const data = await response.json();
-        setTransactions(data);
-        setFilteredTransactions(data);
-        console.log("Fraud transactions fetched:", data);
+        setFacets(await response.json());
       } catch (err) {
-        console.error('Error fetching fraud transactions:', err);
+        console.error('Error fetching fraud facets:', err);
         setError('Failed to load fraud analysis data. Please try again.');
       } finally {
         setLoading(false);
+        setLineLoading(false);
       }
     };
 
-    fetchTransactions();
-  }, [filters]);
-
-
-  useEffect(() => {
-    let filtered = transactions;
-
-    if (filters.merchant) {
-      filtered = filtered.filter(t => t.merchant.toLowerCase().includes(filters.merchant.toLowerCase()));
-    }
-    if (filters.category) {
-      filtered = filtered.filter(t => t.category.toLowerCase().includes(filters.category.toLowerCase()));
-    }
-    if (filters.state) {
-      filtered = filtered.filter(t => t.state.toLowerCase().includes(filters.state.toLowerCase()));
-    }
-    if (filters.minAmount) {
-      filtered = filtered.filter(t => t.amt >= parseFloat(filters.minAmount));
-    }
-    if (filters.maxAmount) {
-      filtered = filtered.filter(t => t.amt <= parseFloat(filters.maxAmount));
-    }
-    if (filters.startDate) {
-      filtered = filtered.filter(t => new Date(t.trans_date_trans_time) >= new Date(filters.startDate));
-    }
-    if (filters.endDate) {
-      filtered = filtered.filter(t => new Date(t.trans_date_trans_time) <= new Date(filters.endDate));
-    }
+    fetchFacets();
+  }, [filters, granularity]);
 
-    setFilteredTransactions(filtered);
-  }, [transactions, filters]);
-
-  useEffect(() => {
-    if (filteredTransactions.length === 0) {
-      setLineData([]);
-      setLineLoading(false);
-      return;
-    }
-
-    const counts = new Map<string, number>();
-
-    filteredTransactions.forEach(transaction => {
-      const date = new Date(transaction.trans_date_trans_time);
-      let key: string;
-
-      if (granularity === "day") {
-        key = date.toISOString().split('T')[0]; // YYYY-MM-DD
-      } else if (granularity === "month") {
-        key = `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
-      } else {
-        key = date.getFullYear().toString();
-      }
-
-      counts.set(key, (counts.get(key) || 0) + 1);
-    });
-
-    const chartData = Array.from(counts.entries())
-      .map(([period, count]) => ({ period, fraud_count: count }))
-      .sort((a, b) => a.period.localeCompare(b.period));
-
-    setLineData(chartData);
-    setLineLoading(false);
-  }, [filteredTransactions, granularity]);
+  const lineData = React.useMemo(
+    () => (facets?.series ?? []).map(({ period, count }) => ({ period, fraud_count: count })),
+    [facets]
+  );
 
-  const categoryData = React.useMemo(() => {
-    const categoryCounts = new Map<string, number>();
-    filteredTransactions.forEach(t => {
-      categoryCounts.set(t.category, (categoryCounts.get(t.category) || 0) + 1);
-    });
-  
-    return Array.from(categoryCounts.entries())
-      .map(([name, value], index) => ({ 
-        name, 
-        value, 
-        color: PIE_COLORS[index % PIE_COLORS.length] 
-      }))
-      .sort((a, b) => b.value - a.value)
-      .slice(0, 5);
-  }, [filteredTransactions]);
+  const categoryData = React.useMemo(
+    () => (facets?.top.category.count ?? []).slice(0, 5).map(({ name, count }, index) => ({
+      name,
+      value: count,
+      color: PIE_COLORS[index % PIE_COLORS.length]
+    })),
+    [facets]
+  );
 
   const applyFilters = () => {
     setFilters(inputFilters);
@@ -370,7 +296,7 @@ const FraudAnalysisDashboard: React.FC = () => {
               <span className="text-sm font-medium text-gray-600">Total Fraud Cases</span>
             </div>
             <div className="text-2xl font-bold text-red-600">
-              {filteredTransactions.length.toLocaleString()}
+              {(facets?.totals.count ?? 0).toLocaleString()}
             </div>
           </CardContent>
         </Card>
@@ -382,7 +308,7 @@ const FraudAnalysisDashboard: React.FC = () => {
               <span className="text-sm font-medium text-gray-600">Total Amount</span>
             </div>
             <div className="text-2xl font-bold text-green-600">
-              ${filteredTransactions.reduce((sum, t) => sum + t.amt, 0).toLocaleString()}
+              ${(facets?.totals.amt ?? 0).toLocaleString()}
             </div>
           </CardContent>
         </Card>
@@ -394,7 +320,7 @@ const FraudAnalysisDashboard: React.FC = () => {
               <span className="text-sm font-medium text-gray-600">Unique States</span>
             </div>
             <div className="text-2xl font-bold text-blue-600">
-              {new Set(filteredTransactions.map(t => t.state)).size}
+              {facets?.totals.states ?? 0}
             </div>
           </CardContent>
         </Card>
@@ -406,8 +332,8 @@ const FraudAnalysisDashboard: React.FC = () => {
               <span className="text-sm font-medium text-gray-600">Date Range</span>
             </div>
             <div className="text-sm font-bold text-purple-600">
-              {filteredTransactions.length > 0 ? (
-                `${new Date(Math.min(...filteredTransactions.map(t => new Date(t.trans_date_trans_time).getTime()))).toLocaleDateString()} - ${new Date(Math.max(...filteredTransactions.map(t => new Date(t.trans_date_trans_time).getTime()))).toLocaleDateString()}`
+              {facets?.totals.first && facets.totals.last ? (
+                `${new Date(facets.totals.first).toLocaleDateString()} - ${new Date(facets.totals.last).toLocaleDateString()}`
               ) : 'No data'}
             </div>
           </CardContent>
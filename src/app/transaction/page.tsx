@@ -14,6 +14,7 @@ import PaginationComponent from "../component/Pagination/pagination";
 export interface Txn {
   record_id: number;
   txn_id?: string;
+  trans_num?: string;
   trans_date_trans_time: string;
   cc_num: number;
   merchant: string;
@@ -39,6 +40,21 @@ export interface Txn {
 }
 
 const API = process.env.NEXT_PUBLIC_API ?? "http://localhost:8000";
+// Only what the list and the detail modal show; the API projects the rest away.
+const LIST_FIELDS = [
+  "trans_num",
+  "trans_date_trans_time",
+  "amt",
+  "is_fraud",
+  "fraud_score",
+  "merchant",
+  "category",
+  "cc_num",
+  "first",
+  "last",
+  "city",
+  "state",
+].join(",");
 
 const TransactionPage: React.FC = () => {
   const [txns, setTxns] = useState<Txn[]>([]);
@@ -62,6 +78,9 @@ const TransactionPage: React.FC = () => {
   const [currentPage, setCurrentPage] = useState(1);
   const [totalItems, setTotalItems] = useState(0);
   const [itemsPerPage, setItemsPerPage] = useState(10);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [prevCursor, setPrevCursor] = useState<string | null>(null);
   
 
   const fetchTransactions = async () => {
@@ -69,12 +88,16 @@ const TransactionPage: React.FC = () => {
     setError(null);
     try {
       const token = localStorage.getItem("token");
-      const offset = (currentPage - 1) * itemsPerPage;
 
       const params = new URLSearchParams({
         limit: String(itemsPerPage),
-        offset: String(offset),
+        fields: LIST_FIELDS,
       });
+      // The total is only counted for the first page and kept while paging.
+      if (cursor) {
+        params.append("cursor", cursor);
+        params.append("count", "none");
+      }
       if (searchCcNum) params.append("cc_num", searchCcNum);
       if (filters.merchant) params.append("merchant", filters.merchant);
       if (filters.category) params.append("category", filters.category);
@@ -91,7 +114,9 @@ const TransactionPage: React.FC = () => {
 
       const data = await res.json();
       setTxns(data.items);
-      setTotalItems(data.total);
+      if (data.total != null) setTotalItems(data.total);
+      setNextCursor(data.next_cursor ?? null);
+      setPrevCursor(data.prev_cursor ?? null);
     } catch (err: any) {
       setError(err.message);
       GeneralAlert({
@@ -108,14 +133,13 @@ const TransactionPage: React.FC = () => {
     setRole(userRole);
   }, []);
   useEffect(() => {
-    if (currentPage !== 1) {
-      setCurrentPage(1);
-    }
+    setCursor(null);
+    setCurrentPage(1);
   }, [filters, searchCcNum, itemsPerPage]);
 
   useEffect(() => {
     fetchTransactions();
-  }, [currentPage, filters, searchCcNum, itemsPerPage]);
+  }, [cursor, filters, searchCcNum, itemsPerPage]);
 
   const applyFilters = () => {
     setFilters(inputFilters);
@@ -160,6 +184,11 @@ const TransactionPage: React.FC = () => {
 
   const paginate = (pageNumber: number) => setCurrentPage(pageNumber);
 
+  const onCursor = (token: string, direction: "next" | "prev") => {
+    setCurrentPage((page) => (direction === "next" ? page + 1 : page - 1));
+    setCursor(token);
+  };
+
   if (loading) return <LoadingView />;
   if (error) return <ErrorView />;
 
@@ -317,7 +346,7 @@ const TransactionPage: React.FC = () => {
       {/* Transaction List */}
       <ul className="space-y-4">
         {txns.map((txn, idx) => {
-          const key = txn.record_id ?? txn.txn_id ?? idx;
+          const key = txn.record_id ?? txn.trans_num ?? txn.txn_id ?? idx;
           return (
             <li
               key={key}
@@ -347,6 +376,9 @@ const TransactionPage: React.FC = () => {
           currentPage={currentPage}
           paginate={paginate}
           setItemsPerPage={setItemsPerPage}
+          nextCursor={nextCursor}
+          prevCursor={prevCursor}
+          onCursor={onCursor}
         />
       </div>
 